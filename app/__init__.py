@@ -0,0 +1,4 @@
+import time
+
+# Used to report how long importing the app took
+IMPORT_STARTED = time.perf_counter()
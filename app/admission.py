@@ -0,0 +1,120 @@
+"""Admission control of routers with CPU-heavy or bursty endpoints"""
+
+import asyncio
+import math
+from collections import deque
+from typing import AsyncIterator
+
+from fastapi import HTTPException, status
+
+from app.config import settings
+
+
+class AdmissionController():
+    """Limits how many requests of a router run at once.
+
+    At most `limit` requests run, up to `max_queue` more wait for a free
+    slot for `queue_timeout` seconds. Requests finding the queue full are
+    rejected right away with 429, requests which waited too long with
+    503, both with `Retry-After`. Limit 0 admits everything.
+
+    Used as router dependency, the slot is held until the response is
+    sent.
+    """
+
+    def __init__(self, name: str, limit: int, max_queue: int,
+                 queue_timeout: float):
+        self.name = name
+        self.limit = limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.retry_after = str(max(1, math.ceil(queue_timeout)))
+
+        self.active = 0
+        self._waiters: deque = deque()
+        self.admitted = 0
+        self.rejected_queue_full = 0
+        self.rejected_timeout = 0
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def _reject(self, status_code: int, detail: str) -> HTTPException:
+        return HTTPException(status_code=status_code, detail=detail,
+                             headers={'Retry-After': self.retry_after})
+
+    async def acquire(self) -> None:
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            self.admitted += 1
+            return
+
+        if len(self._waiters) >= self.max_queue:
+            self.rejected_queue_full += 1
+            raise self._reject(status.HTTP_429_TOO_MANY_REQUESTS,
+                               'Too many requests, try again later')
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            # Slot is handed over by release() resolving the waiter
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected_timeout += 1
+            raise self._reject(status.HTTP_503_SERVICE_UNAVAILABLE,
+                               'Server is busy, try again later')
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+        self.admitted += 1
+
+    def release(self) -> None:
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    async def __call__(self) -> AsyncIterator[None]:
+        if self.limit <= 0:
+            yield
+            return
+
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> dict:
+        """Admission saturation metrics"""
+        return {
+            "limit": self.limit,
+            "max_queue": self.max_queue,
+            "active": self.active,
+            "queued": self.queued,
+            "admitted": self.admitted,
+            "rejected_queue_full": self.rejected_queue_full,
+            "rejected_timeout": self.rejected_timeout,
+        }
+
+
+AUTH_ADMISSION = AdmissionController(
+    'auth',
+    limit=settings.auth_concurrency,
+    max_queue=settings.auth_queue_size,
+    queue_timeout=settings.auth_queue_timeout
+)
+TASKS_ADMISSION = AdmissionController(
+    'tasks',
+    limit=settings.tasks_concurrency,
+    max_queue=settings.tasks_queue_size,
+    queue_timeout=settings.tasks_queue_timeout
+)
+ADMISSION_CONTROLLERS = (AUTH_ADMISSION, TASKS_ADMISSION)
@@ -1,11 +1,87 @@
 """Enviroment configuration"""
 
+from typing import Literal, Optional
+
 from pydantic import BaseSettings, Field
 
 
 class Settings(BaseSettings):
-    """Database settings"""
+    """Settings read from environment"""
     db_url: str = Field(..., env='DATABASE_URL')
 
+    # asyncpg pool tuning, see asyncpg.create_pool
+    db_pool_min_size: int = Field(10, env='DB_POOL_MIN_SIZE')
+    db_pool_max_size: int = Field(10, env='DB_POOL_MAX_SIZE')
+    db_statement_cache_size: int = Field(100, env='DB_STATEMENT_CACHE_SIZE')
+    db_max_inactive_connection_lifetime: float = Field(
+        300.0, env='DB_MAX_INACTIVE_CONNECTION_LIFETIME')
+    db_command_timeout: Optional[float] = Field(None, env='DB_COMMAND_TIMEOUT')
+    # Serve pool, hashing and admission internals at /internal/stats, it
+    # has no authentication so keep it off on publicly reachable servers
+    internal_stats_enabled: bool = Field(False, env='INTERNAL_STATS_ENABLED')
+
+    # Optional read replica, reads stay on primary for this long after write
+    db_replica_url: Optional[str] = Field(None, env='DATABASE_REPLICA_URL')
+    db_replica_stick_seconds: float = Field(
+        5.0, env='DB_REPLICA_STICK_SECONDS')
+
+    # Backend of hot repository reads, checked on import
+    repo_backend: Literal['ormar', 'asyncpg'] = Field(
+        'ormar', env='REPO_BACKEND')
+
+    # Planner's estimate instead of exact total for unfiltered task pages
+    approximate_task_total: bool = Field(False, env='APPROXIMATE_TASK_TOTAL')
+
+    # Render task and user listings with orjson straight from rows
+    fast_json: bool = Field(False, env='FAST_JSON')
+
+    # Admission control per router: requests running at once (0 for no
+    # limit), requests waiting for a slot and how long they may wait
+    auth_concurrency: int = Field(4, env='AUTH_CONCURRENCY')
+    auth_queue_size: int = Field(32, env='AUTH_QUEUE_SIZE')
+    auth_queue_timeout: float = Field(5.0, env='AUTH_QUEUE_TIMEOUT')
+    tasks_concurrency: int = Field(0, env='TASKS_CONCURRENCY')
+    tasks_queue_size: int = Field(256, env='TASKS_QUEUE_SIZE')
+    tasks_queue_timeout: float = Field(2.0, env='TASKS_QUEUE_TIMEOUT')
+
+    # Background job workers in every app process, 0 leaves jobs to
+    # scripts/job_worker.py. Jobs of dead workers are resumed once their
+    # heartbeat is older than job_stale_seconds
+    job_workers: int = Field(1, env='JOB_WORKERS')
+    job_batch_size: int = Field(1000, env='JOB_BATCH_SIZE')
+    job_poll_interval: float = Field(1.0, env='JOB_POLL_INTERVAL')
+    job_stale_seconds: float = Field(60.0, env='JOB_STALE_SECONDS')
+
+    # Task change feed: events queued per subscriber before it gets a
+    # resync instead, seconds between keep-alive pings and subscribers
+    # accepted per process
+    feed_queue_size: int = Field(100, env='FEED_QUEUE_SIZE')
+    feed_ping_seconds: float = Field(15.0, env='FEED_PING_SECONDS')
+    feed_max_subscribers: int = Field(1000, env='FEED_MAX_SUBSCRIBERS')
+
+    # Per route request metrics and DB timings served at /metrics
+    metrics_enabled: bool = Field(True, env='METRICS_ENABLED')
+
+    # Queries slower than this are logged, 0 disables the log
+    slow_query_ms: float = Field(200.0, env='SLOW_QUERY_MS')
+    # Requests running more queries than this are logged
+    query_budget: int = Field(10, env='QUERY_BUDGET')
+    # Add X-Query-Count/X-Query-Time-Ms headers and report N+1 queries
+    query_debug: bool = Field(False, env='QUERY_DEBUG')
+
+    # Skip schema verification on startup, for quick worker restarts
+    fast_start: bool = Field(False, env='FAST_START')
+
+    # Authenticated users cache, size 0 disables it
+    user_cache_size: int = Field(1024, env='USER_CACHE_SIZE')
+    user_cache_ttl: float = Field(60.0, env='USER_CACHE_TTL')
+    # Put user id into JWT and rebuild user from it without DB lookup
+    token_user_id: bool = Field(False, env='TOKEN_USER_ID')
+
+    # Executor for bcrypt, "thread" or "process"
+    password_hash_executor: str = Field('thread', env='PASSWORD_HASH_EXECUTOR')
+    password_hash_workers: int = Field(2, env='PASSWORD_HASH_WORKERS')
+    password_hash_queue_size: int = Field(64, env='PASSWORD_HASH_QUEUE_SIZE')
+
 
 settings = Settings()
@@ -1,13 +1,90 @@
 """Database engine and base models"""
 
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
 import ormar
 import databases
 import sqlalchemy
+from sqlalchemy.dialects.postgresql import JSONB
 
 from .config import settings
 
 
-database = databases.Database(settings.db_url)
+# Set inside repo methods which are allowed to read from replica
+_read_from_replica = ContextVar('read_from_replica', default=False)
+# Set for the rest of a request after it wrote something
+_stick_to_primary = ContextVar('stick_to_primary', default=False)
+
+
+class Database(databases.Database):
+    """Primary database which can route reads to an optional replica.
+
+    Only queries made inside `read_replica()` go to the replica, and only
+    until the current request calls `stick_to_primary()`, so writes and
+    reads after them always see the primary.
+    """
+
+    def __init__(self, url: str, *, replica_url: Optional[str] = None,
+                 **options):
+        super().__init__(url, **options)
+        self.replica = None
+        if replica_url:
+            self.replica = databases.Database(replica_url, **options)
+
+    async def connect(self) -> None:
+        await super().connect()
+        if self.replica is not None:
+            await self.replica.connect()
+
+    async def disconnect(self) -> None:
+        if self.replica is not None:
+            await self.replica.disconnect()
+        await super().disconnect()
+
+    def reader(self) -> databases.Database:
+        """Database which read-only queries should go to right now"""
+        if self.replica is not None and not _stick_to_primary.get():
+            return self.replica
+        return self
+
+    def connection(self) -> databases.core.Connection:
+        if _read_from_replica.get():
+            reader = self.reader()
+            if reader is not self:
+                return reader.connection()
+        return super().connection()
+
+    @contextmanager
+    def read_replica(self):
+        """Routes queries made inside the block to the replica"""
+        token = _read_from_replica.set(True)
+        try:
+            yield
+        finally:
+            _read_from_replica.reset(token)
+
+    @staticmethod
+    def stick_to_primary() -> None:
+        """Sends all following reads of the current request to primary"""
+        _stick_to_primary.set(True)
+
+    @staticmethod
+    def is_stuck_to_primary() -> bool:
+        return _stick_to_primary.get()
+
+
+database = Database(
+    settings.db_url,
+    replica_url=settings.db_replica_url,
+    min_size=settings.db_pool_min_size,
+    max_size=settings.db_pool_max_size,
+    statement_cache_size=settings.db_statement_cache_size,
+    max_inactive_connection_lifetime=(
+        settings.db_max_inactive_connection_lifetime),
+    command_timeout=settings.db_command_timeout
+)
 metadata = sqlalchemy.MetaData()
 
 
@@ -32,6 +109,12 @@ class TodoTask(ormar.Model):
     """Model for Tasks"""
     class Meta(BaseMeta):
         tablename = "tasks"
+        # Serve listings filtered by user and/or status ordered by id
+        constraints = [
+            ormar.IndexColumns("user", "status", "id",
+                               name="ix_tasks_user_status_id"),
+            ormar.IndexColumns("status", "id", name="ix_tasks_status_id"),
+        ]
 
     id: int = ormar.Integer(primary_key=True)
     title: str = ormar.String(max_length=255, nullable=False)
@@ -40,3 +123,58 @@ class TodoTask(ormar.Model):
                                choices=["New", "In Progress", "Completed"])
     user: TodoUser = ormar.ForeignKey(TodoUser, related_name="tasks",
                                       ondelete="CASCADE", nullable=False)
+    # Bumped by DB trigger on every update
+    version: int = ormar.Integer(default=1, nullable=False,
+                                 server_default="1")
+
+
+# Per listing scope version and task count maintained by triggers on
+# tasks, see migrations. user_id 0 means any user, status '*' means any
+# status. Scopes of any user are split into shards to spread writers,
+# a scope's version and count are sums over its shards.
+task_list_stats = sqlalchemy.Table(
+    "task_list_stats",
+    metadata,
+    sqlalchemy.Column("user_id", sqlalchemy.Integer, primary_key=True),
+    sqlalchemy.Column("status", sqlalchemy.String(20), primary_key=True),
+    sqlalchemy.Column("shard", sqlalchemy.SmallInteger, primary_key=True,
+                      server_default="0"),
+    sqlalchemy.Column("version", sqlalchemy.BigInteger, nullable=False,
+                      server_default="0"),
+    sqlalchemy.Column("task_count", sqlalchemy.BigInteger, nullable=False,
+                      server_default="0"),
+)
+ANY_USER = 0
+ANY_STATUS = '*'
+
+
+# Queue of background jobs processed in batches, see app/jobs.py
+jobs = sqlalchemy.Table(
+    "jobs",
+    metadata,
+    sqlalchemy.Column("id", sqlalchemy.BigInteger, primary_key=True),
+    sqlalchemy.Column("kind", sqlalchemy.String(50), nullable=False),
+    sqlalchemy.Column("user_id", sqlalchemy.Integer, nullable=True),
+    sqlalchemy.Column("params", JSONB, nullable=False,
+                      server_default=sqlalchemy.text("'{}'::jsonb")),
+    sqlalchemy.Column("status", sqlalchemy.String(20), nullable=False,
+                      server_default="queued"),
+    sqlalchemy.Column("total", sqlalchemy.BigInteger, nullable=True),
+    sqlalchemy.Column("done", sqlalchemy.BigInteger, nullable=False,
+                      server_default="0"),
+    sqlalchemy.Column("attempts", sqlalchemy.Integer, nullable=False,
+                      server_default="0"),
+    sqlalchemy.Column("error", sqlalchemy.Text, nullable=True),
+    sqlalchemy.Column("created_at", sqlalchemy.DateTime(timezone=True),
+                      nullable=False, server_default=sqlalchemy.func.now()),
+    sqlalchemy.Column("started_at", sqlalchemy.DateTime(timezone=True),
+                      nullable=True),
+    sqlalchemy.Column("heartbeat_at", sqlalchemy.DateTime(timezone=True),
+                      nullable=True),
+    sqlalchemy.Column("finished_at", sqlalchemy.DateTime(timezone=True),
+                      nullable=True),
+    sqlalchemy.Index("ix_jobs_pending", "id",
+                     postgresql_where=sqlalchemy.text(
+                         "status IN ('queued', 'running')")),
+    sqlalchemy.Index("ix_jobs_user_id", "user_id"),
+)
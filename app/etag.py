@@ -0,0 +1,40 @@
+"""ETag helpers for conditional GET"""
+
+import hashlib
+from typing import Optional
+
+from fastapi import Response
+
+from app.settings import CACHE_CONTROL
+
+
+def make_etag(*parts) -> str:
+    """Strong ETag built from values identifying representation version"""
+    digest = hashlib.sha1(
+        ":".join(str(part) for part in parts).encode()).hexdigest()
+    return f'"{digest[:20]}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether If-None-Match header contains given ETag"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+
+    candidates = (tag.strip() for tag in if_none_match.split(","))
+    return etag in (tag[2:] if tag.startswith("W/") else tag
+                    for tag in candidates)
+
+
+def cache_headers(etag: str) -> dict:
+    return {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers=cache_headers(etag))
+
+
+def set_cache_headers(response: Optional[Response], etag: str) -> None:
+    if response is not None:
+        response.headers.update(cache_headers(etag))
@@ -0,0 +1,62 @@
+"""Streaming serializers for exported rows"""
+
+import csv
+import io
+import json
+from typing import AsyncIterator, Callable, Mapping
+
+TASK_CSV_COLUMNS = ('id', 'title', 'description', 'status',
+                    'user_id', 'username')
+
+# Rows are sent to the client in pieces of about this many characters
+CHUNK_SIZE = 64 * 1024
+
+
+def task_row_to_dict(row: Mapping) -> dict:
+    """Plain task row in the same shape as TaskOut"""
+    return {
+        'id': row['id'],
+        'title': row['title'],
+        'description': row['description'],
+        'status': row['status'],
+        'user': {'id': row['user_id'], 'username': row['username']},
+    }
+
+
+def user_row_to_dict(row: Mapping) -> dict:
+    """Plain user row in the same shape as UserOut"""
+    return {'id': row['id'], 'username': row['username']}
+
+
+async def ndjson_chunks(rows: AsyncIterator[Mapping],
+                        to_dict: Callable = dict) -> AsyncIterator[str]:
+    """One JSON document per line"""
+    buffer = io.StringIO()
+    async for row in rows:
+        buffer.write(json.dumps(to_dict(row), ensure_ascii=False))
+        buffer.write('\n')
+        if buffer.tell() >= CHUNK_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+async def csv_chunks(rows: AsyncIterator[Mapping],
+                     columns: tuple) -> AsyncIterator[str]:
+    """CSV header followed by one line per row"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    writer.writerow(columns)
+    async for row in rows:
+        writer.writerow([row[column] for column in columns])
+        if buffer.tell() >= CHUNK_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue()
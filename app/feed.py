@@ -0,0 +1,187 @@
+"""Real-time feed of task changes fed by Postgres LISTEN/NOTIFY.
+
+Triggers on `tasks` send a notification on TASK_CHANGES_CHANNEL for
+every created, updated and deleted task once its transaction commits,
+so bulk endpoints, jobs and imports are seen as well as single task
+writes. Every process keeps one dedicated connection listening on the
+channel and fans events out to the queues of its subscribers, filtered
+by user and status.
+
+A subscriber which doesn't keep up never slows down the listener: once
+its queue is full the queued events are dropped and replaced by a single
+`resync` event, and so are events missed while the listener reconnects.
+On `resync` clients reload tasks in scope the way they would on start.
+"""
+
+import asyncio
+import json
+import logging
+from typing import Optional, Set
+
+import asyncpg
+import databases
+
+from app.config import settings
+from app.db import database
+from app.settings import TASK_CHANGES_CHANNEL
+
+logger = logging.getLogger(__name__)
+
+RESYNC = {'op': 'resync'}
+
+# Seconds between attempts to restore the listener connection
+RECONNECT_MIN_DELAY = 0.5
+RECONNECT_MAX_DELAY = 30.0
+
+
+class FeedSaturated(Exception):
+    """Raised when process has as many subscribers as it accepts"""
+
+
+class Subscription():
+    """Bounded queue of task change events of one subscriber"""
+
+    def __init__(self, user_id: Optional[int], status: Optional[str],
+                 queue_size: int):
+        self.user_id = user_id
+        self.status = status
+        self.queue: asyncio.Queue = asyncio.Queue(queue_size)
+        self.overflows = 0
+
+    def matches(self, event: dict) -> bool:
+        if self.user_id is not None and \
+                event.get('user_id') not in (None, self.user_id):
+            return False
+        if self.status is None or event['op'] == 'resync':
+            return True
+        # Tasks moved out of the status are reported to its subscribers
+        return self.status in (event.get('status'), event.get('old_status'))
+
+    def push(self, event: dict) -> None:
+        """Queues event, a full queue is replaced by a single resync"""
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflows += 1
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC)
+
+    async def get(self, timeout: float) -> Optional[dict]:
+        """Next event, None if there was none for `timeout` seconds"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class TaskFeed():
+    """Listener of task change notifications shared by subscribers.
+
+    The listener connection is opened on the first subscription and kept
+    until `stop()`, it doesn't take a connection of the pool.
+    """
+
+    def __init__(self, db: databases.Database, channel: str,
+                 queue_size: int, max_subscribers: int):
+        self.db = db
+        self.channel = channel
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self.events = 0
+        self.overflows = 0
+        self.reconnects = 0
+        self.listening = False
+        self._subscribers: Set[Subscription] = set()
+        self._listener: Optional[asyncio.Task] = None
+
+    def subscribe(self, user_id: Optional[int] = None,
+                  status: Optional[str] = None) -> Subscription:
+        if len(self._subscribers) >= self.max_subscribers:
+            raise FeedSaturated()
+
+        subscription = Subscription(user_id, status, self.queue_size)
+        self._subscribers.add(subscription)
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.create_task(self._listen())
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        if subscription in self._subscribers:
+            self._subscribers.discard(subscription)
+            self.overflows += subscription.overflows
+
+    def publish(self, event: dict) -> None:
+        """Hands event to every subscriber it matches"""
+        self.events += 1
+        for subscription in self._subscribers:
+            if subscription.matches(event):
+                subscription.push(event)
+
+    def _on_notification(self, connection, pid: int, channel: str,
+                         payload: str) -> None:
+        try:
+            event = json.loads(payload)
+        except ValueError:
+            logger.warning("Invalid task change notification: %r", payload)
+            return
+        self.publish(event)
+
+    async def _listen(self) -> None:
+        dsn = str(self.db.url.replace(driver=''))
+        delay = RECONNECT_MIN_DELAY
+        while True:
+            try:
+                connection = await asyncpg.connect(dsn)
+            except (OSError, asyncpg.PostgresError) as error:
+                logger.warning("Task feed can't connect, retrying in %ss: %s",
+                               delay, error)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, RECONNECT_MAX_DELAY)
+                continue
+
+            closed = asyncio.Event()
+            connection.add_termination_listener(lambda _: closed.set())
+            try:
+                await connection.add_listener(self.channel,
+                                              self._on_notification)
+                self.listening = True
+                delay = RECONNECT_MIN_DELAY
+                # Changes made before LISTEN took effect are not delivered
+                self.publish(RESYNC)
+                await closed.wait()
+                logger.warning("Task feed connection lost, reconnecting")
+            except (OSError, asyncpg.PostgresError) as error:
+                logger.warning("Task feed failed to listen: %s", error)
+            finally:
+                self.listening = False
+                if not connection.is_closed():
+                    await connection.close()
+            self.reconnects += 1
+
+    async def stop(self) -> None:
+        """Closes the listener, subscribers are left without events"""
+        if self._listener is not None:
+            self._listener.cancel()
+            await asyncio.gather(self._listener, return_exceptions=True)
+            self._listener = None
+
+    def stats(self) -> dict:
+        return {
+            'listening': self.listening,
+            'subscribers': len(self._subscribers),
+            'max_subscribers': self.max_subscribers,
+            'events': self.events,
+            'overflows': self.overflows + sum(
+                subscription.overflows
+                for subscription in self._subscribers),
+            'reconnects': self.reconnects,
+        }
+
+
+TASK_FEED = TaskFeed(
+    database,
+    channel=TASK_CHANGES_CHANNEL,
+    queue_size=settings.feed_queue_size,
+    max_subscribers=settings.feed_max_subscribers
+)
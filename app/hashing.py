@@ -0,0 +1,83 @@
+"""Executor pool for CPU-heavy password hashing"""
+
+import asyncio
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, \
+    ThreadPoolExecutor
+from typing import Any, Callable
+
+
+class PoolSaturated(Exception):
+    """Raised when hashing queue is full and new job can't be accepted"""
+
+
+class HashingPool():
+    """Runs blocking hashing calls in an executor with a bounded queue.
+
+    At most `workers` jobs run at once and up to `max_queue` more wait
+    for a free worker, everything above is rejected with PoolSaturated.
+    """
+
+    def __init__(self, workers: int, max_queue: int, kind: str = "thread"):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unknown executor kind '{kind}'")
+
+        self.workers = workers
+        self.max_queue = max_queue
+        self.kind = kind
+        self._executor: Executor | None = None
+
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers,
+                    thread_name_prefix="password-hashing"
+                )
+        return self._executor
+
+    async def run(self, func: Callable, *args: Any) -> Any:
+        if self.in_flight >= self.workers + self.max_queue:
+            self.rejected += 1
+            raise PoolSaturated()
+
+        self.in_flight += 1
+        started = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self._get_executor(), func, *args)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.in_flight -= 1
+            self.completed += 1
+            self.total_seconds += elapsed
+            self.max_seconds = max(self.max_seconds, elapsed)
+
+    def stats(self) -> dict:
+        """Pool saturation metrics"""
+        return {
+            "kind": self.kind,
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "queued": max(self.in_flight - self.workers, 0),
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "avg_seconds": (self.total_seconds / self.completed
+                            if self.completed else 0.0),
+            "max_seconds": self.max_seconds,
+        }
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,189 @@
+"""Streaming parsers and loader of imported tasks.
+
+Input is read as a stream of byte chunks, rows are validated with
+TaskInput and loaded by `COPY` in batches of `IMPORT_BATCH_ROWS`, so
+memory stays bounded by the batch whatever the size of the input. Every
+batch is committed on its own. Accepts the same formats that task
+export produces, columns other than title, description and status are
+ignored.
+"""
+
+import csv
+import json
+from typing import AsyncIterator, List, Optional, Tuple, Union
+
+from pydantic import ValidationError
+
+from app.db import TodoTask
+from app.repo.tasks import TaskRepo
+from app.schemas.task_schemas import ExportFormat, TaskInput
+
+# Rows validated and copied at once
+IMPORT_BATCH_ROWS = 5000
+# Errors reported back, the rest are only counted
+IMPORT_MAX_ERRORS = 1000
+# Longer lines and CSV records are skipped as errors
+IMPORT_MAX_LINE_BYTES = 1024 * 1024
+
+TASK_IMPORT_COLUMNS = ('title', 'description', 'status')
+TITLE_MAX_LENGTH = TodoTask.Meta.table.c.title.type.length
+
+ParsedRow = Tuple[int, Union[dict, str]]
+
+
+async def _lines(
+    chunks: AsyncIterator[bytes]
+) -> AsyncIterator[Optional[str]]:
+    """Decoded lines of a byte stream without line endings, None in place
+    of every line longer than IMPORT_MAX_LINE_BYTES
+    """
+    pending = b''
+    skipping = False
+    async for chunk in chunks:
+        pending += chunk
+        *lines, pending = pending.split(b'\n')
+        for line in lines:
+            if skipping:
+                skipping = False
+                yield None
+            else:
+                yield line.rstrip(b'\r').decode('utf-8-sig', 'replace')
+        if len(pending) > IMPORT_MAX_LINE_BYTES:
+            pending = b''
+            skipping = True
+
+    if skipping:
+        yield None
+    elif pending:
+        yield pending.rstrip(b'\r').decode('utf-8-sig', 'replace')
+
+
+TOO_LONG = f'Line longer than {IMPORT_MAX_LINE_BYTES} bytes'
+
+
+async def parse_ndjson(chunks: AsyncIterator[bytes]) -> AsyncIterator[
+        ParsedRow]:
+    """(line number, JSON object or error) of every non-blank line"""
+    number = 0
+    async for line in _lines(chunks):
+        number += 1
+        if line is None:
+            yield number, TOO_LONG
+            continue
+        if not line.strip():
+            continue
+        try:
+            document = json.loads(line)
+        except ValueError as error:
+            yield number, f'Invalid JSON: {error}'
+            continue
+        if not isinstance(document, dict):
+            yield number, 'Expected a JSON object'
+            continue
+        yield number, document
+
+
+async def parse_csv(chunks: AsyncIterator[bytes]) -> AsyncIterator[
+        ParsedRow]:
+    """(line number, row by header or error) of every CSV record.
+
+    A record ends at the first line break outside of quotes, so quoted
+    values may span lines.
+    """
+    header = None
+    record: List[str] = []
+    number = start = size = 0
+    async for line in _lines(chunks):
+        number += 1
+        if not record:
+            start, size = number, 0
+        if line is None or size + len(line) > IMPORT_MAX_LINE_BYTES:
+            record = []
+            yield start, TOO_LONG
+            continue
+        record.append(line)
+        size += len(line)
+        if sum(part.count('"') for part in record) % 2:
+            continue
+
+        text = '\n'.join(record)
+        record = []
+        if not text.strip():
+            continue
+        try:
+            values = next(csv.reader([text]))
+        except csv.Error as error:
+            yield start, f'Invalid CSV: {error}'
+            continue
+
+        if header is None:
+            header = values
+        elif len(values) != len(header):
+            yield start, (f'Expected {len(header)} values, '
+                          f'got {len(values)}')
+        else:
+            yield start, dict(zip(header, values))
+
+    if record:
+        yield start, 'Invalid CSV: unterminated quoted value'
+
+
+PARSERS = {
+    ExportFormat.NDJSON: parse_ndjson,
+    ExportFormat.CSV: parse_csv,
+}
+
+
+def _task_record(fields: dict, user_id: int) -> tuple:
+    """Row of `tasks` for COPY, raises ValueError if fields are invalid"""
+    # Empty CSV values mean missing, so status defaults to New
+    task = TaskInput(**{
+        column: fields[column] for column in TASK_IMPORT_COLUMNS
+        if fields.get(column) not in (None, '')
+    })
+    if len(task.title) > TITLE_MAX_LENGTH:
+        raise ValueError(
+            f'title: longer than {TITLE_MAX_LENGTH} characters')
+    status = task.status.value if task.status is not None else None
+    return task.title, task.description, status, user_id
+
+
+def _error_text(error: ValueError) -> str:
+    if isinstance(error, ValidationError):
+        return '; '.join(
+            f"{'.'.join(map(str, detail['loc']))}: {detail['msg']}"
+            for detail in error.errors())
+    return str(error)
+
+
+async def load_tasks(chunks: AsyncIterator[bytes],
+                     import_format: ExportFormat,
+                     user_id: int,
+                     batch_rows: int = IMPORT_BATCH_ROWS) -> dict:
+    """Loads valid rows as tasks of the user, reports the invalid ones"""
+    result = {'imported': 0, 'failed': 0, 'errors': []}
+
+    def fail(line: int, error: str) -> None:
+        result['failed'] += 1
+        if len(result['errors']) < IMPORT_MAX_ERRORS:
+            result['errors'].append({'line': line, 'error': error})
+
+    batch = []
+    async for line, fields in PARSERS[import_format](chunks):
+        if isinstance(fields, str):
+            fail(line, fields)
+            continue
+
+        try:
+            batch.append(_task_record(fields, user_id))
+        except ValueError as error:
+            fail(line, _error_text(error))
+            continue
+
+        if len(batch) >= batch_rows:
+            result['imported'] += await TaskRepo.copy_tasks(batch)
+            batch = []
+
+    if batch:
+        result['imported'] += await TaskRepo.copy_tasks(batch)
+    return result
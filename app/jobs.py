@@ -0,0 +1,165 @@
+"""Background jobs processed in batches by in-process workers.
+
+Endpoints enqueue a row in `jobs` and return its id right away. Workers
+claim queued jobs one at a time and run their handler, which works in
+batches of `job_batch_size` rows, each a statement of its own, so no
+long transaction is held and progress is stored after every batch.
+A job whose worker died is claimed again once its heartbeat is older
+than `job_stale_seconds`, so handlers must be safe to resume.
+"""
+
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from app.config import settings
+from app.repo.jobs import JobRepo
+from app.repo.tasks import TaskRepo
+from app.repo.users import UserRepo
+from app.schemas.job_schemas import JobKind, JobStatus
+from app.schemas.task_schemas import TaskStatus
+
+logger = logging.getLogger(__name__)
+
+
+class JobProgress():
+    """Progress of a running job, every update refreshes its heartbeat"""
+
+    def __init__(self, job: dict):
+        self.job_id = job['id']
+        self.done = job['done']
+
+    async def set_total(self, total: int) -> None:
+        await JobRepo.update_progress(self.job_id, total=total)
+
+    async def advance(self, count: int) -> None:
+        self.done += count
+        await JobRepo.update_progress(self.job_id, done=self.done)
+
+
+async def delete_account(job: dict, progress: JobProgress) -> None:
+    """Deletes tasks of the user in batches, then the user itself"""
+    user_id = job['user_id']
+    _, total = await TaskRepo.get_list_stats({'user': user_id})
+    await progress.set_total(progress.done + total)
+
+    batch_size = settings.job_batch_size
+    while True:
+        deleted = await TaskRepo.delete_user_tasks_batch(user_id, batch_size)
+        await progress.advance(deleted)
+        if deleted < batch_size:
+            break
+
+    await UserRepo.delete_user(user_id)
+
+
+async def set_task_status(job: dict, progress: JobProgress) -> None:
+    """Moves all user's tasks, or only tasks in `from_status`, to status"""
+    user_id = job['user_id']
+    status = TaskStatus(job['params']['status'])
+    from_status = job['params'].get('from_status')
+    from_status = TaskStatus(from_status) if from_status else None
+
+    if from_status is not None:
+        _, total = await TaskRepo.get_list_stats(
+            {'user': user_id, 'status': from_status})
+    else:
+        _, all_tasks = await TaskRepo.get_list_stats({'user': user_id})
+        _, in_status = await TaskRepo.get_list_stats(
+            {'user': user_id, 'status': status})
+        total = all_tasks - in_status
+    await progress.set_total(progress.done + total)
+
+    batch_size = settings.job_batch_size
+    while True:
+        changed = await TaskRepo.set_user_tasks_status_batch(
+            user_id, status, from_status, batch_size)
+        await progress.advance(changed)
+        if changed < batch_size:
+            break
+
+
+JOB_HANDLERS: Dict[str, Callable[[dict, JobProgress], Awaitable[None]]] = {
+    JobKind.DeleteAccount.value: delete_account,
+    JobKind.SetTaskStatus.value: set_task_status,
+}
+
+
+class JobRunner():
+    """Runs queued jobs in `workers` coroutines of the current process.
+
+    Idle workers poll for jobs every `poll_interval` seconds and are
+    woken up right away by `notify()` when this process enqueued one.
+    """
+
+    def __init__(self, workers: int, poll_interval: float,
+                 stale_seconds: float):
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.stale_seconds = stale_seconds
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+
+    def start(self) -> None:
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._work())
+                       for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        """Cancels workers, their jobs are resumed once they get stale"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def notify(self) -> None:
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def run_next(self) -> bool:
+        """Claims and runs one job, False if there was none"""
+        job = await JobRepo.claim_job(self.stale_seconds)
+        if job is None:
+            return False
+
+        await run_job(job)
+        return True
+
+    async def _work(self) -> None:
+        while True:
+            try:
+                if await self.run_next():
+                    continue
+            except Exception:
+                logger.exception("Job worker failed to claim a job")
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(),
+                                       self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+
+async def run_job(job: dict) -> None:
+    """Runs handler of a claimed job and stores how it ended"""
+    handler = JOB_HANDLERS.get(job['kind'])
+    if handler is None:
+        await JobRepo.finish_job(job['id'], JobStatus.Failed,
+                                 f"Unknown job kind '{job['kind']}'")
+        return
+
+    try:
+        await handler(job, JobProgress(job))
+    except Exception as error:
+        logger.exception("Job %s (%s) failed", job['id'], job['kind'])
+        await JobRepo.finish_job(job['id'], JobStatus.Failed, str(error))
+    else:
+        await JobRepo.finish_job(job['id'], JobStatus.Completed)
+
+
+JOB_RUNNER = JobRunner(
+    workers=settings.job_workers,
+    poll_interval=settings.job_poll_interval,
+    stale_seconds=settings.job_stale_seconds
+)
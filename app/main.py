@@ -1,12 +1,28 @@
 """App startup, shutdown and root endpoints handelings"""
 
-from fastapi import FastAPI, APIRouter
+import time
+
+from asyncpg.exceptions import ForeignKeyViolationError
+from fastapi import FastAPI, APIRouter, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi_pagination import add_pagination
-import sqlalchemy
-from app.config import settings
 
-from app.db import database, metadata
+from app import IMPORT_STARTED
+from app.config import settings
+from app.db import database
+from app.feed import TASK_FEED
+from app.jobs import JOB_RUNNER
+from app.metrics import CONTENT_TYPE, instrument_queries, render
+from app.middleware import MetricsMiddleware, PrimaryStickinessMiddleware, \
+    QueryLogMiddleware
+from app.pool import instrument_pool
+from app.security import HASHING_POOL
+from app.settings import TASK_OWNER_FK
+from app.startup import StartupTimer, check_schema
 from app.routers.auth import router as auth_router
+from app.routers.feed import router as feed_router
+from app.routers.internal import router as internal_router
+from app.routers.jobs import router as jobs_router
 from app.routers.users import router as users_router
 from app.routers.tasks import router as tasks_router
 
@@ -30,6 +46,13 @@ app = FastAPI(
 add_pagination(app)
 router = APIRouter()
 
+if database.replica is not None:
+    app.add_middleware(PrimaryStickinessMiddleware, database=database,
+                       stick_seconds=settings.db_replica_stick_seconds)
+app.add_middleware(QueryLogMiddleware)
+if settings.metrics_enabled:
+    app.add_middleware(MetricsMiddleware)
+
 
 @app.get('/', tags=['Root'])
 def root():
@@ -42,25 +65,77 @@ def root():
     }
 
 
+@app.exception_handler(ForeignKeyViolationError)
+async def task_owner_deleted(request: Request,
+                             error: ForeignKeyViolationError):
+    """Tasks written by a user deleted after it was authenticated,
+    other workers may still have the user cached
+    """
+    if error.constraint_name != TASK_OWNER_FK:
+        raise error
+    return JSONResponse(status_code=401, content={'detail': 'User not found'})
+
+
+def databases_by_name() -> dict:
+    names = {'primary': database, 'replica': database.replica}
+    return {name: db for name, db in names.items() if db is not None}
+
+
+@app.get('/metrics', include_in_schema=False)
+async def metrics():
+    """Request, DB query and DB pool metrics in Prometheus text format"""
+    return PlainTextResponse(render(databases_by_name()),
+                             media_type=CONTENT_TYPE)
+
+
 api_prefx = '/api/v1'
 app.include_router(router, prefix=api_prefx)
 app.include_router(auth_router, prefix=api_prefx)
 app.include_router(users_router, prefix=api_prefx)
+# Before tasks router, where /tasks/changes would match /tasks/{task_id}
+app.include_router(feed_router, prefix=api_prefx)
 app.include_router(tasks_router, prefix=api_prefx)
+app.include_router(jobs_router, prefix=api_prefx)
+app.include_router(internal_router, prefix=api_prefx)
+
+
+IMPORT_MS = round((time.perf_counter() - IMPORT_STARTED) * 1000, 2)
 
 
 @app.on_event("startup")
 async def startup():
-    """Connects to DB"""
-    engine = sqlalchemy.create_engine(settings.db_url)
-    metadata.create_all(engine)
+    """Connects to DB, pools open their min size connections right away,
+    schema is managed by migrations
+    """
+    timer = StartupTimer()
+    timer.timings['import'] = IMPORT_MS
+
+    pools = databases_by_name()
 
-    if not database.is_connected:
-        await database.connect()
+    with timer.phase('connect'):
+        if not database.is_connected:
+            await database.connect()
+        for name, db in pools.items():
+            instrument_pool(db)
+            instrument_queries(db, name)
+
+    if not settings.fast_start:
+        with timer.phase('check_schema'):
+            await check_schema(database)
+
+    if settings.job_workers > 0:
+        JOB_RUNNER.start()
+
+    app.state.startup_timings = timer.timings
+    timer.report()
 
 
 @app.on_event("shutdown")
 async def shutdown():
-    """Closes all connections to DB"""
+    """Stops job workers, task feed and closes all connections to DB"""
+    await JOB_RUNNER.stop()
+    await TASK_FEED.stop()
     if database.is_connected:
         await database.disconnect()
+
+    HASHING_POOL.shutdown()
@@ -0,0 +1,323 @@
+"""Prometheus metrics of requests, DB queries, DB pools, admission and
+task feed.
+
+Metrics are plain counters kept in process and rendered in Prometheus
+text exposition format by `GET /metrics`. Updating them is a dict lookup
+and an addition, so instrumentation stays cheap on the hot path.
+"""
+
+import time
+from bisect import bisect_left
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import databases
+
+from app.admission import ADMISSION_CONTROLLERS
+from app.feed import TASK_FEED
+from app.pool import InstrumentedPool, pool_stats
+from app.querylog import record_query
+
+
+# charset is appended by PlainTextResponse
+CONTENT_TYPE = 'text/plain; version=0.0.4'
+
+# Seconds, from sub-millisecond queries to slow requests
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25,
+                   0.5, 1.0, 2.5, 5.0, 10.0)
+
+Labels = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', r'\\').replace('\n', r'\n') \
+        .replace('"', r'\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric():
+    """Named metric with values per combination of label values"""
+
+    kind = 'untyped'
+
+    def __init__(self, name: str, documentation: str,
+                 labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values: Dict[Labels, float] = {}
+
+    def set(self, value: float, labels: Labels = ()) -> None:
+        self.values[labels] = value
+
+    def _label_text(self, labels: Labels,
+                    extra: Optional[Tuple[str, str]] = None) -> str:
+        pairs = list(zip(self.labelnames, labels))
+        if extra is not None:
+            pairs.append(extra)
+        if not pairs:
+            return ''
+        return '{' + ','.join(
+            f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+    def samples(self) -> Iterator[str]:
+        for labels, value in self.values.items():
+            yield f'{self.name}{self._label_text(labels)} ' \
+                f'{_format_value(value)}'
+
+    def render(self) -> List[str]:
+        return [f'# HELP {self.name} {self.documentation}',
+                f'# TYPE {self.name} {self.kind}', *self.samples()]
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, labels: Labels = (), amount: float = 1) -> None:
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def inc(self, labels: Labels = (), amount: float = 1) -> None:
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def dec(self, labels: Labels = (), amount: float = 1) -> None:
+        self.values[labels] = self.values.get(labels, 0) - amount
+
+
+class Histogram(Metric):
+    """Observations counted in buckets, rendered cumulative"""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str,
+                 labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per labels: count of every bucket, of +Inf, then sum
+        self.series: Dict[Labels, list] = {}
+
+    def observe(self, value: float, labels: Labels = ()) -> None:
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [0] * (len(self.buckets) + 1)
+            series.append(0.0)
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def samples(self) -> Iterator[str]:
+        bounds = self.buckets + (float('inf'),)
+        for labels, series in self.series.items():
+            count = 0
+            for bound, bucket_count in zip(bounds, series):
+                count += bucket_count
+                label_text = self._label_text(
+                    labels, ('le', _format_value(bound)))
+                yield f'{self.name}_bucket{label_text} {count}'
+            label_text = self._label_text(labels)
+            yield f'{self.name}_sum{label_text} {_format_value(series[-1])}'
+            yield f'{self.name}_count{label_text} {count}'
+
+
+HTTP_REQUESTS = Counter(
+    'http_requests_total', 'HTTP requests by route and status code',
+    ('method', 'path', 'status'))
+HTTP_REQUEST_DURATION = Histogram(
+    'http_request_duration_seconds', 'HTTP request latency by route',
+    ('method', 'path'))
+HTTP_REQUESTS_IN_PROGRESS = Gauge(
+    'http_requests_in_progress', 'HTTP requests being served right now')
+
+DB_QUERY_DURATION = Histogram(
+    'db_query_duration_seconds', 'DB query latency by database and call',
+    ('database', 'operation'))
+DB_QUERY_ERRORS = Counter(
+    'db_query_errors_total', 'DB queries which raised',
+    ('database', 'operation'))
+
+DB_POOL_CONNECTIONS = Gauge(
+    'db_pool_connections', 'Connections of DB pool by state',
+    ('database', 'state'))
+DB_POOL_MAX_CONNECTIONS = Gauge(
+    'db_pool_max_connections', 'Max size of DB pool', ('database',))
+DB_POOL_WAITING = Gauge(
+    'db_pool_waiting', 'Callers waiting to acquire a connection',
+    ('database',))
+DB_POOL_ACQUIRES = Counter(
+    'db_pool_acquires_total', 'Connections acquired from DB pool',
+    ('database',))
+DB_POOL_ACQUIRE_SECONDS = Counter(
+    'db_pool_acquire_seconds_total', 'Time spent acquiring connections',
+    ('database',))
+
+ADMISSION_ACTIVE = Gauge(
+    'admission_active_requests', 'Requests admitted and running by router',
+    ('router',))
+ADMISSION_QUEUED = Gauge(
+    'admission_queued_requests', 'Requests waiting for admission by router',
+    ('router',))
+ADMISSION_REJECTIONS = Counter(
+    'admission_rejections_total', 'Requests shed by router and reason',
+    ('router', 'reason'))
+
+FEED_SUBSCRIBERS = Gauge(
+    'task_feed_subscribers', 'Subscribers of task change feed')
+FEED_EVENTS = Counter(
+    'task_feed_events_total', 'Task change notifications received')
+FEED_OVERFLOWS = Counter(
+    'task_feed_overflows_total',
+    'Times a slow subscriber got resync instead of queued events')
+
+METRICS = (
+    HTTP_REQUESTS, HTTP_REQUEST_DURATION, HTTP_REQUESTS_IN_PROGRESS,
+    DB_QUERY_DURATION, DB_QUERY_ERRORS, DB_POOL_CONNECTIONS,
+    DB_POOL_MAX_CONNECTIONS, DB_POOL_WAITING, DB_POOL_ACQUIRES,
+    DB_POOL_ACQUIRE_SECONDS, ADMISSION_ACTIVE, ADMISSION_QUEUED,
+    ADMISSION_REJECTIONS, FEED_SUBSCRIBERS, FEED_EVENTS, FEED_OVERFLOWS,
+)
+
+
+class _TimedConnection():
+    """databases backend connection proxy timing every query"""
+
+    def __init__(self, connection, name: str):
+        self._connection = connection
+        self._name = name
+
+    async def _timed(self, operation: str, query, call):
+        started = time.perf_counter()
+        try:
+            return await call
+        except BaseException:
+            DB_QUERY_ERRORS.inc((self._name, operation))
+            raise
+        finally:
+            duration = time.perf_counter() - started
+            DB_QUERY_DURATION.observe(duration, (self._name, operation))
+            record_query(query, duration, self._name)
+
+    async def fetch_all(self, query):
+        return await self._timed('fetch_all', query,
+                                 self._connection.fetch_all(query))
+
+    async def fetch_one(self, query):
+        return await self._timed('fetch_one', query,
+                                 self._connection.fetch_one(query))
+
+    async def fetch_val(self, query, column=0):
+        return await self._timed('fetch_val', query,
+                                 self._connection.fetch_val(query, column))
+
+    async def execute(self, query):
+        return await self._timed('execute', query,
+                                 self._connection.execute(query))
+
+    async def execute_many(self, queries):
+        return await self._timed('execute_many',
+                                 queries[0] if queries else '',
+                                 self._connection.execute_many(queries))
+
+    @property
+    def raw_connection(self):
+        return _TimedRawConnection(self._connection.raw_connection,
+                                   self._timed)
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+
+class _TimedRawConnection():
+    """asyncpg connection proxy timing statements of the fast path"""
+
+    def __init__(self, connection, timed):
+        self._connection = connection
+        self._timed = timed
+
+    async def fetch(self, query, *args, **kwargs):
+        return await self._timed('fetch', query, self._connection.fetch(
+            query, *args, **kwargs))
+
+    async def fetchrow(self, query, *args, **kwargs):
+        return await self._timed('fetchrow', query, self._connection.fetchrow(
+            query, *args, **kwargs))
+
+    async def fetchval(self, query, *args, **kwargs):
+        return await self._timed('fetchval', query, self._connection.fetchval(
+            query, *args, **kwargs))
+
+    async def execute(self, query, *args, **kwargs):
+        return await self._timed('execute', query, self._connection.execute(
+            query, *args, **kwargs))
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+
+def instrument_queries(database: databases.Database, name: str) -> None:
+    """Times queries made through `databases`, does nothing if done already.
+
+    Queries are also added to the query log of the current request,
+    so are statements of `raw_connection` (the fast path) except COPY.
+    """
+    backend = database._backend
+    if getattr(backend, '_metrics_name', None) is not None:
+        return
+
+    connection = backend.connection
+    backend.connection = lambda: _TimedConnection(connection(), name)
+    backend._metrics_name = name
+
+
+def collect_pool(database: databases.Database, name: str) -> None:
+    stats = pool_stats(database)
+    if not stats['connected']:
+        return
+
+    labels = (name,)
+    DB_POOL_CONNECTIONS.set(stats['idle'], (name, 'idle'))
+    DB_POOL_CONNECTIONS.set(stats['in_use'], (name, 'in_use'))
+    DB_POOL_MAX_CONNECTIONS.set(stats['max_size'], labels)
+
+    pool = database._backend._pool
+    if isinstance(pool, InstrumentedPool):
+        DB_POOL_WAITING.set(pool.stats.waiting, labels)
+        DB_POOL_ACQUIRES.set(pool.stats.acquires, labels)
+        DB_POOL_ACQUIRE_SECONDS.set(pool.stats.total_wait, labels)
+
+
+def collect_admission() -> None:
+    for controller in ADMISSION_CONTROLLERS:
+        labels = (controller.name,)
+        ADMISSION_ACTIVE.set(controller.active, labels)
+        ADMISSION_QUEUED.set(controller.queued, labels)
+        ADMISSION_REJECTIONS.set(controller.rejected_queue_full,
+                                 (controller.name, 'queue_full'))
+        ADMISSION_REJECTIONS.set(controller.rejected_timeout,
+                                 (controller.name, 'timeout'))
+
+
+def collect_feed() -> None:
+    stats = TASK_FEED.stats()
+    FEED_SUBSCRIBERS.set(stats['subscribers'])
+    FEED_EVENTS.set(stats['events'])
+    FEED_OVERFLOWS.set(stats['overflows'])
+
+
+def render(databases_by_name: Dict[str, databases.Database]) -> str:
+    """All metrics in text exposition format, gauges are read right now"""
+    for name, database in databases_by_name.items():
+        collect_pool(database, name)
+    collect_admission()
+    collect_feed()
+
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
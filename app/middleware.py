@@ -0,0 +1,158 @@
+"""ASGI middlewares"""
+
+import time
+from typing import Callable, Dict, Optional
+
+from starlette.datastructures import MutableHeaders
+from starlette.requests import HTTPConnection
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import settings
+from app.db import Database
+from app.metrics import HTTP_REQUEST_DURATION, HTTP_REQUESTS, \
+    HTTP_REQUESTS_IN_PROGRESS
+from app.querylog import check_budget, track_queries
+
+
+class PrimaryStickinessMiddleware():
+    """Keeps reads of a client on primary DB for a while after it wrote.
+
+    A request which wrote something gets a cookie with the time until
+    which following requests of the same client skip the replica, so
+    they see their own writes despite replication lag. Sending
+    `X-Read-Primary: 1` forces primary for a single request.
+    """
+
+    cookie_name = 'read_primary_until'
+
+    def __init__(self, app: ASGIApp, database: Database,
+                 stick_seconds: float):
+        self.app = app
+        self.database = database
+        self.stick_seconds = stick_seconds
+
+    def _wants_primary(self, scope: Scope) -> bool:
+        connection = HTTPConnection(scope)
+        if connection.headers.get('x-read-primary') == '1':
+            return True
+
+        try:
+            until = float(connection.cookies.get(self.cookie_name, 0))
+        except ValueError:
+            return False
+        return until > time.time()
+
+    async def __call__(self, scope: Scope, receive: Receive,
+                       send: Send) -> None:
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        already_stuck = self._wants_primary(scope)
+        if already_stuck:
+            self.database.stick_to_primary()
+
+        async def send_with_cookie(message: Message) -> None:
+            if (message['type'] == 'http.response.start'
+                    and not already_stuck
+                    and self.database.is_stuck_to_primary()):
+                until = time.time() + self.stick_seconds
+                headers = MutableHeaders(scope=message)
+                headers.append(
+                    'set-cookie',
+                    f'{self.cookie_name}={until:.3f}; '
+                    f'Max-Age={int(self.stick_seconds) + 1}; Path=/; '
+                    'HttpOnly; SameSite=Lax'
+                )
+            await send(message)
+
+        await self.app(scope, receive, send_with_cookie)
+
+
+class MetricsMiddleware():
+    """Counts requests and their latency per route template.
+
+    Routes are labelled by their path template, e.g.
+    `/api/v1/tasks/{task_id}`, so label values stay bounded. Requests
+    matching no route share the `unmatched` label.
+    """
+
+    unmatched = 'unmatched'
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self._paths: Dict[Callable, Optional[str]] = {}
+
+    def _route_path(self, scope: Scope) -> str:
+        endpoint = scope.get('endpoint')
+        if endpoint is None:
+            return self.unmatched
+
+        try:
+            path = self._paths[endpoint]
+        except KeyError:
+            path = next((route.path for route in scope['app'].routes
+                         if getattr(route, 'endpoint', None) is endpoint),
+                        None)
+            self._paths[endpoint] = path
+        return path or self.unmatched
+
+    async def __call__(self, scope: Scope, receive: Receive,
+                       send: Send) -> None:
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        HTTP_REQUESTS_IN_PROGRESS.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            duration = time.perf_counter() - started
+            HTTP_REQUESTS_IN_PROGRESS.dec()
+            path = self._route_path(scope)
+            HTTP_REQUEST_DURATION.observe(duration, (scope['method'], path))
+            HTTP_REQUESTS.inc((scope['method'], path, str(status)))
+
+
+class QueryLogMiddleware():
+    """Attributes DB queries to the request running them.
+
+    Requests over the query budget are logged, with `QUERY_DEBUG` the
+    response also gets `X-Query-Count` and `X-Query-Time-Ms` headers
+    and statements repeated within the request are logged as N+1.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive,
+                       send: Send) -> None:
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        debug = settings.query_debug
+        with track_queries(record_statements=debug) as log:
+            async def send_with_counts(message: Message) -> None:
+                if message['type'] == 'http.response.start' and debug:
+                    headers = MutableHeaders(scope=message)
+                    headers.append('x-query-count', str(log.count))
+                    headers.append('x-query-time-ms',
+                                   f'{log.duration * 1000:.2f}')
+                    if log.count > settings.query_budget:
+                        headers.append('x-query-budget-exceeded',
+                                       str(settings.query_budget))
+                await send(message)
+
+            await self.app(scope, receive, send_with_counts)
+
+        check_budget(log, scope['method'], scope['path'])
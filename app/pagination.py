@@ -0,0 +1,48 @@
+"""Keyset (cursor) pagination helpers"""
+
+import base64
+import binascii
+import json
+from typing import Any, Generic, List, Optional, Tuple, TypeVar
+
+from pydantic.generics import GenericModel
+
+T = TypeVar("T")
+
+# Range of integer id columns cursors point into
+INT4_MIN = -2 ** 31
+INT4_MAX = 2 ** 31 - 1
+
+
+class CursorPage(GenericModel, Generic[T]):
+    """Page of items with an opaque cursor pointing to the next page"""
+    items: List[T]
+    next_cursor: Optional[str] = None
+
+    class Config:
+        extra = "forbid"
+
+
+def encode_cursor(last_id: int, sort_key: Any = None) -> str:
+    """Encodes id of the last returned row and its sort key"""
+    payload = json.dumps({"id": last_id, "key": sort_key},
+                         separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[int, Any]:
+    """Decodes cursor into (last_id, sort_key), raises ValueError if broken"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        last_id = payload["id"]
+    except (binascii.Error, UnicodeDecodeError, json.JSONDecodeError,
+            KeyError, TypeError) as error:
+        raise ValueError("Malformed cursor") from error
+
+    # bool is an int too, ids beyond int4 would fail in the query
+    if not isinstance(last_id, int) or isinstance(last_id, bool) \
+            or not INT4_MIN <= last_id <= INT4_MAX:
+        raise ValueError("Malformed cursor")
+
+    return last_id, payload.get("key")
@@ -0,0 +1,100 @@
+"""Connection pool instrumentation"""
+
+import time
+
+import databases
+
+
+class PoolStats():
+    """Counters of pool acquire calls"""
+
+    def __init__(self):
+        self.acquires = 0
+        self.waiting = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def record(self, wait: float) -> None:
+        self.acquires += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+
+
+class _TimedAcquire():
+    """Same as asyncpg acquire: can be awaited or used as `async with`"""
+
+    def __init__(self, pool, stats: PoolStats, timeout):
+        self._pool = pool
+        self._stats = stats
+        self._timeout = timeout
+        self._connection = None
+
+    async def _acquire(self):
+        self._stats.waiting += 1
+        started = time.perf_counter()
+        try:
+            return await self._pool.acquire(timeout=self._timeout)
+        finally:
+            self._stats.waiting -= 1
+            self._stats.record(time.perf_counter() - started)
+
+    def __await__(self):
+        return self._acquire().__await__()
+
+    async def __aenter__(self):
+        self._connection = await self._acquire()
+        return self._connection
+
+    async def __aexit__(self, *exc_info):
+        connection, self._connection = self._connection, None
+        await self._pool.release(connection)
+
+
+class InstrumentedPool():
+    """asyncpg pool proxy measuring how long acquiring a connection takes"""
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.stats = PoolStats()
+
+    def acquire(self, *, timeout=None) -> _TimedAcquire:
+        return _TimedAcquire(self.pool, self.stats, timeout)
+
+    def __getattr__(self, name):
+        return getattr(self.pool, name)
+
+
+def instrument_pool(database: databases.Database) -> None:
+    """Wraps pool of connected database, does nothing if already wrapped"""
+    backend = database._backend
+    if not isinstance(backend._pool, InstrumentedPool):
+        backend._pool = InstrumentedPool(backend._pool)
+
+
+def pool_stats(database: databases.Database) -> dict:
+    """Current size and acquire statistics of database pool"""
+    pool = database._backend._pool
+    if pool is None:
+        return {"connected": False}
+
+    stats = {
+        "connected": True,
+        "min_size": pool.get_min_size(),
+        "max_size": pool.get_max_size(),
+        "size": pool.get_size(),
+        "idle": pool.get_idle_size(),
+        "in_use": pool.get_size() - pool.get_idle_size(),
+    }
+
+    if isinstance(pool, InstrumentedPool):
+        acquire = pool.stats
+        stats.update({
+            "waiting": acquire.waiting,
+            "acquires": acquire.acquires,
+            "avg_acquire_ms": round(
+                acquire.total_wait / acquire.acquires * 1000, 3
+            ) if acquire.acquires else 0.0,
+            "max_acquire_ms": round(acquire.max_wait * 1000, 3),
+        })
+
+    return stats
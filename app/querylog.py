@@ -0,0 +1,85 @@
+"""Queries run by the current request.
+
+Every query made through `databases` is attributed to the query log of
+the current request, which `QueryLogMiddleware` opens. Requests running
+more queries than the budget and queries slower than the threshold are
+logged.
+"""
+
+import logging
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional
+
+from app.config import settings
+from app.settings import N_PLUS_ONE_REPEATS
+
+logger = logging.getLogger(__name__)
+
+_query_log = ContextVar('query_log', default=None)
+
+
+class QueryLog():
+    """Count and total duration of queries, texts only if recorded"""
+
+    def __init__(self, record_statements: bool = False):
+        self.count = 0
+        self.duration = 0.0
+        self.statements: Optional[Counter] = \
+            Counter() if record_statements else None
+
+    def add(self, query, duration: float) -> None:
+        self.count += 1
+        self.duration += duration
+        if self.statements is not None:
+            self.statements[str(query)] += 1
+
+    def repeated(self, times: int = N_PLUS_ONE_REPEATS) -> Dict[str, int]:
+        """Statements run at least `times` times, likely N+1 queries"""
+        if self.statements is None:
+            return {}
+        return {statement: count
+                for statement, count in self.statements.items()
+                if count >= times}
+
+
+@contextmanager
+def track_queries(record_statements: bool = False) -> Iterator[QueryLog]:
+    """Attributes queries made inside the block to a new query log"""
+    log = QueryLog(record_statements)
+    token = _query_log.set(log)
+    try:
+        yield log
+    finally:
+        _query_log.reset(token)
+
+
+def current_query_log() -> Optional[QueryLog]:
+    return _query_log.get()
+
+
+def record_query(query, duration: float, database: str) -> None:
+    """Adds query to log of current request and logs it if slow"""
+    log = _query_log.get()
+    if log is not None:
+        log.add(query, duration)
+
+    if 0 < settings.slow_query_ms <= duration * 1000:
+        # Query is rendered only when the record is emitted
+        logger.warning("Slow query on %s took %.1f ms: %s",
+                       database, duration * 1000, query)
+
+
+def check_budget(log: QueryLog, method: str, path: str) -> bool:
+    """Logs request which ran over the query budget, False if it did"""
+    within = log.count <= settings.query_budget
+    if not within:
+        logger.warning("%s %s ran %d queries in %.1f ms, budget is %d",
+                       method, path, log.count, log.duration * 1000,
+                       settings.query_budget)
+
+    for statement, count in log.repeated().items():
+        logger.warning("%s %s ran the same query %d times: %s",
+                       method, path, count, statement)
+    return within
@@ -0,0 +1,47 @@
+from typing import AsyncIterator, Iterable
+
+import sqlalchemy
+from sqlalchemy.dialects.postgresql import ARRAY
+
+from app.config import settings
+from app.db import database
+
+
+def use_fast_reads() -> bool:
+    """Whether hot reads go through raw asyncpg, see app.repo.fast"""
+    return settings.repo_backend == 'asyncpg'
+
+
+def id_in(column, ids: Iterable[int]):
+    """`column = ANY($1)` with all ids bound as a single array parameter"""
+    return column == sqlalchemy.any_(
+        sqlalchemy.literal(list(ids), type_=ARRAY(sqlalchemy.Integer)))
+
+
+async def iterate_by_keyset(
+    query,
+    id_column,
+    chunk_size: int = 1000
+) -> AsyncIterator:
+    """Yields rows of `query` fetched by chunks ordered by `id_column`.
+
+    Every chunk is a separate `WHERE id > :last_id LIMIT :chunk_size`
+    query, so memory stays constant and no connection or transaction is
+    held between chunks. Chunks are read from replica when allowed.
+    """
+    reader = database.reader()
+    query = query.order_by(id_column).limit(chunk_size)
+
+    last_id = None
+    while True:
+        chunk_query = query
+        if last_id is not None:
+            chunk_query = query.where(id_column > last_id)
+
+        rows = await reader.fetch_all(chunk_query)
+        for row in rows:
+            yield row
+
+        if len(rows) < chunk_size:
+            return
+        last_id = rows[-1][id_column.name]
@@ -0,0 +1,108 @@
+"""Raw asyncpg implementation of hot repository reads.
+
+SQL texts are built once, so every call skips ormar query building,
+SQLAlchemy compilation and model hydration. asyncpg keeps prepared
+statements per connection (see `db_statement_cache_size`), so a constant
+text is parsed and planned once per connection and then only executed.
+Enabled with `REPO_BACKEND=asyncpg`, ormar implementation in repos
+stays the reference one.
+"""
+
+from functools import lru_cache
+from typing import List, Optional
+
+import databases
+from fastapi_pagination import Params
+from fastapi_pagination.api import create_page
+
+
+class Row(dict):
+    """Plain row with attribute access, cheap to build and to validate"""
+    __slots__ = ()
+
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+
+TASK_SELECT = (
+    'SELECT t.id, t.title, t.description, t.status, t.version, '
+    't."user" AS user_id, u.username '
+    'FROM tasks t JOIN users u ON u.id = t."user"'
+)
+
+TASK_BY_ID = f'{TASK_SELECT} WHERE t.id = $1'
+
+USER_BY_USERNAME = (
+    'SELECT id, first_name, last_name, username, password '
+    'FROM users WHERE username = $1'
+)
+
+
+@lru_cache(maxsize=None)
+def task_page_query(by_user: bool, by_status: bool) -> str:
+    """Page statement for a combination of listing filters.
+
+    Each combination gets its own text instead of `$1 IS NULL OR ...`
+    conditions, so the planner can pick the matching index.
+    """
+    conditions = []
+    if by_user:
+        conditions.append(f't."user" = ${len(conditions) + 1}')
+    if by_status:
+        conditions.append(f't.status = ${len(conditions) + 1}')
+    where = f' WHERE {" AND ".join(conditions)}' if conditions else ''
+
+    limit = len(conditions) + 1
+    return (f'{TASK_SELECT}{where} ORDER BY t.id '
+            f'LIMIT ${limit} OFFSET ${limit + 1}')
+
+
+def task_from_record(record) -> Row:
+    """Task row shaped like TaskOut, owner nested as `user`"""
+    return Row(
+        id=record['id'],
+        title=record['title'],
+        description=record['description'],
+        status=record['status'],
+        version=record['version'],
+        user=Row(id=record['user_id'], username=record['username']),
+    )
+
+
+async def get_task_by_id(db: databases.Database,
+                         task_id: int) -> Optional[Row]:
+    async with db.connection() as connection:
+        record = await connection.raw_connection.fetchrow(TASK_BY_ID, task_id)
+    return task_from_record(record) if record is not None else None
+
+
+async def get_paginated_tasks(db: databases.Database,
+                              pagination_params: Params, filters: dict,
+                              total: int):
+    """Same page as ormar implementation, total is known from list stats"""
+    page = task_page_query('user' in filters, 'status' in filters)
+
+    args = []
+    if 'user' in filters:
+        args.append(filters['user'])
+    if 'status' in filters:
+        args.append(getattr(filters['status'], 'value', filters['status']))
+    raw_params = pagination_params.to_raw_params()
+
+    async with db.connection() as connection:
+        records = await connection.raw_connection.fetch(
+            page, *args, raw_params.limit, raw_params.offset)
+
+    items: List[Row] = [task_from_record(record) for record in records]
+    return create_page(items, total=total, params=pagination_params)
+
+
+async def get_user_by_username(db: databases.Database,
+                               username: str) -> Optional[Row]:
+    async with db.connection() as connection:
+        record = await connection.raw_connection.fetchrow(USER_BY_USERNAME,
+                                                          username)
+    return Row(record.items()) if record is not None else None
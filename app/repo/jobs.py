@@ -0,0 +1,76 @@
+from typing import Optional
+
+import sqlalchemy
+
+from app.db import database, jobs
+from app.schemas.job_schemas import JobKind, JobStatus
+
+
+# Oldest queued job, or running one whose worker stopped sending
+# heartbeats, locked so concurrent workers never claim the same job
+CLAIM_JOB = """
+    UPDATE jobs
+    SET status = 'running',
+        attempts = attempts + 1,
+        started_at = coalesce(started_at, now()),
+        heartbeat_at = now()
+    WHERE id = (
+        SELECT id FROM jobs
+        WHERE status = 'queued'
+           OR (status = 'running'
+               AND heartbeat_at < now() - make_interval(secs => :stale))
+        ORDER BY id
+        LIMIT 1
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING *
+"""
+
+
+class JobRepo():
+    @staticmethod
+    async def enqueue_job(kind: JobKind, user_id: Optional[int],
+                          params: Optional[dict] = None) -> dict:
+        database.stick_to_primary()
+        query = (
+            jobs.insert()
+            .values(kind=kind.value, user_id=user_id, params=params or {})
+            .returning(*jobs.c)
+        )
+        return dict((await database.fetch_one(query))._mapping)
+
+    @staticmethod
+    async def get_job(job_id: int) -> Optional[dict]:
+        """Progress changes all the time, so it's read from primary"""
+        row = await database.fetch_one(
+            jobs.select().where(jobs.c.id == job_id))
+        return dict(row._mapping) if row is not None else None
+
+    @staticmethod
+    async def claim_job(stale_seconds: float) -> Optional[dict]:
+        query = sqlalchemy.text(CLAIM_JOB) \
+            .bindparams(stale=stale_seconds).columns(*jobs.c)
+        row = await database.fetch_one(query)
+        return dict(row._mapping) if row is not None else None
+
+    @staticmethod
+    async def update_progress(job_id: int, done: Optional[int] = None,
+                              total: Optional[int] = None) -> None:
+        """Stores progress and refreshes heartbeat of a running job"""
+        values = {'heartbeat_at': sqlalchemy.func.now()}
+        if done is not None:
+            values['done'] = done
+        if total is not None:
+            values['total'] = total
+        await database.execute(
+            jobs.update().where(jobs.c.id == job_id).values(values))
+
+    @staticmethod
+    async def finish_job(job_id: int, status: JobStatus,
+                         error: Optional[str] = None) -> None:
+        await database.execute(
+            jobs.update()
+            .where(jobs.c.id == job_id)
+            .values(status=status.value, error=error,
+                    finished_at=sqlalchemy.func.now())
+        )
@@ -1,35 +1,526 @@
-from fastapi_pagination.ext.ormar import paginate
+from collections import defaultdict
+from typing import (
+    AsyncIterator,
+    Dict,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    Tuple
+)
+
+import sqlalchemy
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from fastapi_pagination import Params
+from fastapi_pagination.api import create_page
+
+from app.config import settings
+from app.db import (
+    ANY_STATUS,
+    ANY_USER,
+    TodoTask,
+    TodoUser,
+    database,
+    task_list_stats
+)
+from app.repo import fast
+from app.repo.common import id_in, iterate_by_keyset, use_fast_reads
+from app.settings import SEARCH_CONFIG
+from app.schemas.task_schemas import (
+    BulkStatus,
+    TaskBulkUpdate,
+    TaskInput,
+    TaskStatus,
+    TaskUpdate
+)
+
+
+tasks_table = TodoTask.Meta.table
+users_table = TodoUser.Meta.table
+
+# Generated tsvector of title and description, see migrations
+TASK_SEARCH = sqlalchemy.literal_column('tasks.search', type_=TSVECTOR)
+
+# Planner's row estimate of tasks table, -1 if it was never analyzed
+ESTIMATED_TASKS = sqlalchemy.literal_column(
+    "(SELECT reltuples::bigint FROM pg_class "
+    "WHERE oid = 'tasks'::regclass)",
+    type_=sqlalchemy.BigInteger
+)
+
+
+# Column order of records loaded by TaskRepo.copy_tasks
+TASK_COPY_COLUMNS = ('title', 'description', 'status', 'user')
+
+
+# Stored counters that differ from counts of tasks, found by full scan
+TASK_COUNT_DRIFT = """
+    WITH expected AS (
+        SELECT scope.user_id, scope.status, count(*) AS task_count
+        FROM tasks
+        CROSS JOIN LATERAL (VALUES
+            (tasks."user", coalesce(tasks.status::text, '')),
+            (tasks."user", '*'),
+            (0, coalesce(tasks.status::text, '')),
+            (0, '*')
+        ) AS scope(user_id, status)
+        GROUP BY scope.user_id, scope.status
+    ),
+    stored AS (
+        SELECT user_id, status, sum(task_count)::bigint AS task_count
+        FROM task_list_stats
+        GROUP BY user_id, status
+    )
+    SELECT coalesce(expected.user_id, stats.user_id) AS user_id,
+           coalesce(expected.status, stats.status) AS status,
+           coalesce(stats.task_count, 0) AS stored,
+           coalesce(expected.task_count, 0) AS expected
+    FROM expected
+    FULL JOIN stored AS stats
+        ON stats.user_id = expected.user_id
+        AND stats.status = expected.status
+    WHERE coalesce(stats.task_count, 0)
+          <> coalesce(expected.task_count, 0)
+"""
+
 
-from app.db import TodoTask
-from app.schemas.task_schemas import TaskUpdate
+def _sum_shards(column):
+    """Sum of a `task_list_stats` column over shards of a scope"""
+    return sqlalchemy.cast(sqlalchemy.func.sum(column),
+                           sqlalchemy.BigInteger)
+
+
+def _filter_tasks(query, filters: dict):
+    """Applies router filters (`user`, `status`) to a core tasks query"""
+    if 'user' in filters:
+        query = query.where(tasks_table.c.user == filters['user'])
+    if 'status' in filters:
+        query = query.where(tasks_table.c.status == filters['status'])
+    return query
+
+
+def _task_values(values: dict) -> dict:
+    """Column values with TaskStatus enum converted to its plain value"""
+    if values.get('status') is not None:
+        values['status'] = values['status'].value
+    return values
+
+
+def _owned_target(task_id: int):
+    """CTE with id, owner and title of a single task"""
+    return (
+        sqlalchemy.select([
+            tasks_table.c.id,
+            tasks_table.c.user.label('owner_id'),
+            tasks_table.c.title,
+        ])
+        .where(tasks_table.c.id == task_id)
+        .cte('target')
+    )
+
+
+def _owned_result(target, modified):
+    """Owner of the target task and title of its modified row, if any"""
+    return (
+        sqlalchemy.select([target.c.owner_id, modified.c.title])
+        .select_from(target.outerjoin(
+            modified, modified.c.id == target.c.id))
+    )
 
 
 class TaskRepo():
     @staticmethod
     async def safe_get_task_by_id(task_id: int) -> TodoTask | None:
-        return await (
-            TodoTask.objects.select_related("user").get_or_none(id=task_id))
+        if use_fast_reads():
+            return await fast.get_task_by_id(database.reader(), task_id)
+
+        with database.read_replica():
+            return await TodoTask.objects.select_related("user").get_or_none(
+                id=task_id)
+
+    @staticmethod
+    async def get_task_version(task_id: int) -> Optional[int]:
+        """Current version of the task, None if there is no such task"""
+        query = (sqlalchemy.select([tasks_table.c.version])
+                 .where(tasks_table.c.id == task_id))
+        return await database.reader().fetch_val(query)
+
+    @staticmethod
+    async def get_list_stats(filters: dict) -> Tuple[int, int]:
+        """Version and total of task listing with given filters.
+
+        Version grows on any change in the listing. Total is read from
+        trigger-maintained counters, or for unfiltered listing with
+        `approximate_task_total` from planner's estimate when there is one.
+        Both are summed over shards of the scope.
+        """
+        status = filters.get('status')
+        total = _sum_shards(task_list_stats.c.task_count)
+        if not filters and settings.approximate_task_total:
+            total = sqlalchemy.case(
+                (ESTIMATED_TASKS >= 0, ESTIMATED_TASKS),
+                else_=total
+            )
+
+        query = (
+            sqlalchemy.select([
+                _sum_shards(task_list_stats.c.version).label('version'),
+                total.label('total'),
+            ])
+            .where(task_list_stats.c.user_id == filters.get('user', ANY_USER))
+            .where(task_list_stats.c.status == (
+                TaskStatus(status).value if status is not None
+                else ANY_STATUS))
+        )
+        row = await database.reader().fetch_one(query)
+        if row is None or row['version'] is None:
+            return 0, 0
+        return row['version'], row['total']
+
+    @staticmethod
+    async def find_task_count_drift() -> List[dict]:
+        """Scopes whose maintained task count differs from actual one"""
+        rows = await database.fetch_all(sqlalchemy.text(
+            f"{TASK_COUNT_DRIFT} ORDER BY user_id, status"))
+        return [dict(row._mapping) for row in rows]
+
+    @staticmethod
+    async def rebuild_task_counts() -> List[dict]:
+        """Fixes drifted task counts, returns scopes that were fixed.
+
+        Writers are blocked while tasks are counted, the difference is
+        added to shard 0 of fixed scopes and their version is bumped so
+        cached listings are revalidated.
+        """
+        async with database.transaction():
+            await database.execute(
+                sqlalchemy.text("LOCK TABLE tasks IN SHARE MODE"))
+            rows = await database.fetch_all(sqlalchemy.text(f"""
+                WITH drift AS ({TASK_COUNT_DRIFT}),
+                fixed AS (
+                    INSERT INTO task_list_stats AS stats
+                        (user_id, status, shard, version, task_count)
+                    SELECT user_id, status, 0, 1, expected - stored
+                    FROM drift
+                    ON CONFLICT (user_id, status, shard)
+                    DO UPDATE SET task_count = stats.task_count
+                                               + excluded.task_count,
+                                  version = stats.version + 1
+                )
+                SELECT user_id, status, expected AS task_count FROM drift
+            """))
+        return [dict(row._mapping) for row in rows]
 
     @staticmethod
     async def get_paginated_tasks(
         pagination_params: Params,
-        filters: dict
+        filters: dict,
+        total: int
     ):
-        tasks = TodoTask.objects.select_related("user")
-        tasks = tasks.filter(**filters)
-        return await paginate(tasks, params=pagination_params)
+        """Page of tasks ordered by id, total is known from list stats"""
+        if use_fast_reads():
+            return await fast.get_paginated_tasks(
+                database.reader(), pagination_params, filters, total)
+
+        raw_params = pagination_params.to_raw_params()
+        tasks = (
+            TodoTask.objects.select_related("user").filter(**filters)
+            .order_by("id").offset(raw_params.offset).limit(raw_params.limit)
+        )
+        with database.read_replica():
+            items = await tasks.all()
+        return create_page(items, total=total, params=pagination_params)
+
+    @staticmethod
+    async def get_tasks_after(
+        after_id: Optional[int],
+        limit: int,
+        filters: dict
+    ) -> List[TodoTask]:
+        """Keyset page ordered by id, fetches one extra row to detect more"""
+        tasks = TodoTask.objects.select_related("user").filter(**filters)
+        if after_id is not None:
+            tasks = tasks.filter(id__gt=after_id)
+        with database.read_replica():
+            return await tasks.order_by("id").limit(limit + 1).all()
+
+    @staticmethod
+    async def search_tasks(
+        text: str,
+        after: Optional[Tuple[int, float]],
+        limit: int,
+        filters: dict
+    ) -> List[dict]:
+        """Tasks matching web search style `text`, best ranked first.
+
+        Matches are found by GIN index on `tasks.search` and ordered by
+        (rank desc, id), `after` is (id, rank) of the last task of previous
+        page. Fetches one extra row to detect more.
+        """
+        ts_query = sqlalchemy.func.websearch_to_tsquery(
+            sqlalchemy.literal_column(f"'{SEARCH_CONFIG}'::regconfig"), text)
+        rank = sqlalchemy.func.ts_rank_cd(TASK_SEARCH, ts_query,
+                                          type_=sqlalchemy.Float)
+
+        query = _filter_tasks(
+            sqlalchemy.select([
+                tasks_table.c.id,
+                tasks_table.c.title,
+                tasks_table.c.description,
+                tasks_table.c.status,
+                users_table.c.id.label('user_id'),
+                users_table.c.username,
+                rank.label('rank'),
+            ])
+            .select_from(tasks_table.join(
+                users_table, tasks_table.c.user == users_table.c.id))
+            .where(TASK_SEARCH.op('@@')(ts_query)),
+            filters
+        )
+        if after is not None:
+            after_id, after_rank = after
+            query = query.where(sqlalchemy.or_(
+                rank < after_rank,
+                sqlalchemy.and_(rank == after_rank,
+                                tasks_table.c.id > after_id)
+            ))
+
+        query = query.order_by(rank.desc(), tasks_table.c.id) \
+            .limit(limit + 1)
+        rows = await database.reader().fetch_all(query)
+        return [dict(row._mapping) for row in rows]
+
+    @staticmethod
+    async def iterate_task_rows(
+        filters: dict,
+        chunk_size: int = 1000
+    ) -> AsyncIterator:
+        """Yields plain task rows joined with owner's username"""
+        query = _filter_tasks(
+            sqlalchemy.select([
+                tasks_table.c.id,
+                tasks_table.c.title,
+                tasks_table.c.description,
+                tasks_table.c.status,
+                users_table.c.id.label('user_id'),
+                users_table.c.username,
+            ])
+            .select_from(tasks_table.join(
+                users_table, tasks_table.c.user == users_table.c.id)),
+            filters
+        )
+        async for row in iterate_by_keyset(query, tasks_table.c.id,
+                                           chunk_size):
+            yield row
 
     @staticmethod
     async def create_task(task_input, user):
-        return await TodoTask.objects.create(**task_input.dict(), user=user)
+        database.stick_to_primary()
+        return await TodoTask.objects.create(**task_input.dict(),
+                                             user=user.id)
+
+    @staticmethod
+    async def update_task(task_id: int, user_id: int,
+                          task_update: TaskUpdate) -> Optional[Mapping]:
+        """Updates the task if it belongs to the user, in one statement.
+
+        Returns None if there is no such task, otherwise a row with
+        `owner_id` and the new `title`, which is NULL when the task was
+        not updated because it belongs to someone else.
+        """
+        database.stick_to_primary()
+        target = _owned_target(task_id)
+        values = _task_values(task_update.dict(exclude_unset=True))
+        if not values:
+            return await database.fetch_one(
+                sqlalchemy.select([target.c.owner_id, target.c.title]))
+
+        changed = (
+            tasks_table.update()
+            .where(tasks_table.c.id == target.c.id)
+            .where(target.c.owner_id == user_id)
+            .values(values)
+            .returning(tasks_table.c.id, tasks_table.c.title)
+            .cte('changed')
+        )
+        return await database.fetch_one(_owned_result(target, changed))
+
+    @staticmethod
+    async def delete_task(task_id: int, user_id: int) -> Optional[Mapping]:
+        """Deletes the task if it belongs to the user, in one statement.
+
+        Returns None if there is no such task, otherwise a row with
+        `owner_id` and `title` of the deleted task, NULL if not deleted.
+        """
+        database.stick_to_primary()
+        target = _owned_target(task_id)
+        removed = (
+            tasks_table.delete()
+            .where(tasks_table.c.id == target.c.id)
+            .where(target.c.owner_id == user_id)
+            .returning(tasks_table.c.id, tasks_table.c.title)
+            .cte('removed')
+        )
+        return await database.fetch_one(_owned_result(target, removed))
+
+    @staticmethod
+    async def _lock_task_owners(task_ids: Iterable[int]) -> Dict[int, int]:
+        """Locks given tasks for the current transaction, maps id to owner.
+
+        Rows are locked in id order, so bulk requests with overlapping
+        ids wait for each other instead of deadlocking.
+        """
+        query = (
+            sqlalchemy.select([tasks_table.c.id, tasks_table.c.user])
+            .where(id_in(tasks_table.c.id, task_ids))
+            .order_by(tasks_table.c.id)
+            .with_for_update()
+        )
+        rows = await database.fetch_all(query)
+        return {row['id']: row['user'] for row in rows}
+
+    @staticmethod
+    def _ownership_status(owner_id: Optional[int],
+                          user_id: int) -> Optional[BulkStatus]:
+        if owner_id is None:
+            return BulkStatus.NotFound
+        if owner_id != user_id:
+            return BulkStatus.Forbidden
+        return None
+
+    @staticmethod
+    async def bulk_create_tasks(task_inputs: List[TaskInput],
+                                user: TodoUser) -> List[int]:
+        """Creates all tasks with a single multi-row INSERT"""
+        database.stick_to_primary()
+        rows = [
+            _task_values(dict(task_input.dict(), user=user.id))
+            for task_input in task_inputs
+        ]
+        query = tasks_table.insert().values(rows).returning(tasks_table.c.id)
+        records = await database.fetch_all(query)
+        return [record['id'] for record in records]
 
     @staticmethod
-    async def update_task(current_task: TodoTask, task_update: TaskUpdate):
-        return await current_task.update(
-            **task_update.dict(exclude_unset=True)
+    async def bulk_update_tasks(task_updates: List[TaskBulkUpdate],
+                                user_id: int) -> Dict[int, BulkStatus]:
+        """Updates user's tasks in one transaction.
+
+        Tasks that get the same new values are updated by a single
+        `UPDATE ... WHERE id = ANY(...)`, repeated ids are merged with the
+        latest values winning.
+        """
+        database.stick_to_primary()
+        changes: Dict[int, dict] = {}
+        for task_update in task_updates:
+            values = task_update.dict(exclude_unset=True, exclude={'id'})
+            changes.setdefault(task_update.id, {}).update(_task_values(values))
+
+        results = {}
+        async with database.transaction():
+            owners = await TaskRepo._lock_task_owners(changes)
+
+            groups = defaultdict(list)
+            for task_id, values in changes.items():
+                results[task_id] = TaskRepo._ownership_status(
+                    owners.get(task_id), user_id) or BulkStatus.Updated
+                if results[task_id] is BulkStatus.Updated and values:
+                    groups[tuple(sorted(values.items()))].append(task_id)
+
+            for values, task_ids in groups.items():
+                await database.execute(
+                    tasks_table.update()
+                    .where(id_in(tasks_table.c.id, task_ids))
+                    .values(dict(values))
+                )
+
+        return results
+
+    @staticmethod
+    async def bulk_delete_tasks(task_ids: List[int],
+                                user_id: int) -> Dict[int, BulkStatus]:
+        """Deletes user's tasks with a single `DELETE ... WHERE id = ANY()`"""
+        database.stick_to_primary()
+        results = {}
+        async with database.transaction():
+            owners = await TaskRepo._lock_task_owners(task_ids)
+
+            for task_id in task_ids:
+                results[task_id] = TaskRepo._ownership_status(
+                    owners.get(task_id), user_id) or BulkStatus.Deleted
+
+            owned = [task_id for task_id, status in results.items()
+                     if status is BulkStatus.Deleted]
+            if owned:
+                await database.execute(
+                    tasks_table.delete()
+                    .where(id_in(tasks_table.c.id, owned))
+                )
+
+        return results
+
+    @staticmethod
+    async def _count_changed(changed) -> int:
+        """Runs CTE of a modifying statement, returns affected rows"""
+        return await database.fetch_val(
+            sqlalchemy.select([sqlalchemy.func.count()])
+            .select_from(changed))
+
+    @staticmethod
+    async def delete_user_tasks_batch(user_id: int, batch_size: int) -> int:
+        """Deletes up to `batch_size` tasks of the user, returns how many"""
+        batch = (
+            sqlalchemy.select([tasks_table.c.id])
+            .where(tasks_table.c.user == user_id)
+            .order_by(tasks_table.c.id)
+            .limit(batch_size)
+        )
+        removed = (
+            tasks_table.delete()
+            .where(tasks_table.c.id.in_(batch.scalar_subquery()))
+            .returning(tasks_table.c.id)
+            .cte('removed')
         )
+        return await TaskRepo._count_changed(removed)
 
     @staticmethod
-    async def delete_task(current_task: TodoTask):
-        return await current_task.delete()
+    async def set_user_tasks_status_batch(
+        user_id: int,
+        status: TaskStatus,
+        from_status: Optional[TaskStatus],
+        batch_size: int
+    ) -> int:
+        """Sets status of up to `batch_size` user's tasks which don't have
+        it yet, only of tasks in `from_status` if given. Returns how many
+        were changed, 0 once there is nothing left.
+        """
+        batch = (
+            sqlalchemy.select([tasks_table.c.id])
+            .where(tasks_table.c.user == user_id)
+            .where(tasks_table.c.status.is_distinct_from(status.value))
+            .order_by(tasks_table.c.id)
+            .limit(batch_size)
+        )
+        if from_status is not None:
+            batch = batch.where(tasks_table.c.status == from_status.value)
+        changed = (
+            tasks_table.update()
+            .where(tasks_table.c.id.in_(batch.scalar_subquery()))
+            .values(status=status.value)
+            .returning(tasks_table.c.id)
+            .cte('changed')
+        )
+        return await TaskRepo._count_changed(changed)
+
+    @staticmethod
+    async def copy_tasks(records: List[tuple]) -> int:
+        """Loads (title, description, status, user id) records with COPY.
+
+        Much faster than INSERT for large amounts of rows, triggers keep
+        list stats up to date as usual. Returns number of copied rows.
+        """
+        database.stick_to_primary()
+        async with database.connection() as connection:
+            result = await connection.raw_connection.copy_records_to_table(
+                'tasks', records=records, columns=TASK_COPY_COLUMNS)
+        return int(result.split()[-1])
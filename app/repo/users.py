@@ -1,16 +1,162 @@
-from app.db import TodoUser
+from typing import AsyncIterator, List, Optional
+
+import sqlalchemy
+
+from app.cache import TTLCache
+from app.config import settings
+from app.db import ANY_STATUS, TodoUser, database, task_list_stats
+from app.repo import fast
+from app.repo.common import id_in, iterate_by_keyset, use_fast_reads
+from app.schemas.task_schemas import TaskStatus
 from app.schemas.user_schemas import TodoUserInput
 
 
+users_table = TodoUser.Meta.table
+
+# Only columns needed for UserOut, password hash is never loaded
+USER_OUT_QUERY = sqlalchemy.select([users_table.c.id, users_table.c.username])
+
+
+def _user_task_stats(rows) -> List[dict]:
+    """Groups per-scope counter rows into stats of every user"""
+    stats = {}
+    for row in rows:
+        user = stats.setdefault(row['id'], {
+            'user_id': row['id'],
+            'total': 0,
+            'statuses': {status.value: 0 for status in TaskStatus},
+        })
+        if row['status'] == ANY_STATUS:
+            user['total'] = row['task_count']
+        elif row['status'] in user['statuses']:
+            user['statuses'][row['status']] = row['task_count']
+    return list(stats.values())
+
+
+# Authenticated users keyed by token subject (username)
+user_cache = TTLCache(maxsize=settings.user_cache_size,
+                      ttl=settings.user_cache_ttl)
+
+
 class UserRepo():
     @staticmethod
     async def safe_get_user_by_username(username: str) -> TodoUser | None:
+        """Always read from primary, auth flows need fresh data"""
+        if use_fast_reads():
+            return await fast.get_user_by_username(database, username)
+
         return await TodoUser.objects.get_or_none(username=username)
 
     @staticmethod
-    async def get_all_users():
-        return await TodoUser.objects.all()
+    async def get_cached_user(
+        username: str,
+        user_id: int | None = None
+    ) -> TodoUser | None:
+        """User for authentication, looked up in DB only on cache miss.
+
+        If `user_id` is known from the token, user is rebuilt from it and
+        the miss only checks that the account still exists, so deleted
+        users stop authenticating once their cache entry expires.
+        """
+        user = user_cache.get(username)
+        if user is not None:
+            return user
+
+        if user_id is not None:
+            if not await UserRepo.user_exists(user_id, username):
+                return None
+            user = TodoUser.construct(id=user_id, username=username)
+        else:
+            user = await UserRepo.safe_get_user_by_username(username=username)
+            if user is None:
+                return None
+
+        user_cache.set(username, user)
+        return user
+
+    @staticmethod
+    async def user_exists(user_id: int, username: str) -> bool:
+        """Primary key lookup on primary, replicas may lag behind deletes"""
+        found = await database.fetch_val(
+            sqlalchemy.select([users_table.c.id]).where(
+                (users_table.c.id == user_id)
+                & (users_table.c.username == username)))
+        return found is not None
+
+    @staticmethod
+    def invalidate_cached_user(username: str) -> None:
+        user_cache.invalidate(username)
+
+    @staticmethod
+    def clear_user_cache() -> None:
+        user_cache.clear()
+
+    @staticmethod
+    async def get_users_after(
+        after_id: Optional[int],
+        limit: int
+    ) -> List[dict]:
+        """Keyset page ordered by id, fetches one extra row to detect more"""
+        query = USER_OUT_QUERY.order_by(users_table.c.id).limit(limit + 1)
+        if after_id is not None:
+            query = query.where(users_table.c.id > after_id)
+        rows = await database.reader().fetch_all(query)
+        return [dict(row._mapping) for row in rows]
+
+    @staticmethod
+    async def get_task_stats(
+        after_id: Optional[int] = None,
+        limit: int = 10,
+        user_ids: Optional[List[int]] = None
+    ) -> List[dict]:
+        """Task counts by status of users ordered by id.
+
+        Counts are read from trigger-maintained `task_list_stats`, so the
+        cost is one index lookup per user whatever the number of tasks.
+        Fetches one extra user to detect more.
+        """
+        page = sqlalchemy.select([users_table.c.id]) \
+            .order_by(users_table.c.id).limit(limit + 1)
+        if after_id is not None:
+            page = page.where(users_table.c.id > after_id)
+        if user_ids is not None:
+            page = page.where(id_in(users_table.c.id, user_ids))
+        page = page.subquery('page')
+
+        query = (
+            sqlalchemy.select([page.c.id, task_list_stats.c.status,
+                               task_list_stats.c.task_count])
+            .select_from(page.outerjoin(
+                task_list_stats, task_list_stats.c.user_id == page.c.id))
+            .order_by(page.c.id)
+        )
+        rows = await database.reader().fetch_all(query)
+        return _user_task_stats(rows)
+
+    @staticmethod
+    async def iterate_user_rows(chunk_size: int = 1000) -> AsyncIterator:
+        async for row in iterate_by_keyset(USER_OUT_QUERY, users_table.c.id,
+                                           chunk_size):
+            yield row
 
     @staticmethod
     async def save_user(user_input: TodoUserInput):
+        database.stick_to_primary()
+        UserRepo.invalidate_cached_user(user_input.username)
         return await TodoUser.objects.create(**user_input.dict())
+
+    @staticmethod
+    async def delete_user(user_id: int) -> Optional[str]:
+        """Deletes the user, returns its username or None if not found.
+
+        Remaining tasks go with it by cascade, so large accounts should
+        have their tasks deleted in batches first.
+        """
+        database.stick_to_primary()
+        username = await database.fetch_val(
+            users_table.delete()
+            .where(users_table.c.id == user_id)
+            .returning(users_table.c.username))
+        if username is not None:
+            UserRepo.invalidate_cached_user(username)
+        return username
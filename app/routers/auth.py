@@ -4,17 +4,19 @@ from fastapi.security import OAuth2PasswordRequestForm
 from fastapi import APIRouter, HTTPException, status, Depends
 from datetime import timedelta
 
+from app.admission import AUTH_ADMISSION
+from app.config import settings
 from app.repo.users import UserRepo
 from app.schemas.user_schemas import TodoUserInput
 from app.settings import ACCESS_TOKEN_EXPIRE_MINUTES
 from app.security import (
-    get_password_hash,
+    get_password_hash_async,
     authenticate_user,
     create_access_token
 )
 
 
-router = APIRouter()
+router = APIRouter(dependencies=[Depends(AUTH_ADMISSION)])
 
 
 @router.post("/signup", tags=["Auth"])
@@ -28,7 +30,7 @@ async def signup(new_user: TodoUserInput):
             detail="User with this username already exists",
         )
 
-    new_user.password = get_password_hash(new_user.password)
+    new_user.password = await get_password_hash_async(new_user.password)
     await UserRepo.save_user(new_user)
     return {"message": "Registration complete!"}
 
@@ -43,9 +45,13 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends()):
             detail="Incorrect username or password"
         )
 
+    token_data = {"sub": user.username}
+    if settings.token_user_id:
+        token_data["uid"] = user.id
+
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user.username},
+        data=token_data,
         expires_delta=access_token_expires
     )
 
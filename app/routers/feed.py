@@ -0,0 +1,117 @@
+"""Task change feed endpoints.
+
+Kept out of the tasks router so long-lived streams don't hold its
+admission slots.
+"""
+
+import asyncio
+import json
+from typing import AsyncIterator, Optional
+
+from fastapi import APIRouter, HTTPException, WebSocket
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+
+from app.config import settings
+from app.feed import TASK_FEED, FeedSaturated, Subscription
+from app.schemas.task_schemas import TaskStatus
+
+
+router = APIRouter()
+
+PING = {'op': 'ping'}
+
+# WebSocket close code asking clients to reconnect later
+TRY_AGAIN_LATER = 1013
+
+
+def subscribe(user_id: Optional[int],
+              status: Optional[TaskStatus]) -> Subscription:
+    return TASK_FEED.subscribe(
+        user_id, status.value if status is not None else None)
+
+
+async def sse_events(subscription: Subscription,
+                     ping_seconds: float) -> AsyncIterator[str]:
+    """Events as Server-Sent Events messages, comments keep it alive"""
+    try:
+        while True:
+            event = await subscription.get(ping_seconds)
+            if event is None:
+                yield ': ping\n\n'
+            else:
+                yield f'data: {json.dumps(event)}\n\n'
+    finally:
+        TASK_FEED.unsubscribe(subscription)
+
+
+async def unsubscribe(subscription: Subscription) -> None:
+    TASK_FEED.unsubscribe(subscription)
+
+
+@router.get("/tasks/changes", tags=["Tasks"],
+            response_class=StreamingResponse)
+async def task_changes(user_id: Optional[int] = None,
+                       status: Optional[TaskStatus] = None):
+    """Stream of task changes as Server-Sent Events
+
+    Every change is a JSON message with `op` (created, updated or
+    deleted), `id`, `user_id`, `status` and `version` of the task,
+    updates also carry `old_status`. A task moved out of `status` is
+    reported to subscribers of that status. On `resync` events could
+    have been missed, reload tasks in scope with `GET /tasks`.
+    """
+    try:
+        subscription = subscribe(user_id, status)
+    except FeedSaturated:
+        raise HTTPException(
+            status_code=503,
+            detail='Too many subscribers, try again later',
+            headers={'Retry-After': '5'}
+        )
+
+    return StreamingResponse(
+        sse_events(subscription, settings.feed_ping_seconds),
+        media_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+        # Runs also when client left before the stream started
+        background=BackgroundTask(unsubscribe, subscription)
+    )
+
+
+async def _send_events(websocket: WebSocket,
+                       subscription: Subscription) -> None:
+    while True:
+        event = await subscription.get(settings.feed_ping_seconds)
+        await websocket.send_json(event if event is not None else PING)
+
+
+async def _wait_closed(websocket: WebSocket) -> None:
+    while (await websocket.receive())['type'] != 'websocket.disconnect':
+        pass
+
+
+@router.websocket("/tasks/changes/ws")
+async def task_changes_ws(websocket: WebSocket,
+                          user_id: Optional[int] = None,
+                          status: Optional[TaskStatus] = None):
+    """Task changes as JSON messages, same as `GET /tasks/changes`,
+    `ping` messages keep it alive
+    """
+    try:
+        subscription = subscribe(user_id, status)
+    except FeedSaturated:
+        await websocket.close(code=TRY_AGAIN_LATER)
+        return
+
+    tasks = []
+    try:
+        await websocket.accept()
+        tasks = [asyncio.create_task(_send_events(websocket, subscription)),
+                 asyncio.create_task(_wait_closed(websocket))]
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        TASK_FEED.unsubscribe(subscription)
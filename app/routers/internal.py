@@ -0,0 +1,36 @@
+"""Internal diagnostics endpoints"""
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+
+from app.admission import ADMISSION_CONTROLLERS
+from app.config import settings
+from app.db import database
+from app.feed import TASK_FEED
+from app.pool import pool_stats
+from app.security import HASHING_POOL
+
+
+def internal_stats_enabled():
+    """Hides internal endpoints unless enabled by settings"""
+    if not settings.internal_stats_enabled:
+        raise HTTPException(status_code=404, detail='Not Found')
+
+
+router = APIRouter(dependencies=[Depends(internal_stats_enabled)])
+
+
+@router.get("/internal/stats", tags=["Internal"], include_in_schema=False)
+async def get_internal_stats(request: Request):
+    """DB pool usage, hashing and admission saturation, task feed and
+    startup timings
+    """
+    return {
+        "db_pool": pool_stats(database),
+        "db_replica_pool": (pool_stats(database.replica)
+                            if database.replica is not None else None),
+        "password_hashing": HASHING_POOL.stats(),
+        "admission": {controller.name: controller.stats()
+                      for controller in ADMISSION_CONTROLLERS},
+        "task_feed": TASK_FEED.stats(),
+        "startup_timings": getattr(request.app.state, "startup_timings", {}),
+    }
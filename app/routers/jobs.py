@@ -0,0 +1,48 @@
+"""Background job endpoints"""
+
+from fastapi import APIRouter, Depends, HTTPException, status
+
+from app.db import TodoUser
+from app.jobs import JOB_RUNNER
+from app.repo.jobs import JobRepo
+from app.schemas.job_schemas import JobKind, JobOut, TaskStatusJobInput
+from app.security import get_current_user
+
+
+router = APIRouter()
+
+
+@router.post("/jobs/account-deletion", response_model=JobOut,
+             status_code=status.HTTP_202_ACCEPTED, tags=["Jobs"])
+async def delete_account(current_user: TodoUser = Depends(get_current_user)):
+    """Delete current user with all its tasks in background
+
+    Once the job completes the user is gone, and so is access to its jobs.
+    """
+    job = await JobRepo.enqueue_job(JobKind.DeleteAccount, current_user.id)
+    JOB_RUNNER.notify()
+    return job
+
+
+@router.post("/jobs/task-status", response_model=JobOut,
+             status_code=status.HTTP_202_ACCEPTED, tags=["Jobs"])
+async def set_task_status(job_input: TaskStatusJobInput,
+                          current_user: TodoUser = Depends(get_current_user)):
+    """Set status of all user's tasks, or only of tasks in `from_status`,
+    in background
+    """
+    job = await JobRepo.enqueue_job(JobKind.SetTaskStatus, current_user.id,
+                                    job_input.dict())
+    JOB_RUNNER.notify()
+    return job
+
+
+@router.get("/jobs/{job_id}", response_model=JobOut, tags=["Jobs"])
+async def get_job(job_id: int,
+                  current_user: TodoUser = Depends(get_current_user)):
+    """Get state and progress of a background job of current user"""
+    job = await JobRepo.get_job(job_id)
+    if job is None or job['user_id'] != current_user.id:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    return job
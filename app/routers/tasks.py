@@ -1,16 +1,55 @@
 """Task get, create, update and delete endpoints"""
 
-from typing import Optional
-from fastapi import APIRouter, HTTPException, Depends, Query
+from typing import Annotated, List, Optional, Tuple, Union
+from fastapi import (
+    APIRouter,
+    Body,
+    Depends,
+    Header,
+    HTTPException,
+    Query,
+    Request,
+    Response
+)
+from fastapi.responses import StreamingResponse
 from fastapi_pagination import Params, Page
 
+from app.admission import TASKS_ADMISSION
+from app.config import settings
 from app.db import TodoUser
+from app.etag import etag_matches, make_etag, not_modified, set_cache_headers
+from app.export import (
+    TASK_CSV_COLUMNS,
+    csv_chunks,
+    ndjson_chunks,
+    task_row_to_dict
+)
+from app.importer import load_tasks
+from app.pagination import CursorPage, decode_cursor, encode_cursor
 from app.repo.tasks import TaskRepo
 from app.security import get_current_user
-from app.schemas.task_schemas import TaskInput, TaskStatus, TaskOut, TaskUpdate
+from app.serializers import (
+    cursor_page_out,
+    json_response,
+    page_out,
+    task_out
+)
+from app.settings import BULK_MAX_TASKS
+from app.schemas.task_schemas import (
+    BulkStatus,
+    ExportFormat,
+    TaskBulkDelete,
+    TaskBulkResult,
+    TaskBulkUpdate,
+    TaskImportResult,
+    TaskInput,
+    TaskStatus,
+    TaskOut,
+    TaskUpdate
+)
 
 
-router = APIRouter()
+router = APIRouter(dependencies=[Depends(TASKS_ADMISSION)])
 
 
 @router.post("/tasks", tags=["Tasks"])
@@ -22,14 +61,48 @@ async def create_task(task_data: TaskInput,
     return {"message": f"Task '{new_task.title}' created!"}
 
 
-@router.get("/tasks", response_model=Page[TaskOut], tags=["Tasks"])
-async def get_all_tasks(
-    user_id: Optional[int] = None,
-    status: Optional[TaskStatus] = None,
-    page: int = Query(1, description="Page number", ge=1),
-    page_size: int = Query(10, description="Tasks per page", ge=1, le=100)
+@router.post("/tasks/bulk", response_model=List[TaskBulkResult],
+             tags=["Tasks"])
+async def create_tasks_bulk(
+    tasks_data: List[TaskInput] = Body(
+        ..., min_items=1, max_items=BULK_MAX_TASKS),
+    current_user: TodoUser = Depends(get_current_user)
+):
+    """Create many tasks at once"""
+    task_ids = await TaskRepo.bulk_create_tasks(tasks_data, current_user)
+    return [TaskBulkResult(id=task_id, status=BulkStatus.Created)
+            for task_id in task_ids]
+
+
+@router.patch("/tasks/bulk", response_model=List[TaskBulkResult],
+              tags=["Tasks"])
+async def update_tasks_bulk(
+    tasks_update: List[TaskBulkUpdate] = Body(
+        ..., min_items=1, max_items=BULK_MAX_TASKS),
+    current_user: TodoUser = Depends(get_current_user)
+):
+    """Update many existing tasks at once"""
+    results = await TaskRepo.bulk_update_tasks(tasks_update, current_user.id)
+    return [TaskBulkResult(id=task_id, status=status)
+            for task_id, status in results.items()]
+
+
+@router.delete("/tasks/bulk", response_model=List[TaskBulkResult],
+               tags=["Tasks"])
+async def delete_tasks_bulk(
+    tasks_delete: TaskBulkDelete,
+    current_user: TodoUser = Depends(get_current_user)
 ):
-    """Get list of all user's tasks with pagination"""
+    """Delete many existing tasks at once"""
+    results = await TaskRepo.bulk_delete_tasks(tasks_delete.ids,
+                                               current_user.id)
+    return [TaskBulkResult(id=task_id, status=status)
+            for task_id, status in results.items()]
+
+
+def task_filters(user_id: Optional[int],
+                 status: Optional[TaskStatus]) -> dict:
+    """Builds repo filters from query parameters"""
     filters = {}
     if user_id is not None:
         filters['user'] = user_id
@@ -37,17 +110,192 @@ async def get_all_tasks(
     if status is not None:
         filters['status'] = status
 
+    return filters
+
+
+@router.get("/tasks/export", tags=["Tasks"],
+            response_class=StreamingResponse)
+async def export_tasks(
+    user_id: Optional[int] = None,
+    status: Optional[TaskStatus] = None,
+    export_format: ExportFormat = Query(ExportFormat.NDJSON, alias="format")
+):
+    """Stream all matching tasks as NDJSON or CSV"""
+    rows = TaskRepo.iterate_task_rows(filters=task_filters(user_id, status))
+
+    if export_format == ExportFormat.CSV:
+        return StreamingResponse(
+            csv_chunks(rows, TASK_CSV_COLUMNS),
+            media_type="text/csv",
+            headers={"Content-Disposition": "attachment; filename=tasks.csv"}
+        )
+
+    return StreamingResponse(
+        ndjson_chunks(rows, task_row_to_dict),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": "attachment; filename=tasks.ndjson"}
+    )
+
+
+IMPORT_BODY = {
+    "required": True,
+    "content": {
+        "application/x-ndjson": {"schema": {"type": "string"}},
+        "text/csv": {"schema": {"type": "string"}},
+    },
+}
+
+
+@router.post("/tasks/import", response_model=TaskImportResult,
+             tags=["Tasks"], openapi_extra={"requestBody": IMPORT_BODY})
+async def import_tasks(
+    request: Request,
+    import_format: ExportFormat = Query(ExportFormat.NDJSON, alias="format"),
+    current_user: TodoUser = Depends(get_current_user)
+):
+    """Import tasks of current user from NDJSON or CSV body
+
+    The body is streamed, valid rows are loaded with `COPY` and committed
+    in batches, invalid ones are reported by line number. Output of
+    `/tasks/export` is accepted as is.
+    """
+    return await load_tasks(request.stream(), import_format,
+                            current_user.id)
+
+
+@router.get("/tasks/search", response_model=CursorPage[TaskOut],
+            tags=["Tasks"])
+async def search_tasks(
+    q: Annotated[str, Query(
+        min_length=1, max_length=256,
+        description='Words to find, supports "quoted phrases", or, -word')],
+    user_id: Optional[int] = None,
+    status: Optional[TaskStatus] = None,
+    cursor: Annotated[Optional[str], Query(
+        description="Cursor from previous page")] = None,
+    limit: Annotated[int, Query(
+        description="Tasks per page", ge=1, le=100)] = 10
+):
+    """Full-text search in task titles and descriptions
+
+    Best matching tasks come first, words found in the title weigh more
+    than in the description. Combines with `user_id` and `status`
+    filters, `next_cursor` points to the next page.
+    """
+    after = None
+    if cursor:
+        try:
+            after_id, rank = decode_cursor(cursor)
+            after = (after_id, float(rank))
+        except (ValueError, TypeError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    rows = await TaskRepo.search_tasks(
+        q, after=after, limit=limit, filters=task_filters(user_id, status))
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]['id'], rows[-1]['rank'])
+
+    if settings.fast_json:
+        return json_response(
+            cursor_page_out(rows, next_cursor, task_row_to_dict))
+
+    return CursorPage[TaskOut](
+        items=[task_row_to_dict(row) for row in rows],
+        next_cursor=next_cursor
+    )
+
+
+@router.get("/tasks",
+            response_model=Union[CursorPage[TaskOut], Page[TaskOut]],
+            tags=["Tasks"])
+async def get_all_tasks(
+    user_id: Optional[int] = None,
+    status: Optional[TaskStatus] = None,
+    page: int = Query(1, description="Page number", ge=1),
+    page_size: int = Query(10, description="Tasks per page", ge=1, le=100),
+    cursor: Annotated[Optional[str], Query(
+        description="Cursor from previous page, enables keyset mode")] = None,
+    limit: Annotated[Optional[int], Query(
+        description="Tasks per page in keyset mode", ge=1, le=100)] = None,
+    if_none_match: Annotated[Optional[str], Header()] = None,
+    response: Response = None
+):
+    """Get list of all user's tasks with pagination
+
+    Passing `cursor` or `limit` switches to keyset pagination: tasks are
+    ordered by id, no total count is calculated and `next_cursor` points
+    to the next page. Total of a numbered page comes from maintained
+    per-scope counters instead of counting matching tasks.
+
+    Response carries an ETag, a request with matching `If-None-Match`
+    gets 304 without the listing being queried.
+    """
+    filters = task_filters(user_id, status)
+
+    list_version, total = await TaskRepo.get_list_stats(filters)
+    etag = make_etag("tasks", user_id, status, list_version,
+                     page, page_size, cursor, limit)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    set_cache_headers(response, etag)
+
+    if cursor is not None or limit is not None:
+        tasks, next_cursor = await get_tasks_by_cursor(
+            cursor, limit or page_size, filters)
+        if settings.fast_json:
+            return json_response(
+                cursor_page_out(tasks, next_cursor, task_out), etag)
+
+        return CursorPage[TaskOut](
+            items=[TaskOut.from_orm(task) for task in tasks],
+            next_cursor=next_cursor
+        )
+
     params = Params(page=page, size=page_size)
 
-    return await TaskRepo.get_paginated_tasks(
+    tasks_page = await TaskRepo.get_paginated_tasks(
         pagination_params=params,
+        filters=filters,
+        total=total
+    )
+    if settings.fast_json:
+        return json_response(page_out(tasks_page, task_out), etag)
+
+    return tasks_page
+
+
+async def get_tasks_by_cursor(
+    cursor: Optional[str],
+    limit: int,
+    filters: dict
+) -> Tuple[list, Optional[str]]:
+    """Keyset page of tasks that come after the cursor and next cursor"""
+    after_id = None
+    if cursor:
+        try:
+            after_id, _ = decode_cursor(cursor)
+        except (ValueError, TypeError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    tasks = await TaskRepo.get_tasks_after(
+        after_id=after_id,
+        limit=limit,
         filters=filters
     )
 
+    next_cursor = None
+    if len(tasks) > limit:
+        tasks = tasks[:limit]
+        next_cursor = encode_cursor(tasks[-1].id, tasks[-1].id)
 
-@router.get("/tasks/{task_id}", response_model=TaskOut, tags=["Tasks"])
-async def get_task(task_id: int):
-    """Get info about specific task by its ID"""
+    return tasks, next_cursor
+
+
+async def find_task(task_id: int):
+    """Task by its ID or 404"""
     task = await TaskRepo.safe_get_task_by_id(task_id)
 
     if task is None:
@@ -59,34 +307,71 @@ async def get_task(task_id: int):
     return task
 
 
+@router.get("/tasks/{task_id}", response_model=TaskOut, tags=["Tasks"])
+async def get_task(
+    task_id: int,
+    if_none_match: Annotated[Optional[str], Header()] = None,
+    response: Response = None
+):
+    """Get info about specific task by its ID
+
+    Response carries an ETag, a request with matching `If-None-Match`
+    gets 304 after checking only the task version.
+    """
+    if if_none_match:
+        version = await TaskRepo.get_task_version(task_id)
+        if version is not None:
+            etag = make_etag("task", task_id, version)
+            if etag_matches(if_none_match, etag):
+                return not_modified(etag)
+
+    task = await find_task(task_id)
+    etag = make_etag("task", task.id, task.version)
+    if settings.fast_json:
+        return json_response(task_out(task), etag)
+
+    set_cache_headers(response, etag)
+    return task
+
+
+def check_task_write(row, current_user: TodoUser, action: str):
+    """Raises 404 or 403 unless the single-statement write went through"""
+    if row is None:
+        raise HTTPException(
+            status_code=404,
+            detail="Task not found"
+        )
+
+    if row['owner_id'] != current_user.id:
+        raise HTTPException(
+            status_code=403,
+            detail=f"Can't {action} other user's tasks"
+        )
+
+    if row['title'] is None:
+        # Task was deleted between the ownership check and the write
+        raise HTTPException(
+            status_code=404,
+            detail="Task not found"
+        )
+
+
 @router.patch("/tasks/{task_id}", tags=["Tasks"])
 async def update_task(task_id: int,
                       task_update: TaskUpdate,
                       current_user: TodoUser = Depends(get_current_user)):
     """Update existing task"""
-    task = await get_task(task_id)
+    row = await TaskRepo.update_task(task_id, current_user.id, task_update)
+    check_task_write(row, current_user, "update")
 
-    if task.user != current_user:
-        raise HTTPException(
-            status_code=403,
-            detail="Can't update other user's tasks"
-        )
-
-    await TaskRepo.update_task(task, task_update)
-    return {"message": f"Task '{task.title}' updated successfully"}
+    return {"message": f"Task '{row['title']}' updated successfully"}
 
 
 @router.delete("/tasks/{task_id}", tags=["Tasks"])
 async def delete_task(task_id: int,
                       current_user: TodoUser = Depends(get_current_user)):
     """Delete existing task"""
-    task = await get_task(task_id)
-
-    if task.user != current_user:
-        raise HTTPException(
-            status_code=403,
-            detail="Can't delete other user's tasks"
-        )
+    row = await TaskRepo.delete_task(task_id, current_user.id)
+    check_task_write(row, current_user, "delete")
 
-    await TaskRepo.delete_task(task)
-    return {"message": f"Task '{task.title}' deleted successfully"}
+    return {"message": f"Task '{row['title']}' deleted successfully"}
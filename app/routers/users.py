@@ -1,16 +1,106 @@
 """User endpoints"""
 
-from typing import List
-from fastapi import APIRouter
+from typing import Annotated, List, Optional
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
 
+from app.config import settings
+from app.export import ndjson_chunks, user_row_to_dict
+from app.pagination import CursorPage, decode_cursor, encode_cursor
 from app.repo.users import UserRepo
+from app.schemas.task_schemas import UserTaskStats
 from app.schemas.user_schemas import UserOut
+from app.serializers import cursor_page_out, json_response
 
 
 router = APIRouter()
 
 
-@router.get("/users", response_model=List[UserOut], tags=['Users'])
-async def get_all_users():
-    """Get list of all user's usernames"""
-    return await UserRepo.get_all_users()
+def cursor_after_id(cursor: Optional[str]) -> Optional[int]:
+    """Id of the last user of previous page or 400"""
+    if not cursor:
+        return None
+
+    try:
+        after_id, _ = decode_cursor(cursor)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return after_id
+
+
+@router.get("/users", response_model=CursorPage[UserOut], tags=['Users'])
+async def get_all_users(
+    cursor: Annotated[Optional[str], Query(
+        description="Cursor from previous page")] = None,
+    limit: Annotated[int, Query(
+        description="Users per page", ge=1, le=100)] = 10
+):
+    """Get list of all user's usernames
+
+    Users are ordered by id, `next_cursor` points to the next page. Use
+    `GET /users/export` to get all of them in one streamed response.
+    """
+    users = await UserRepo.get_users_after(after_id=cursor_after_id(cursor),
+                                           limit=limit)
+
+    next_cursor = None
+    if len(users) > limit:
+        users = users[:limit]
+        next_cursor = encode_cursor(users[-1]['id'], users[-1]['id'])
+
+    if settings.fast_json:
+        return json_response(cursor_page_out(users, next_cursor, dict))
+
+    return CursorPage[UserOut](items=users, next_cursor=next_cursor)
+
+
+@router.get("/users/stats", response_model=CursorPage[UserTaskStats],
+            tags=['Users'])
+async def get_users_task_stats(
+    user_id: Annotated[Optional[List[int]], Query(
+        description="Only these users", max_items=100)] = None,
+    cursor: Annotated[Optional[str], Query(
+        description="Cursor from previous page")] = None,
+    limit: Annotated[int, Query(
+        description="Users per page", ge=1, le=100)] = 10
+):
+    """Get task counts by status of many users
+
+    Users are ordered by id, `next_cursor` points to the next page.
+    Counts are maintained on every task write, so no tasks are scanned.
+    """
+    stats = await UserRepo.get_task_stats(
+        after_id=cursor_after_id(cursor),
+        limit=limit,
+        user_ids=user_id
+    )
+
+    next_cursor = None
+    if len(stats) > limit:
+        stats = stats[:limit]
+        next_cursor = encode_cursor(stats[-1]['user_id'],
+                                    stats[-1]['user_id'])
+
+    return CursorPage[UserTaskStats](items=stats, next_cursor=next_cursor)
+
+
+@router.get("/users/{user_id}/stats", response_model=UserTaskStats,
+            tags=['Users'])
+async def get_user_task_stats(user_id: int):
+    """Get task counts by status of a user"""
+    stats = await UserRepo.get_task_stats(limit=1, user_ids=[user_id])
+    if not stats:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    return stats[0]
+
+
+@router.get("/users/export", tags=['Users'],
+            response_class=StreamingResponse)
+async def export_users():
+    """Stream all users as NDJSON"""
+    return StreamingResponse(
+        ndjson_chunks(UserRepo.iterate_user_rows(), user_row_to_dict),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": "attachment; filename=users.ndjson"}
+    )
@@ -0,0 +1,40 @@
+"""Background job models for endpoints"""
+
+from datetime import datetime
+from enum import Enum
+from typing import Optional
+from pydantic import BaseModel
+from app.schemas.task_schemas import TaskStatus
+
+
+class JobKind(str, Enum):
+    """Enum with operations run as background jobs"""
+    DeleteAccount = "delete_account"
+    SetTaskStatus = "set_task_status"
+
+
+class JobStatus(str, Enum):
+    """Enum with state of a background job"""
+    Queued = "queued"
+    Running = "running"
+    Completed = "completed"
+    Failed = "failed"
+
+
+class TaskStatusJobInput(BaseModel):
+    """Response model to change status of all user's tasks"""
+    status: TaskStatus
+    from_status: Optional[TaskStatus] = None
+
+
+class JobOut(BaseModel):
+    """Response model for job progress"""
+    id: int
+    kind: JobKind
+    status: JobStatus
+    total: Optional[int]
+    done: int
+    error: Optional[str]
+    created_at: datetime
+    started_at: Optional[datetime]
+    finished_at: Optional[datetime]
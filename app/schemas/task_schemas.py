@@ -1,9 +1,10 @@
 """Response task models for endpoints"""
 
 from enum import Enum
-from typing import Optional
-from pydantic import BaseModel, Field, validator
+from typing import Dict, List, Optional
+from pydantic import BaseModel, Field, conlist, validator
 from app.schemas.user_schemas import UserOut
+from app.settings import BULK_MAX_TASKS
 
 
 class TaskStatus(str, Enum):
@@ -13,6 +14,12 @@ class TaskStatus(str, Enum):
     Completed = "Completed"
 
 
+class ExportFormat(str, Enum):
+    """Enum with formats of exported tasks"""
+    NDJSON = "ndjson"
+    CSV = "csv"
+
+
 class TaskInput(BaseModel):
     """Response model for task input with status validation"""
     title: str = Field(..., min_length=1, max_length=256)
@@ -36,8 +43,54 @@ class TaskOut(BaseModel):
     id: int
     title: str
     description: Optional[str]
-    status: TaskStatus
+    # Column is nullable, imported rows without status keep NULL
+    status: Optional[TaskStatus]
     user: UserOut
 
     class Config:
         orm_mode = True
+
+
+class BulkStatus(str, Enum):
+    """Enum with result of a single item of bulk operation"""
+    Created = "created"
+    Updated = "updated"
+    Deleted = "deleted"
+    NotFound = "not_found"
+    Forbidden = "forbidden"
+
+
+class TaskBulkUpdate(TaskUpdate):
+    """Response model to update one of many tasks"""
+    id: int
+
+
+class TaskBulkDelete(BaseModel):
+    """Response model to delete many tasks"""
+    ids: conlist(int, min_items=1, max_items=BULK_MAX_TASKS)
+
+
+class TaskBulkResult(BaseModel):
+    """Response model for result of bulk operation on a task"""
+    id: int
+    status: BulkStatus
+
+
+class TaskImportError(BaseModel):
+    """Response model for a rejected row of imported tasks"""
+    line: int
+    error: str
+
+
+class TaskImportResult(BaseModel):
+    """Response model for result of task import"""
+    imported: int
+    failed: int
+    errors: List[TaskImportError]
+
+
+class UserTaskStats(BaseModel):
+    """Response model for task counts of a user by status"""
+    user_id: int
+    total: int
+    statuses: Dict[TaskStatus, int]
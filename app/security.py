@@ -4,8 +4,9 @@ import jwt
 import datetime
 from datetime import datetime as dtime
 from fastapi import HTTPException, Depends
-from ormar.exceptions import NoMatch
 
+from app.config import settings
+from app.hashing import HashingPool, PoolSaturated
 from app.repo.users import UserRepo
 from app.settings import (
     PWD_CONTEXT,
@@ -25,10 +26,40 @@ def get_password_hash(password):
     return PWD_CONTEXT.hash(password)
 
 
+HASHING_POOL = HashingPool(
+    workers=settings.password_hash_workers,
+    max_queue=settings.password_hash_queue_size,
+    kind=settings.password_hash_executor
+)
+
+
+async def run_in_hashing_pool(func, *args):
+    """Runs hashing function off the event loop"""
+    try:
+        return await HASHING_POOL.run(func, *args)
+    except PoolSaturated:
+        raise HTTPException(
+            status_code=503,
+            detail='Server is busy, try again later',
+            headers={'Retry-After': '1'}
+        )
+
+
+async def verify_password_async(plain_password, hashed_password):
+    """Verify user password without blocking the event loop"""
+    return await run_in_hashing_pool(
+        verify_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password):
+    """Hash user password without blocking the event loop"""
+    return await run_in_hashing_pool(get_password_hash, password)
+
+
 async def authenticate_user(username: str, password: str):
     """Authenticate user with password verification"""
     user = await UserRepo.safe_get_user_by_username(username=username)
-    if user and verify_password(password, user.password):
+    if user and await verify_password_async(password, user.password):
         return user
     return None
 
@@ -68,12 +99,13 @@ async def get_current_user(token_payload: dict = Depends(verify_token)):
         raise HTTPException(status_code=401,
                             detail='Invalid authentication credentials')
 
-    try:
-        user = await UserRepo.safe_get_user_by_username(username=username)
-        return user
+    user_id = token_payload.get('uid') if settings.token_user_id else None
+    user = await UserRepo.get_cached_user(username=username, user_id=user_id)
 
-    except NoMatch:
+    if user is None:
         raise HTTPException(
             status_code=401,
             detail="User not found"
         )
+
+    return user
@@ -12,5 +12,23 @@ SECRET_KEY = 'SECRET_KEY'
 ENCODING_ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 120
 
+# Max amount of tasks in a single bulk request
+BULK_MAX_TASKS = 1000
+
+# Clients may cache task reads but have to revalidate them with ETag
+CACHE_CONTROL = "private, no-cache"
+
+# Text search config of tasks.search column, see migrations
+SEARCH_CONFIG = "english"
+
+# Request running the same statement this often is reported as N+1
+N_PLUS_ONE_REPEATS = 3
+
+# Foreign key of tasks to their owner, see migrations
+TASK_OWNER_FK = "fk_tasks_users_id_user"
+
+# NOTIFY channel of task changes, see migrations
+TASK_CHANGES_CHANNEL = "task_changes"
+
 # OAuth2 PasswordBearer for token retrieval
 OAUTH2_SCHEME = OAuth2PasswordBearer(tokenUrl="token")
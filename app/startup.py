@@ -0,0 +1,57 @@
+"""Startup phases and their timings"""
+
+import logging
+import os
+import time
+from contextlib import contextmanager
+
+import databases
+
+logger = logging.getLogger(__name__)
+
+ALEMBIC_INI = os.path.join(os.path.dirname(os.path.dirname(__file__)),
+                           'alembic.ini')
+
+
+class StartupTimer():
+    """Collects duration of every startup phase in milliseconds"""
+
+    def __init__(self):
+        self.timings = {}
+
+    @contextmanager
+    def phase(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = round(
+                (time.perf_counter() - started) * 1000, 2)
+
+    def report(self) -> None:
+        logger.info(
+            "Startup finished in %.2f ms: %s",
+            sum(self.timings.values()),
+            ", ".join(f"{name}={ms} ms" for name, ms in self.timings.items())
+        )
+
+
+async def check_schema(database: databases.Database) -> None:
+    """Fails startup if DB schema is not at the latest migration"""
+    from alembic.config import Config
+    from alembic.script import ScriptDirectory
+
+    head = ScriptDirectory.from_config(Config(ALEMBIC_INI)).get_current_head()
+    try:
+        current = await database.fetch_val(
+            "SELECT version_num FROM alembic_version")
+    except Exception as error:
+        raise RuntimeError(
+            "Database schema is not migrated, run `alembic upgrade head`"
+        ) from error
+
+    if current != head:
+        raise RuntimeError(
+            f"Database schema is at revision {current}, expected {head}, "
+            "run `alembic upgrade head`"
+        )
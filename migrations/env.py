@@ -0,0 +1,55 @@
+"""Alembic environment bound to app metadata"""
+
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy import create_engine, pool
+
+from app.config import settings
+from app.db import metadata
+
+
+config = context.config
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+
+# Maintained only by migrations, not declared in models
+UNMODELED = {('column', 'search'), ('index', 'ix_tasks_search')}
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    """Keeps autogenerate from dropping schema objects models don't know"""
+    return not (reflected and (type_, name) in UNMODELED)
+
+
+def run_migrations_offline():
+    """Emit migration SQL to stdout without connecting to DB"""
+    context.configure(
+        url=settings.db_url,
+        target_metadata=metadata,
+        include_object=include_object,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+    )
+
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online():
+    """Apply migrations to DB from DATABASE_URL"""
+    engine = create_engine(settings.db_url, poolclass=pool.NullPool)
+
+    with engine.connect() as connection:
+        context.configure(connection=connection, target_metadata=metadata,
+                          include_object=include_object)
+
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,64 @@
+"""Initial schema with indexes for task listings
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+
+Databases created by the old `metadata.create_all` on startup already
+have both tables, so they are created only when missing and this
+revision can be applied on top of them.
+"""
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    existing_tables = []
+    if not context.is_offline_mode():
+        existing_tables = sa.inspect(op.get_bind()).get_table_names()
+
+    if 'users' not in existing_tables:
+        op.create_table(
+            'users',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('first_name', sa.String(length=128), nullable=False),
+            sa.Column('last_name', sa.Text(), nullable=True),
+            sa.Column('username', sa.String(length=128), nullable=False,
+                      unique=True),
+            sa.Column('password', sa.String(length=128), nullable=False),
+        )
+
+    if 'tasks' not in existing_tables:
+        op.create_table(
+            'tasks',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('title', sa.String(length=255), nullable=False),
+            sa.Column('description', sa.Text(), nullable=True),
+            sa.Column('status', sa.String(length=20), nullable=True),
+            sa.Column('user', sa.Integer(), nullable=False),
+            sa.ForeignKeyConstraint(['user'], ['users.id'],
+                                    name='fk_tasks_users_id_user',
+                                    ondelete='CASCADE'),
+        )
+
+    # Built concurrently so existing tables stay writable meanwhile
+    with op.get_context().autocommit_block():
+        op.create_index('ix_tasks_user_status_id', 'tasks',
+                        ['user', 'status', 'id'],
+                        postgresql_concurrently=True)
+        op.create_index('ix_tasks_status_id', 'tasks', ['status', 'id'],
+                        postgresql_concurrently=True)
+
+
+def downgrade():
+    op.drop_index('ix_tasks_status_id', table_name='tasks')
+    op.drop_index('ix_tasks_user_status_id', table_name='tasks')
+    op.drop_table('tasks')
+    op.drop_table('users')
@@ -0,0 +1,120 @@
+"""Version counters of tasks and task lists for conditional GET
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+
+`tasks.version` grows on every update of a task. `task_list_stats`
+keeps a version per listing scope and grows whenever any task in the
+scope is created, changed or deleted. Scopes are (user, status) pairs
+where user 0 means any user, status '*' means any status and '' stands
+for NULL status. Both are maintained by triggers, so bulk statements
+and cascade deletes are covered too.
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('tasks', sa.Column('version', sa.Integer(), nullable=False,
+                                     server_default='1'))
+    op.create_table(
+        'task_list_stats',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('version', sa.BigInteger(), nullable=False,
+                  server_default='0'),
+        sa.PrimaryKeyConstraint('user_id', 'status'),
+    )
+
+    op.execute("""
+        CREATE FUNCTION tasks_bump_version() RETURNS trigger AS $$
+        BEGIN
+            NEW.version := OLD.version + 1;
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER tasks_bump_version BEFORE UPDATE ON tasks
+        FOR EACH ROW EXECUTE FUNCTION tasks_bump_version()
+    """)
+
+    # Scopes are upserted in key order so concurrent writers lock rows
+    # in the same order and can't deadlock
+    op.execute("""
+        CREATE FUNCTION task_list_stats_bump(user_ids integer[],
+                                             statuses text[])
+        RETURNS void AS $$
+            INSERT INTO task_list_stats AS stats (user_id, status, version)
+            SELECT DISTINCT scope.user_id, scope.status, 1
+            FROM unnest(user_ids, statuses) AS changed(user_id, status)
+            CROSS JOIN LATERAL (VALUES
+                (changed.user_id, coalesce(changed.status, '')),
+                (changed.user_id, '*'),
+                (0, coalesce(changed.status, '')),
+                (0, '*')
+            ) AS scope(user_id, status)
+            ORDER BY scope.user_id, scope.status
+            ON CONFLICT (user_id, status)
+            DO UPDATE SET version = stats.version + 1
+        $$ LANGUAGE sql
+    """)
+    op.execute("""
+        CREATE FUNCTION tasks_track_lists() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                PERFORM task_list_stats_bump(array_agg("user"),
+                                             array_agg(status::text))
+                FROM new_rows;
+            ELSIF TG_OP = 'UPDATE' THEN
+                PERFORM task_list_stats_bump(array_agg(changed.user_id),
+                                             array_agg(changed.status))
+                FROM (
+                    SELECT "user" AS user_id, status::text FROM old_rows
+                    UNION ALL
+                    SELECT "user", status::text FROM new_rows
+                ) AS changed;
+            ELSE
+                PERFORM task_list_stats_bump(array_agg("user"),
+                                             array_agg(status::text))
+                FROM old_rows;
+            END IF;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER tasks_track_lists_insert AFTER INSERT ON tasks
+        REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION tasks_track_lists()
+    """)
+    op.execute("""
+        CREATE TRIGGER tasks_track_lists_update AFTER UPDATE ON tasks
+        REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION tasks_track_lists()
+    """)
+    op.execute("""
+        CREATE TRIGGER tasks_track_lists_delete AFTER DELETE ON tasks
+        REFERENCING OLD TABLE AS old_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION tasks_track_lists()
+    """)
+
+
+def downgrade():
+    op.execute("DROP TRIGGER tasks_track_lists_delete ON tasks")
+    op.execute("DROP TRIGGER tasks_track_lists_update ON tasks")
+    op.execute("DROP TRIGGER tasks_track_lists_insert ON tasks")
+    op.execute("DROP FUNCTION tasks_track_lists()")
+    op.execute("DROP FUNCTION task_list_stats_bump(integer[], text[])")
+    op.execute("DROP TRIGGER tasks_bump_version ON tasks")
+    op.execute("DROP FUNCTION tasks_bump_version()")
+    op.drop_table('task_list_stats')
+    op.drop_column('tasks', 'version')
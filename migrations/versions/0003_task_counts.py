@@ -0,0 +1,148 @@
+"""Maintained task counts per listing scope
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+
+`task_list_stats.task_count` holds the number of tasks in every scope,
+so paginated listings read their total instead of running COUNT(*).
+Triggers from 0002 now pass +1 for new rows and -1 for old ones, so
+inserts, updates moving a task between statuses, deletes and cascade
+deletes of users all keep counts exact in the same transaction.
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('task_list_stats',
+                  sa.Column('task_count', sa.BigInteger(), nullable=False,
+                            server_default='0'))
+
+    # Scopes are upserted in key order so concurrent writers lock rows
+    # in the same order and can't deadlock
+    op.execute("""
+        CREATE FUNCTION task_list_stats_apply(user_ids integer[],
+                                              statuses text[],
+                                              deltas integer[])
+        RETURNS void AS $$
+            INSERT INTO task_list_stats AS stats
+                (user_id, status, version, task_count)
+            SELECT scope.user_id, scope.status, 1, sum(changed.delta)
+            FROM unnest(user_ids, statuses, deltas)
+                AS changed(user_id, status, delta)
+            CROSS JOIN LATERAL (VALUES
+                (changed.user_id, coalesce(changed.status, '')),
+                (changed.user_id, '*'),
+                (0, coalesce(changed.status, '')),
+                (0, '*')
+            ) AS scope(user_id, status)
+            GROUP BY scope.user_id, scope.status
+            ORDER BY scope.user_id, scope.status
+            ON CONFLICT (user_id, status)
+            DO UPDATE SET version = stats.version + 1,
+                          task_count = stats.task_count
+                                       + excluded.task_count
+        $$ LANGUAGE sql
+    """)
+    op.execute("""
+        CREATE OR REPLACE FUNCTION tasks_track_lists() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                PERFORM task_list_stats_apply(array_agg("user"),
+                                              array_agg(status::text),
+                                              array_agg(1))
+                FROM new_rows;
+            ELSIF TG_OP = 'UPDATE' THEN
+                PERFORM task_list_stats_apply(array_agg(changed.user_id),
+                                              array_agg(changed.status),
+                                              array_agg(changed.delta))
+                FROM (
+                    SELECT "user" AS user_id, status::text, -1 AS delta
+                    FROM old_rows
+                    UNION ALL
+                    SELECT "user", status::text, 1 FROM new_rows
+                ) AS changed;
+            ELSE
+                PERFORM task_list_stats_apply(array_agg("user"),
+                                              array_agg(status::text),
+                                              array_agg(-1))
+                FROM old_rows;
+            END IF;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("DROP FUNCTION task_list_stats_bump(integer[], text[])")
+
+    # Writers wait until existing tasks are counted
+    op.execute("LOCK TABLE tasks IN SHARE MODE")
+    op.execute("""
+        INSERT INTO task_list_stats AS stats (user_id, status, task_count)
+        SELECT scope.user_id, scope.status, count(*)
+        FROM tasks
+        CROSS JOIN LATERAL (VALUES
+            (tasks."user", coalesce(tasks.status::text, '')),
+            (tasks."user", '*'),
+            (0, coalesce(tasks.status::text, '')),
+            (0, '*')
+        ) AS scope(user_id, status)
+        GROUP BY scope.user_id, scope.status
+        ON CONFLICT (user_id, status)
+        DO UPDATE SET task_count = excluded.task_count
+    """)
+
+
+def downgrade():
+    op.execute("""
+        CREATE FUNCTION task_list_stats_bump(user_ids integer[],
+                                             statuses text[])
+        RETURNS void AS $$
+            INSERT INTO task_list_stats AS stats (user_id, status, version)
+            SELECT DISTINCT scope.user_id, scope.status, 1
+            FROM unnest(user_ids, statuses) AS changed(user_id, status)
+            CROSS JOIN LATERAL (VALUES
+                (changed.user_id, coalesce(changed.status, '')),
+                (changed.user_id, '*'),
+                (0, coalesce(changed.status, '')),
+                (0, '*')
+            ) AS scope(user_id, status)
+            ORDER BY scope.user_id, scope.status
+            ON CONFLICT (user_id, status)
+            DO UPDATE SET version = stats.version + 1
+        $$ LANGUAGE sql
+    """)
+    op.execute("""
+        CREATE OR REPLACE FUNCTION tasks_track_lists() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                PERFORM task_list_stats_bump(array_agg("user"),
+                                             array_agg(status::text))
+                FROM new_rows;
+            ELSIF TG_OP = 'UPDATE' THEN
+                PERFORM task_list_stats_bump(array_agg(changed.user_id),
+                                             array_agg(changed.status))
+                FROM (
+                    SELECT "user" AS user_id, status::text FROM old_rows
+                    UNION ALL
+                    SELECT "user", status::text FROM new_rows
+                ) AS changed;
+            ELSE
+                PERFORM task_list_stats_bump(array_agg("user"),
+                                             array_agg(status::text))
+                FROM old_rows;
+            END IF;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("DROP FUNCTION task_list_stats_apply(integer[], text[], "
+               "integer[])")
+    op.drop_column('task_list_stats', 'task_count')
@@ -0,0 +1,46 @@
+"""Full-text search over task titles and descriptions
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+
+`tasks.search` is a stored generated tsvector, title words weighted
+above description words, with a GIN index. The column is not part of
+the ormar model, it is only read by search queries. Adding it rewrites
+the table once.
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import TSVECTOR
+
+
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Text search config must match SEARCH_CONFIG in app/settings.py
+    op.add_column('tasks', sa.Column(
+        'search', TSVECTOR(),
+        sa.Computed(
+            "setweight(to_tsvector('english', title), 'A') || "
+            "setweight(to_tsvector('english', coalesce(description, '')), "
+            "'B')",
+            persisted=True
+        ),
+        nullable=False
+    ))
+
+    # Built concurrently so the table stays writable meanwhile
+    with op.get_context().autocommit_block():
+        op.create_index('ix_tasks_search', 'tasks', ['search'],
+                        postgresql_using='gin',
+                        postgresql_concurrently=True)
+
+
+def downgrade():
+    op.drop_index('ix_tasks_search', table_name='tasks')
+    op.drop_column('tasks', 'search')
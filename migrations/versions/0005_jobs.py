@@ -0,0 +1,58 @@
+"""Background jobs
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18
+
+`jobs` is the queue of long-running operations processed in batches by
+workers, see app/jobs.py. Workers claim queued jobs, and running jobs
+whose heartbeat stopped, with `FOR UPDATE SKIP LOCKED`. `user_id` has
+no foreign key because account deletion jobs outlive their user.
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import JSONB
+
+
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'jobs',
+        sa.Column('id', sa.BigInteger(), nullable=False),
+        sa.Column('kind', sa.String(length=50), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('params', JSONB(), nullable=False,
+                  server_default=sa.text("'{}'::jsonb")),
+        sa.Column('status', sa.String(length=20), nullable=False,
+                  server_default='queued'),
+        sa.Column('total', sa.BigInteger(), nullable=True),
+        sa.Column('done', sa.BigInteger(), nullable=False,
+                  server_default='0'),
+        sa.Column('attempts', sa.Integer(), nullable=False,
+                  server_default='0'),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=False,
+                  server_default=sa.func.now()),
+        sa.Column('started_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('heartbeat_at', sa.DateTime(timezone=True),
+                  nullable=True),
+        sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    # Workers only ever look for unfinished jobs
+    op.create_index('ix_jobs_pending', 'jobs', ['id'],
+                    postgresql_where=sa.text(
+                        "status IN ('queued', 'running')"))
+    op.create_index('ix_jobs_user_id', 'jobs', ['user_id'])
+
+
+def downgrade():
+    op.drop_index('ix_jobs_user_id', table_name='jobs')
+    op.drop_index('ix_jobs_pending', table_name='jobs')
+    op.drop_table('jobs')
@@ -0,0 +1,92 @@
+"""Notifications of task changes for the change feed
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18
+
+Every statement changing tasks sends one NOTIFY on `task_changes` per
+changed task with its id, owner and status, so the app can push changes
+to subscribers instead of having them poll. Notifications are delivered
+on commit only. Statements changing more than 100 tasks (imports,
+background jobs) send a single `resync` per affected user instead.
+"""
+
+from alembic import op
+
+
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Channel must match TASK_CHANGES_CHANNEL in app/settings.py
+    op.execute("""
+        CREATE FUNCTION tasks_notify_changes() RETURNS trigger AS $$
+        DECLARE
+            changed bigint;
+        BEGIN
+            IF TG_OP = 'DELETE' THEN
+                SELECT count(*) INTO changed FROM old_rows;
+            ELSE
+                SELECT count(*) INTO changed FROM new_rows;
+            END IF;
+
+            IF changed > 100 THEN
+                IF TG_OP = 'DELETE' THEN
+                    PERFORM pg_notify('task_changes', json_build_object(
+                        'op', 'resync', 'user_id', user_id)::text)
+                    FROM (SELECT DISTINCT "user" AS user_id FROM old_rows)
+                        AS users;
+                ELSE
+                    PERFORM pg_notify('task_changes', json_build_object(
+                        'op', 'resync', 'user_id', user_id)::text)
+                    FROM (SELECT DISTINCT "user" AS user_id FROM new_rows)
+                        AS users;
+                END IF;
+            ELSIF TG_OP = 'INSERT' THEN
+                PERFORM pg_notify('task_changes', json_build_object(
+                    'op', 'created', 'id', id, 'user_id', "user",
+                    'status', status, 'version', version)::text)
+                FROM new_rows ORDER BY id;
+            ELSIF TG_OP = 'UPDATE' THEN
+                PERFORM pg_notify('task_changes', json_build_object(
+                    'op', 'updated', 'id', new.id, 'user_id', new."user",
+                    'status', new.status, 'old_status', old.status,
+                    'version', new.version)::text)
+                FROM new_rows AS new
+                JOIN old_rows AS old ON old.id = new.id
+                ORDER BY new.id;
+            ELSE
+                PERFORM pg_notify('task_changes', json_build_object(
+                    'op', 'deleted', 'id', id, 'user_id', "user",
+                    'status', status)::text)
+                FROM old_rows ORDER BY id;
+            END IF;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER tasks_notify_insert AFTER INSERT ON tasks
+        REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION tasks_notify_changes()
+    """)
+    op.execute("""
+        CREATE TRIGGER tasks_notify_update AFTER UPDATE ON tasks
+        REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION tasks_notify_changes()
+    """)
+    op.execute("""
+        CREATE TRIGGER tasks_notify_delete AFTER DELETE ON tasks
+        REFERENCING OLD TABLE AS old_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION tasks_notify_changes()
+    """)
+
+
+def downgrade():
+    op.execute("DROP TRIGGER tasks_notify_delete ON tasks")
+    op.execute("DROP TRIGGER tasks_notify_update ON tasks")
+    op.execute("DROP TRIGGER tasks_notify_insert ON tasks")
+    op.execute("DROP FUNCTION tasks_notify_changes()")
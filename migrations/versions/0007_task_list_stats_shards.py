@@ -0,0 +1,105 @@
+"""Sharded counters of task scopes of any user
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18
+
+Every write to tasks used to upsert the same `(0, '*')` and `(0, status)`
+rows, so writers of all users queued on their row locks, held until
+commit by bulk statements, imports and jobs. Scopes of any user are now
+split into 16 shards picked by owner of the changed task, so writers of
+different users mostly lock different rows. Readers sum the shards,
+per user scopes stay in shard 0.
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('task_list_stats',
+                  sa.Column('shard', sa.SmallInteger(), nullable=False,
+                            server_default='0'))
+    op.drop_constraint('task_list_stats_pkey', 'task_list_stats',
+                       type_='primary')
+    op.create_primary_key('task_list_stats_pkey', 'task_list_stats',
+                          ['user_id', 'status', 'shard'])
+
+    # Existing counts stay in shard 0, readers sum them with new shards
+    op.execute("""
+        CREATE OR REPLACE FUNCTION task_list_stats_apply(
+            user_ids integer[], statuses text[], deltas integer[])
+        RETURNS void AS $$
+            INSERT INTO task_list_stats AS stats
+                (user_id, status, shard, version, task_count)
+            SELECT scope.user_id, scope.status, scope.shard, 1,
+                   sum(changed.delta)
+            FROM unnest(user_ids, statuses, deltas)
+                AS changed(user_id, status, delta)
+            CROSS JOIN LATERAL (VALUES
+                (changed.user_id, coalesce(changed.status, ''), 0),
+                (changed.user_id, '*', 0),
+                (0, coalesce(changed.status, ''), changed.user_id % 16),
+                (0, '*', changed.user_id % 16)
+            ) AS scope(user_id, status, shard)
+            GROUP BY scope.user_id, scope.status, scope.shard
+            ORDER BY scope.user_id, scope.status, scope.shard
+            ON CONFLICT (user_id, status, shard)
+            DO UPDATE SET version = stats.version + 1,
+                          task_count = stats.task_count
+                                       + excluded.task_count
+        $$ LANGUAGE sql
+    """)
+
+
+def downgrade():
+    # Writers wait until shards are merged
+    op.execute("LOCK TABLE tasks IN SHARE MODE")
+    op.execute("""
+        WITH merged AS (
+            DELETE FROM task_list_stats WHERE shard <> 0
+            RETURNING user_id, status, version, task_count
+        )
+        INSERT INTO task_list_stats AS stats
+            (user_id, status, shard, version, task_count)
+        SELECT user_id, status, 0, sum(version), sum(task_count)
+        FROM merged
+        GROUP BY user_id, status
+        ON CONFLICT (user_id, status, shard)
+        DO UPDATE SET version = stats.version + excluded.version,
+                      task_count = stats.task_count + excluded.task_count
+    """)
+    op.drop_constraint('task_list_stats_pkey', 'task_list_stats',
+                       type_='primary')
+    op.drop_column('task_list_stats', 'shard')
+    op.create_primary_key('task_list_stats_pkey', 'task_list_stats',
+                          ['user_id', 'status'])
+    op.execute("""
+        CREATE OR REPLACE FUNCTION task_list_stats_apply(
+            user_ids integer[], statuses text[], deltas integer[])
+        RETURNS void AS $$
+            INSERT INTO task_list_stats AS stats
+                (user_id, status, version, task_count)
+            SELECT scope.user_id, scope.status, 1, sum(changed.delta)
+            FROM unnest(user_ids, statuses, deltas)
+                AS changed(user_id, status, delta)
+            CROSS JOIN LATERAL (VALUES
+                (changed.user_id, coalesce(changed.status, '')),
+                (changed.user_id, '*'),
+                (0, coalesce(changed.status, '')),
+                (0, '*')
+            ) AS scope(user_id, status)
+            GROUP BY scope.user_id, scope.status
+            ORDER BY scope.user_id, scope.status
+            ON CONFLICT (user_id, status)
+            DO UPDATE SET version = stats.version + 1,
+                          task_count = stats.task_count
+                                       + excluded.task_count
+        $$ LANGUAGE sql
+    """)
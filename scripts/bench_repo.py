@@ -0,0 +1,87 @@
+"""Compares ormar and raw asyncpg backends of hot repository reads.
+
+Usage: python scripts/bench_repo.py [iterations]
+
+Runs against DATABASE_URL, which should contain some users and tasks.
+Every read is called `iterations` times sequentially with each backend,
+mean and p95 latency of a call are printed with the asyncpg speedup.
+"""
+
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from fastapi_pagination import Params  # noqa: E402
+
+from app.config import settings  # noqa: E402
+from app.db import database  # noqa: E402
+from app.repo.tasks import TaskRepo, tasks_table  # noqa: E402
+from app.repo.users import UserRepo, users_table  # noqa: E402
+
+DEFAULT_ITERATIONS = 2000
+BACKENDS = ('ormar', 'asyncpg')
+
+
+async def measure(call, iterations: int) -> list:
+    """Latencies of sequential calls in microseconds, after a warm up"""
+    for _ in range(min(iterations, 100)):
+        await call()
+
+    latencies = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        await call()
+        latencies.append((time.perf_counter() - started) * 1_000_000)
+    return latencies
+
+
+async def main() -> int:
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 \
+        else DEFAULT_ITERATIONS
+
+    await database.connect()
+    try:
+        task_id = await database.fetch_val(
+            tasks_table.select().with_only_columns([tasks_table.c.id])
+            .limit(1))
+        username = await database.fetch_val(
+            users_table.select().with_only_columns([users_table.c.username])
+            .limit(1))
+        if task_id is None or username is None:
+            print('Database should contain at least one task and user')
+            return 1
+
+        reads = {
+            'safe_get_task_by_id': lambda: TaskRepo.safe_get_task_by_id(
+                task_id),
+            'get_paginated_tasks': lambda: TaskRepo.get_paginated_tasks(
+                Params(page=1, size=10), filters={}, total=10),
+            'safe_get_user_by_username':
+                lambda: UserRepo.safe_get_user_by_username(username),
+        }
+
+        print(f'{iterations} calls per read')
+        for name, call in reads.items():
+            means = {}
+            for backend in BACKENDS:
+                settings.repo_backend = backend
+                latencies = await measure(call, iterations)
+                means[backend] = statistics.mean(latencies)
+                p95 = statistics.quantiles(latencies, n=20)[-1]
+                print(f'  {name:28} {backend:8} '
+                      f'mean {means[backend]:8.1f} us  p95 {p95:8.1f} us')
+            print(f'  {name:28} speedup  '
+                  f'{means["ormar"] / means["asyncpg"]:.2f}x')
+    finally:
+        await database.disconnect()
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,121 @@
+"""Shows that task search stays sub-linear while the table grows.
+
+Usage: python scripts/bench_search.py [max_tasks]
+
+Runs against DATABASE_URL migrated to head. A temporary user gets a
+fixed set of tasks containing a rare word plus filler tasks, which are
+added in steps up to `max_tasks` (1M by default). At every step the
+rare word is searched through TaskRepo.search_tasks and, for
+comparison, with a sequential ILIKE scan. The user and all its tasks
+are deleted at the end.
+"""
+
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from app.db import database  # noqa: E402
+from app.repo.tasks import TaskRepo  # noqa: E402
+
+DEFAULT_MAX_TASKS = 1_000_000
+STEPS = 4
+BATCH_SIZE = 100_000
+NEEDLES = 100
+SEARCHES = 50
+SCANS = 3
+BENCH_USERNAME = 'bench-search'
+
+WORDS = [
+    'report', 'meeting', 'review', 'deploy', 'invoice', 'client', 'budget',
+    'design', 'backup', 'server', 'release', 'planning', 'update', 'email',
+    'contract', 'testing', 'research', 'training', 'support', 'ticket',
+    'migration', 'dashboard', 'payment', 'schedule', 'feedback', 'audit',
+    'security', 'network', 'database', 'office', 'travel', 'hiring',
+    'interview', 'roadmap', 'sprint', 'refactor', 'document', 'survey',
+    'vendor', 'launch', 'metrics', 'onboarding', 'renewal', 'inventory',
+    'shipping', 'forecast', 'proposal', 'workshop', 'newsletter', 'cleanup',
+]
+
+FILLER_INSERT = """
+    INSERT INTO tasks (title, description, status, "user")
+    SELECT w.words[1 + i % 50] || ' ' || w.words[1 + (i / 50) % 50],
+           w.words[1 + (i / 7) % 50] || ' ' || w.words[1 + (i / 13) % 50]
+               || ' ' || w.words[1 + (i / 31) % 50],
+           'New', $1
+    FROM generate_series($2::int, $3::int) AS i,
+         (SELECT $4::text[] AS words) AS w
+"""
+
+
+async def timed(call, repeat: int) -> float:
+    """Median latency of `repeat` sequential calls in milliseconds"""
+    latencies = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await call()
+        latencies.append((time.perf_counter() - started) * 1000)
+    return statistics.median(latencies)
+
+
+async def main() -> int:
+    max_tasks = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_MAX_TASKS
+    sizes = [max_tasks * step // STEPS for step in range(1, STEPS + 1)]
+
+    await database.connect()
+    try:
+        async with database.connection() as connection:
+            raw = connection.raw_connection
+            user_id = await raw.fetchval(
+                "INSERT INTO users (first_name, username, password) "
+                "VALUES ('Bench', $1, 'not-a-hash') RETURNING id",
+                BENCH_USERNAME)
+            try:
+                await raw.execute(
+                    "INSERT INTO tasks (title, description, status, \"user\") "
+                    "SELECT 'find the needle ' || i, 'rare word', 'New', $1 "
+                    "FROM generate_series(1, $2) AS i", user_id, NEEDLES)
+
+                def search():
+                    return TaskRepo.search_tasks('needle', after=None,
+                                                 limit=10, filters={})
+
+                def scan():
+                    return raw.fetch(
+                        "SELECT id FROM tasks WHERE title ILIKE '%needle%' "
+                        "ORDER BY id LIMIT 10")
+
+                inserted = 0
+                print(f"{'tasks':>10} {'search ms':>10} {'ilike ms':>10}")
+                for size in sizes:
+                    while inserted < size:
+                        batch = min(BATCH_SIZE, size - inserted)
+                        await raw.execute(FILLER_INSERT, user_id, inserted + 1,
+                                          inserted + batch, WORDS)
+                        inserted += batch
+                    await raw.execute("ANALYZE tasks")
+
+                    await search()
+                    search_ms = await timed(search, SEARCHES)
+                    scan_ms = await timed(scan, SCANS)
+                    print(f'{size:>10} {search_ms:>10.2f} {scan_ms:>10.2f}')
+
+                plan = await raw.fetch(
+                    "EXPLAIN SELECT id FROM tasks WHERE search @@ "
+                    "websearch_to_tsquery('english', 'needle')")
+                uses_index = any('ix_tasks_search' in row[0] for row in plan)
+                print(f"search uses ix_tasks_search: {uses_index}")
+            finally:
+                await raw.execute("DELETE FROM users WHERE id = $1", user_id)
+    finally:
+        await database.disconnect()
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(asyncio.run(main()))
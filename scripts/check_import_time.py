@@ -0,0 +1,53 @@
+"""Fails if importing the app takes longer than the budget.
+
+Usage: python scripts/check_import_time.py [budget_ms]
+
+Import is measured in a fresh interpreter with `-X importtime`, the
+slowest modules are printed to help finding what blew the budget.
+"""
+
+import os
+import subprocess
+import sys
+
+DEFAULT_BUDGET_MS = 1500
+MODULE = 'app.main'
+SHOW_SLOWEST = 10
+
+
+def measure_import(module: str) -> list:
+    """Returns (cumulative_us, module_name) for every imported module"""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=root, capture_output=True, text=True, check=True
+    )
+
+    timings = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        timings.append((int(cumulative), name.strip()))
+    return timings
+
+
+def main() -> int:
+    budget_ms = float(sys.argv[1]) if len(sys.argv) > 1 \
+        else float(os.environ.get('IMPORT_BUDGET_MS', DEFAULT_BUDGET_MS))
+
+    timings = measure_import(MODULE)
+    total_ms = next(us for us, name in timings if name == MODULE) / 1000
+
+    print(f'import {MODULE}: {total_ms:.1f} ms (budget {budget_ms:.0f} ms)')
+    for us, name in sorted(timings, reverse=True)[1:SHOW_SLOWEST + 1]:
+        print(f'  {us / 1000:8.1f} ms  {name}')
+
+    if total_ms > budget_ms:
+        print('Import time budget exceeded')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,70 @@
+"""Imports tasks of a user from a CSV or NDJSON file using COPY.
+
+Usage: python scripts/import_tasks.py USERNAME FILE [--format csv|ndjson]
+
+Runs against DATABASE_URL. The file is read in chunks, so files of any
+size are imported with bounded memory. Format is taken from the file
+extension unless given. Rejected rows are printed with their line
+number, exit code is 1 if there were any.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from app.db import database  # noqa: E402
+from app.importer import load_tasks  # noqa: E402
+from app.repo.users import UserRepo  # noqa: E402
+from app.schemas.task_schemas import ExportFormat  # noqa: E402
+
+READ_SIZE = 1024 * 1024
+
+
+async def read_chunks(path: str):
+    with open(path, 'rb') as source:
+        while chunk := source.read(READ_SIZE):
+            yield chunk
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('username')
+    parser.add_argument('file')
+    parser.add_argument('--format', choices=[f.value for f in ExportFormat])
+    args = parser.parse_args()
+
+    extension = os.path.splitext(args.file)[1].lstrip('.').lower()
+    try:
+        import_format = ExportFormat(args.format or extension)
+    except ValueError:
+        parser.error(f"can't tell format of '{args.file}', use --format")
+
+    await database.connect()
+    try:
+        user = await UserRepo.safe_get_user_by_username(args.username)
+        if user is None:
+            print(f"User '{args.username}' not found")
+            return 2
+
+        started = time.perf_counter()
+        result = await load_tasks(read_chunks(args.file), import_format,
+                                  user.id)
+        elapsed = max(time.perf_counter() - started, 1e-6)
+    finally:
+        await database.disconnect()
+
+    for error in result['errors']:
+        print(f"line {error['line']}: {error['error']}")
+    print(f"{result['imported']} tasks imported, {result['failed']} rows "
+          f"rejected in {elapsed:.1f} s "
+          f"({result['imported'] / elapsed:.0f} rows/s)")
+    return 1 if result['failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,45 @@
+"""Runs background jobs outside of app processes.
+
+Usage: python scripts/job_worker.py [workers]
+
+Processes jobs of the `jobs` table against DATABASE_URL until
+interrupted, for deployments setting JOB_WORKERS=0 in app processes.
+Jobs interrupted by stopping it are resumed by any worker once their
+heartbeat gets stale.
+"""
+
+import asyncio
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from app.config import settings  # noqa: E402
+from app.db import database  # noqa: E402
+from app.jobs import JobRunner  # noqa: E402
+
+
+async def main() -> int:
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else \
+        max(settings.job_workers, 1)
+    runner = JobRunner(workers=workers,
+                       poll_interval=settings.job_poll_interval,
+                       stale_seconds=settings.job_stale_seconds)
+
+    await database.connect()
+    try:
+        runner.start()
+        print(f'{workers} job workers running')
+        await asyncio.Event().wait()
+    finally:
+        await runner.stop()
+        await database.disconnect()
+    return 0
+
+
+if __name__ == '__main__':
+    try:
+        sys.exit(asyncio.run(main()))
+    except KeyboardInterrupt:
+        sys.exit(0)
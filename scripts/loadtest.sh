@@ -0,0 +1,4 @@
+#!/bin/bash
+# Load tests the stack started by ./scripts/run.sh, arguments are passed
+# to tests/loadtest.py, e.g. `--duration 60 --output report.json`
+python -m tests.loadtest --base-url "http://localhost:${APP_PORT:-8080}/api/v1" "$@"
@@ -0,0 +1,6 @@
+#!/bin/bash
+# Runs alembic inside web container, defaults to `upgrade head`
+if [ $# -eq 0 ]; then
+    set -- upgrade head
+fi
+APP_PORT=8080 docker-compose run --rm web alembic "$@"
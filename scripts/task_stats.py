@@ -0,0 +1,50 @@
+"""Checks or rebuilds maintained task counts against actual tasks.
+
+Usage: python scripts/task_stats.py check|rebuild
+
+Counts in `task_list_stats` are kept by triggers and should never
+drift. `check` counts tasks with a full scan and prints every scope
+whose stored count differs, exiting with 1 if any. `rebuild` fixes
+them while writers to tasks are blocked.
+"""
+
+import asyncio
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from app.db import database  # noqa: E402
+from app.repo.tasks import TaskRepo  # noqa: E402
+
+COMMANDS = ('check', 'rebuild')
+
+
+async def main() -> int:
+    if len(sys.argv) != 2 or sys.argv[1] not in COMMANDS:
+        print(__doc__.splitlines()[2])
+        return 2
+
+    await database.connect()
+    try:
+        if sys.argv[1] == 'rebuild':
+            fixed = await TaskRepo.rebuild_task_counts()
+            for row in fixed:
+                print(f"fixed user {row['user_id']} status "
+                      f"'{row['status']}': {row['task_count']}")
+            print(f'{len(fixed)} scopes rebuilt')
+            return 0
+
+        drift = await TaskRepo.find_task_count_drift()
+        for row in drift:
+            print(f"user {row['user_id']} status '{row['status']}': "
+                  f"stored {row['stored']}, actual {row['expected']}")
+        print(f'{len(drift)} scopes drifted')
+        return 1 if drift else 0
+    finally:
+        await database.disconnect()
+
+
+if __name__ == '__main__':
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,244 @@
+"""Micro-benchmarks of request hot path components.
+
+Usage: python -m tests.benchmarks [--filter TEXT] [--output FILE]
+                                  [--compare FILE] [--threshold PERCENT]
+
+Every component is timed in isolation: JWT creation and verification,
+task input validation, TaskOut page serialization, ormar hydration of
+task pages and password hashing at the configured bcrypt cost. Database
+benchmarks run against DATABASE_URL and are skipped when it can't be
+reached. Results can be written as JSON, `--compare` prints the change
+against an earlier run and fails when anything got slower than the
+threshold.
+"""
+
+import argparse
+import asyncio
+import datetime
+import json
+import logging
+import platform
+import statistics
+import time
+from typing import Callable, Dict, List, Optional
+
+import asyncpg
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from fastapi_pagination import Page, Params
+from fastapi_pagination.api import create_page
+
+from app.config import settings
+from app.db import TodoTask, TodoUser, database
+from app.repo.tasks import TaskRepo
+from app.schemas.task_schemas import TaskInput, TaskOut, TaskUpdate
+from app.security import create_access_token, get_password_hash, \
+    verify_token
+from app.serializers import json_response, page_out, task_out
+from app.settings import PWD_CONTEXT
+from tests.loadtest import git_commit
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_THRESHOLD = 10.0
+
+
+class Benchmark():
+    """Component timed by running it `number` times in `repeat` rounds"""
+
+    def __init__(self, name: str, func: Callable, number: int,
+                 repeat: int = 5, needs_db: bool = False):
+        self.name = name
+        self.func = func
+        self.number = number
+        self.repeat = repeat
+        self.needs_db = needs_db
+
+    async def run(self, scale: float = 1.0) -> dict:
+        number = max(1, int(self.number * scale))
+        is_async = asyncio.iscoroutinefunction(self.func)
+
+        rounds = []
+        for _ in range(self.repeat):
+            started = time.perf_counter()
+            for _ in range(number):
+                if is_async:
+                    await self.func()
+                else:
+                    self.func()
+            rounds.append((time.perf_counter() - started) / number * 1e6)
+
+        median = statistics.median(rounds)
+        return {
+            'calls': number * self.repeat,
+            'median_us': round(median, 3),
+            'min_us': round(min(rounds), 3),
+            'mean_us': round(statistics.mean(rounds), 3),
+            'ops_per_s': round(1e6 / median, 1),
+        }
+
+
+def make_tasks(count: int) -> List[TodoTask]:
+    owner = TodoUser(id=1, username='bench', password='not-a-hash',
+                     first_name='Bench')
+    return [
+        TodoTask(id=task_id, title=f'Task {task_id}',
+                 description='Benchmark task description',
+                 status='In Progress', user=owner)
+        for task_id in range(1, count + 1)
+    ]
+
+
+def response_model_page(tasks: List[TodoTask]) -> Callable:
+    """Page rendered the way FastAPI renders response models"""
+    page = create_page(tasks, total=len(tasks), params=Params(size=100))
+
+    def render():
+        validated = Page[TaskOut].validate(page)
+        return JSONResponse(jsonable_encoder(validated)).body
+    return render
+
+
+def fast_json_page(tasks: List[TodoTask]) -> Callable:
+    """Page rendered by FAST_JSON serializers"""
+    page = create_page(tasks, total=len(tasks), params=Params(size=100))
+    return lambda: json_response(page_out(page, task_out)).body
+
+
+def ormar_page(size: int) -> Callable:
+    params = Params(page=1, size=size)
+
+    async def fetch():
+        return await TaskRepo.get_paginated_tasks(params, {}, total=size)
+    return fetch
+
+
+def build_suite() -> List[Benchmark]:
+    token = create_access_token({'sub': 'bench'},
+                                datetime.timedelta(minutes=5))
+    task_input = {'title': 'Write report', 'description': 'Quarterly',
+                  'status': 'In Progress'}
+    pages = {size: make_tasks(size) for size in (10, 100)}
+
+    suite = [
+        Benchmark('security.create_access_token',
+                  lambda: create_access_token(
+                      {'sub': 'bench'}, datetime.timedelta(minutes=5)),
+                  number=2000),
+        Benchmark('security.verify_token', lambda: verify_token(token),
+                  number=2000),
+        Benchmark('schemas.TaskInput', lambda: TaskInput(**task_input),
+                  number=5000),
+        Benchmark('schemas.TaskUpdate', lambda: TaskUpdate(status='New'),
+                  number=5000),
+    ]
+    for size, tasks in pages.items():
+        suite.append(Benchmark(f'serialize.TaskOut_page_{size}',
+                               response_model_page(tasks),
+                               number=20000 // size))
+        suite.append(Benchmark(f'serialize.fast_json_page_{size}',
+                               fast_json_page(tasks),
+                               number=20000 // size))
+    for size in (10, 100):
+        suite.append(Benchmark(f'ormar.get_paginated_tasks_{size}',
+                               ormar_page(size), number=200, needs_db=True))
+    suite.append(Benchmark('security.get_password_hash',
+                           lambda: get_password_hash('benchmark-password'),
+                           number=1))
+    return suite
+
+
+async def connect() -> bool:
+    try:
+        await database.connect()
+    except (OSError, asyncpg.PostgresError) as error:
+        logger.warning('database benchmarks skipped: %s', error)
+        return False
+    return True
+
+
+async def run_suite(name_filter: Optional[str] = None, scale: float = 1.0,
+                    use_db: bool = True) -> Dict[str, dict]:
+    suite = [benchmark for benchmark in build_suite()
+             if not name_filter or name_filter in benchmark.name]
+
+    connected = use_db and any(b.needs_db for b in suite) and \
+        await connect()
+    repo_backend = settings.repo_backend
+    if connected:
+        # Hydration of ormar models is what is measured
+        settings.repo_backend = 'ormar'
+
+    results = {}
+    try:
+        for benchmark in suite:
+            if benchmark.needs_db and not connected:
+                continue
+            results[benchmark.name] = await benchmark.run(scale)
+            logger.info("%-38s %14.3f us", benchmark.name,
+                        results[benchmark.name]['median_us'])
+    finally:
+        settings.repo_backend = repo_backend
+        if connected:
+            await database.disconnect()
+    return results
+
+
+def compare(before: dict, after: dict, threshold: float) -> List[str]:
+    """Logs change of every benchmark, returns regressed ones"""
+    regressed = []
+    for name, result in after.items():
+        old = before.get(name)
+        if old is None:
+            continue
+        change = (result['median_us'] - old['median_us']) \
+            / old['median_us'] * 100
+        mark = ''
+        if change > threshold:
+            regressed.append(name)
+            mark = '  REGRESSION'
+        logger.info("%-38s %12.3f -> %12.3f us %+7.1f%%%s", name,
+                    old['median_us'], result['median_us'], change, mark)
+    return regressed
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--filter', help='run benchmarks containing text')
+    parser.add_argument('--output', help='write JSON results to this file')
+    parser.add_argument('--compare', help='JSON results of an earlier run')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='slowdown in percent counted as regression')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    results = asyncio.run(run_suite(args.filter))
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'started_at': datetime.datetime.now(
+                datetime.timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'bcrypt_rounds': PWD_CONTEXT.handler('bcrypt').default_rounds,
+        },
+        'benchmarks': results,
+    }
+
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(report, output, indent=2, sort_keys=True)
+            output.write('\n')
+
+    if args.compare:
+        with open(args.compare) as before:
+            regressed = compare(json.load(before)['benchmarks'], results,
+                                args.threshold)
+        if regressed:
+            print(f"{len(regressed)} benchmarks slower by more than "
+                  f"{args.threshold}%")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -1,11 +1,124 @@
-from app.db import TodoUser, TodoTask
+from contextlib import contextmanager
+from unittest.mock import MagicMock, patch
+
+from app.db import TodoUser, TodoTask, database
+from app.metrics import instrument_queries
+from app.querylog import track_queries
 
 
 async def value_to_await(value):
     return value
 
 
+class FakeRawConnection():
+    async def fetchrow(self, query, *args):
+        return {'args': args}
+
+    def copy_records_to_table(self, table, **kwargs):
+        return table
+
+
+class FakeBackendConnection():
+    """databases backend connection answering 1, or raising on 'broken'"""
+    raw_connection = FakeRawConnection()
+
+    async def fetch_val(self, query, column=0):
+        if query == 'broken':
+            raise ValueError(query)
+        return 1
+
+
+class ScriptedBackendConnection():
+    """databases backend connection answering queries with `results` in
+    order, the list is shared by all connections made in a test
+    """
+
+    def __init__(self, results):
+        self.results = results
+
+    async def acquire(self):
+        pass
+
+    async def release(self):
+        pass
+
+    async def fetch_all(self, query):
+        return self.results.pop(0)
+
+    async def fetch_one(self, query):
+        return self.results.pop(0)
+
+    async def fetch_val(self, query, column=0):
+        return self.results.pop(0)
+
+    async def execute(self, query):
+        return self.results.pop(0)
+
+
+class TaskRow(dict):
+    """Row of a task joined with its user the way ormar selects it,
+    user columns are prefixed with a generated table alias
+    """
+
+    def __init__(self, task):
+        super().__init__(id=task.id, title=task.title,
+                         description=task.description, status=task.status,
+                         user=task.user.id, version=task.version)
+        self.user = task.user
+
+    def __missing__(self, key):
+        _, column = key.split('_', 1)
+        return getattr(self.user, column)
+
+
+@contextmanager
+def database_results(*results):
+    """Global database answers queries inside the block with `results`,
+    enter it before `assert_max_queries` so the queries are counted
+    """
+    results = list(results)
+    with patch.object(type(database._backend), 'connection',
+                      lambda backend: ScriptedBackendConnection(results)):
+        yield
+
+
+def fake_database(name):
+    """Database with fake connections instrumented under `name`, every
+    test file should use its own name to keep metric series apart
+    """
+    database = MagicMock()
+    database._backend._metrics_name = None
+    database._backend.connection = FakeBackendConnection
+    instrument_queries(database, name)
+    return database
+
+
+@contextmanager
+def assert_max_queries(test_case, limit):
+    """Fails the test if code inside the block ran over `limit` queries.
+
+    The global database is instrumented only for the block, so metrics
+    of other tests are left alone.
+    """
+    backend = database._backend
+    instrumented = getattr(backend, '_metrics_name', None) is not None
+    instrument_queries(database, 'primary')
+    try:
+        with track_queries(record_statements=True) as log:
+            yield log
+    finally:
+        if not instrumented:
+            del backend.connection, backend._metrics_name
+
+    test_case.assertLessEqual(
+        log.count, limit,
+        f'{log.count} queries ran, at most {limit} expected: '
+        f'{dict(log.statements)}'
+    )
+
+
 test_user_1 = TodoUser(
+    id=1,
     username='Foo',
     password='BarBar',
     first_name='Buz'
@@ -19,17 +132,20 @@ test_user_2_same_username = TodoUser(
 
 
 test_user_3_different_username = TodoUser(
+    id=3,
     username='Buz',
     password='BuzBuz',
     first_name='Bar'
 )
 
 test_task_1 = TodoTask(
+    id=1,
     title="Foo",
     user=test_user_1
 )
 
 test_task_2_with_same_user = TodoTask(
+    id=2,
     title="Bar",
     user=test_user_1
 )
@@ -0,0 +1,298 @@
+"""End-to-end load test of the API with concurrent virtual users.
+
+Usage: python -m tests.loadtest [--base-url URL] [--users N]
+                                [--duration SECONDS] [--mix OPS]
+                                [--output FILE] [--compare FILE]
+
+Every virtual user signs up, logs in and then runs a weighted mix of
+create, list, get, update and delete requests on its own tasks until
+the duration is over. Latency percentiles and throughput of every
+operation are printed and can be written as JSON, `--compare` prints
+the difference with a report of an earlier run.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import subprocess
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import httpx
+
+DEFAULT_BASE_URL = 'http://localhost:8080/api/v1'
+DEFAULT_MIX = 'create=2,list=3,get=4,update=2,delete=1'
+PERCENTILES = (50, 95, 99)
+SEED_TASKS = 5
+
+
+def percentile(values: List[float], percent: float) -> float:
+    """Linearly interpolated percentile of sorted values"""
+    if not values:
+        return 0.0
+    position = (len(values) - 1) * percent / 100
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+def parse_mix(mix: str) -> Dict[str, int]:
+    """`create=2,get=4` into operation weights"""
+    weights = {}
+    for part in mix.split(','):
+        name, _, weight = part.partition('=')
+        if name.strip() not in VirtualUser.OPERATIONS:
+            raise ValueError(f"Unknown operation '{name.strip()}'")
+        weights[name.strip()] = int(weight or 1)
+    return weights
+
+
+class Recorder():
+    """Latencies and failures of requests grouped by operation"""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def record(self, operation: str, seconds: float, ok: bool) -> None:
+        self.latencies[operation].append(seconds * 1000)
+        if not ok:
+            self.errors[operation] += 1
+
+    def report(self, duration: float) -> dict:
+        operations = {}
+        for operation, latencies in sorted(self.latencies.items()):
+            latencies = sorted(latencies)
+            stats = {
+                'requests': len(latencies),
+                'errors': self.errors[operation],
+                'rps': round(len(latencies) / duration, 2),
+                'mean_ms': round(sum(latencies) / len(latencies), 2),
+                'max_ms': round(latencies[-1], 2),
+            }
+            for percent in PERCENTILES:
+                stats[f'p{percent}_ms'] = round(
+                    percentile(latencies, percent), 2)
+            operations[operation] = stats
+
+        total = sum(stats['requests'] for stats in operations.values())
+        return {
+            'duration_s': round(duration, 2),
+            'requests': total,
+            'errors': sum(self.errors.values()),
+            'rps': round(total / duration, 2) if duration else 0.0,
+            'operations': operations,
+        }
+
+
+class VirtualUser():
+    """Client of a single user running operations on its own tasks"""
+
+    OPERATIONS = ('create', 'list', 'get', 'update', 'delete')
+
+    def __init__(self, client: httpx.AsyncClient, recorder: Recorder):
+        self.client = client
+        self.recorder = recorder
+        self.username = f'load-{uuid.uuid4().hex[:12]}'
+        self.user_id: Optional[int] = None
+        self.task_ids: List[int] = []
+
+    async def request(self, operation: str, method: str, url: str,
+                      **kwargs) -> Optional[httpx.Response]:
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            self.recorder.record(operation, time.perf_counter() - started,
+                                 ok=False)
+            return None
+
+        self.recorder.record(operation, time.perf_counter() - started,
+                             ok=response.status_code < 400)
+        return response
+
+    async def start(self) -> bool:
+        """Signs up, logs in and seeds tasks, False if anything failed"""
+        password = uuid.uuid4().hex
+        response = await self.request('signup', 'POST', '/signup', json={
+            'username': self.username,
+            'first_name': 'Load',
+            'password': password,
+        })
+        if response is None or response.status_code != 200:
+            return False
+
+        response = await self.request('login', 'POST', '/login', data={
+            'username': self.username,
+            'password': password,
+        })
+        if response is None or response.status_code != 200:
+            return False
+        self.client.headers['Authorization'] = \
+            f"Bearer {response.json()['access_token']}"
+
+        response = await self.client.post('/tasks/bulk', json=[
+            {'title': f'Seed task {number}'} for number in range(SEED_TASKS)
+        ])
+        if response.status_code != 200:
+            return False
+        self.task_ids = [item['id'] for item in response.json()]
+
+        response = await self.client.get(f'/tasks/{self.task_ids[0]}')
+        if response.status_code != 200:
+            return False
+        self.user_id = response.json()['user']['id']
+        return True
+
+    async def create_task(self) -> None:
+        await self.request('create', 'POST', '/tasks', json={
+            'title': f'Task {uuid.uuid4().hex[:8]}',
+            'description': 'Created by load test',
+        })
+
+    async def list_tasks(self) -> None:
+        response = await self.request(
+            'list', 'GET', '/tasks',
+            params={'user_id': self.user_id, 'page_size': 20})
+        if response is not None and response.status_code == 200:
+            self.task_ids = [task['id'] for task in response.json()['items']]
+
+    async def get_task(self) -> None:
+        await self.request('get', 'GET', f'/tasks/{self.pick_task()}')
+
+    async def update_task(self) -> None:
+        await self.request('update', 'PATCH', f'/tasks/{self.pick_task()}',
+                           json={'status': random.choice(
+                               ['New', 'In Progress', 'Completed'])})
+
+    async def delete_task(self) -> None:
+        task_id = self.pick_task()
+        response = await self.request('delete', 'DELETE',
+                                      f'/tasks/{task_id}')
+        if response is not None and response.status_code == 200:
+            self.task_ids.remove(task_id)
+
+    def pick_task(self) -> int:
+        return random.choice(self.task_ids)
+
+    async def run(self, weights: Dict[str, int], deadline: float) -> None:
+        if not await self.start():
+            return
+
+        actions = {
+            'create': self.create_task,
+            'list': self.list_tasks,
+            'get': self.get_task,
+            'update': self.update_task,
+            'delete': self.delete_task,
+        }
+        operations = list(weights)
+        while time.monotonic() < deadline:
+            operation = random.choices(operations,
+                                       weights=list(weights.values()))[0]
+            if operation in ('get', 'update', 'delete') and not self.task_ids:
+                await self.create_task()
+                operation = 'list'
+            await actions[operation]()
+
+
+async def run_load(base_url: str, users: int, duration: float,
+                   weights: Dict[str, int],
+                   transport: Optional[httpx.AsyncBaseTransport] = None
+                   ) -> dict:
+    """Runs virtual users concurrently and returns the report"""
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=users)
+    clients = [httpx.AsyncClient(base_url=base_url, limits=limits,
+                                 transport=transport, timeout=30.0)
+               for _ in range(users)]
+
+    started = time.monotonic()
+    try:
+        await asyncio.gather(*(
+            VirtualUser(client, recorder).run(weights, started + duration)
+            for client in clients
+        ))
+    finally:
+        await asyncio.gather(*(client.aclose() for client in clients))
+
+    return recorder.report(time.monotonic() - started)
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'],
+                              capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def format_report(report: dict) -> str:
+    columns = ['requests', 'errors', 'rps'] + \
+        [f'p{percent}_ms' for percent in PERCENTILES]
+    lines = [f"{'operation':10}" + ''.join(f'{c:>10}' for c in columns)]
+    for operation, stats in report['operations'].items():
+        lines.append(f'{operation:10}' + ''.join(
+            f'{stats[column]:>10}' for column in columns))
+    lines.append(f"total {report['requests']} requests, "
+                 f"{report['errors']} errors, {report['rps']} rps "
+                 f"in {report['duration_s']} s")
+    return '\n'.join(lines)
+
+
+def format_comparison(before: dict, after: dict) -> str:
+    """Change of throughput and percentiles of every operation"""
+    columns = ['rps'] + [f'p{percent}_ms' for percent in PERCENTILES]
+    lines = [f"{'operation':10}" + ''.join(f'{c:>16}' for c in columns)]
+    for operation, stats in after['operations'].items():
+        old = before['operations'].get(operation)
+        if old is None:
+            continue
+        cells = []
+        for column in columns:
+            change = (stats[column] - old[column]) / old[column] * 100 \
+                if old[column] else 0.0
+            cells.append(f'{stats[column]:>8} {change:+6.1f}%')
+        lines.append(f'{operation:10}' + ''.join(f'{c:>16}' for c in cells))
+    return '\n'.join(lines)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--base-url', default=DEFAULT_BASE_URL)
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--duration', type=float, default=30.0)
+    parser.add_argument('--mix', default=DEFAULT_MIX)
+    parser.add_argument('--output', help='write JSON report to this file')
+    parser.add_argument('--compare', help='JSON report of an earlier run')
+    args = parser.parse_args()
+
+    report = asyncio.run(run_load(args.base_url, args.users, args.duration,
+                                  parse_mix(args.mix)))
+    report['meta'] = {
+        'commit': git_commit(),
+        'started_at': datetime.now(timezone.utc).isoformat(),
+        'base_url': args.base_url,
+        'users': args.users,
+        'mix': args.mix,
+    }
+
+    print(format_report(report))
+    if args.compare:
+        with open(args.compare) as before:
+            print(format_comparison(json.load(before), report))
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(report, output, indent=2, sort_keys=True)
+            output.write('\n')
+
+    return 1 if report['errors'] else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
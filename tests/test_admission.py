@@ -0,0 +1,115 @@
+import unittest
+import asyncio
+
+from fastapi import APIRouter, Depends, FastAPI, HTTPException
+from fastapi.testclient import TestClient
+
+from app.admission import AdmissionController
+
+
+class AdmissionControllerTests(unittest.TestCase):
+    def test_queue_and_rejections(self):
+        async def async_test():
+            controller = AdmissionController('test', limit=1, max_queue=1,
+                                             queue_timeout=5)
+            await controller.acquire()
+
+            queued = asyncio.create_task(controller.acquire())
+            await asyncio.sleep(0)
+            self.assertEqual(controller.queued, 1)
+
+            with self.assertRaises(HTTPException) as rejected:
+                await controller.acquire()
+            self.assertEqual(rejected.exception.status_code, 429)
+            self.assertEqual(rejected.exception.headers['Retry-After'], '5')
+
+            controller.release()
+            await queued
+            self.assertEqual(controller.active, 1,
+                             'Slot should be handed over to queued request')
+            self.assertEqual(controller.queued, 0)
+
+            controller.release()
+            self.assertEqual(controller.stats(), {
+                'limit': 1, 'max_queue': 1, 'active': 0, 'queued': 0,
+                'admitted': 2, 'rejected_queue_full': 1,
+                'rejected_timeout': 0,
+            })
+
+        asyncio.run(async_test())
+
+    def test_queue_timeout(self):
+        async def async_test():
+            controller = AdmissionController('test', limit=1, max_queue=4,
+                                             queue_timeout=0.01)
+            await controller.acquire()
+
+            with self.assertRaises(HTTPException) as rejected:
+                await controller.acquire()
+            self.assertEqual(rejected.exception.status_code, 503)
+            self.assertEqual(rejected.exception.headers['Retry-After'], '1')
+            self.assertEqual(controller.queued, 0)
+            self.assertEqual(controller.rejected_timeout, 1)
+
+            controller.release()
+            self.assertEqual(controller.active, 0)
+
+        asyncio.run(async_test())
+
+    def test_cancelled_waiter_does_not_take_slot(self):
+        async def async_test():
+            controller = AdmissionController('test', limit=1, max_queue=4,
+                                             queue_timeout=5)
+            await controller.acquire()
+            waiting = asyncio.create_task(controller.acquire())
+            await asyncio.sleep(0)
+            waiting.cancel()
+            await asyncio.sleep(0)
+
+            controller.release()
+            self.assertEqual(controller.active, 0)
+            self.assertEqual(controller.queued, 0)
+
+        asyncio.run(async_test())
+
+
+class AdmissionDependencyTests(unittest.TestCase):
+    def setUp(self):
+        self.limited = AdmissionController('limited', limit=1, max_queue=0,
+                                           queue_timeout=1)
+        unlimited = AdmissionController('unlimited', limit=0, max_queue=0,
+                                        queue_timeout=1)
+        limited_router = APIRouter(dependencies=[Depends(self.limited)])
+        unlimited_router = APIRouter(dependencies=[Depends(unlimited)])
+
+        @limited_router.get('/login')
+        async def login():
+            return {'active': self.limited.active}
+
+        @unlimited_router.get('/tasks')
+        async def tasks():
+            return {}
+
+        app = FastAPI()
+        app.include_router(limited_router)
+        app.include_router(unlimited_router)
+        self.client = TestClient(app)
+
+    def test_slot_is_held_while_request_runs(self):
+        response = self.client.get('/login')
+
+        self.assertEqual(response.json(), {'active': 1})
+        self.assertEqual(self.limited.active, 0)
+
+    def test_saturated_router_sheds_load_of_its_routes_only(self):
+        self.limited.active = 1
+
+        response = self.client.get('/login')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.headers['retry-after'], '1')
+
+        self.assertEqual(self.client.get('/tasks').status_code, 200)
+
+
+if __name__ == "__main__":
+    unittest.main()
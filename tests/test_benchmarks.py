@@ -0,0 +1,54 @@
+import unittest
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+from app.config import settings
+from tests.benchmarks import Benchmark, compare, run_suite
+
+
+class BenchmarkTests(unittest.TestCase):
+    def test_run_suite_without_database(self):
+        with self.assertLogs('tests.benchmarks', 'INFO'):
+            results = asyncio.run(run_suite('serialize', scale=0.01,
+                                            use_db=False))
+
+        self.assertEqual(set(results), {
+            'serialize.TaskOut_page_10', 'serialize.TaskOut_page_100',
+            'serialize.fast_json_page_10', 'serialize.fast_json_page_100',
+        })
+        for result in results.values():
+            self.assertGreater(result['median_us'], 0)
+            self.assertLessEqual(result['min_us'], result['median_us'])
+
+    @patch('tests.benchmarks.database')
+    @patch('tests.benchmarks.connect')
+    @patch('tests.benchmarks.build_suite')
+    def test_run_suite_restores_repo_backend(self, mock_build_suite,
+                                             mock_connect, mock_database):
+        backends = []
+        mock_build_suite.return_value = [Benchmark(
+            'db', lambda: backends.append(settings.repo_backend),
+            number=1, repeat=1, needs_db=True)]
+        mock_connect.return_value = True
+        mock_database.disconnect = AsyncMock()
+
+        with patch.object(settings, 'repo_backend', 'asyncpg'):
+            with self.assertLogs('tests.benchmarks', 'INFO'):
+                asyncio.run(run_suite())
+            self.assertEqual(backends, ['ormar'])
+            self.assertEqual(settings.repo_backend, 'asyncpg',
+                             'Repo backend should be restored')
+
+    def test_compare_reports_regressions(self):
+        before = {'fast': {'median_us': 10.0}, 'slow': {'median_us': 10.0},
+                  'removed': {'median_us': 1.0}}
+        after = {'fast': {'median_us': 9.0}, 'slow': {'median_us': 12.0},
+                 'added': {'median_us': 1.0}}
+
+        with self.assertLogs('tests.benchmarks', 'INFO'):
+            self.assertEqual(compare(before, after, threshold=10.0),
+                             ['slow'])
+
+
+if __name__ == "__main__":
+    unittest.main()
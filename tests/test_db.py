@@ -0,0 +1,192 @@
+import os
+import unittest
+import asyncio
+from contextvars import copy_context
+from unittest.mock import MagicMock
+
+import databases
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.db import Database
+from app.middleware import PrimaryStickinessMiddleware
+from app.pool import InstrumentedPool, instrument_pool, pool_stats
+
+
+SERVER_IDENTITY_QUERY = """
+    SELECT inet_server_addr()::text AS addr, inet_server_port() AS port,
+           current_database() AS name
+"""
+
+
+class FakePool():
+    def __init__(self):
+        self.acquired = 0
+
+    async def acquire(self, timeout=None):
+        self.acquired += 1
+        return 'connection'
+
+    async def release(self, connection):
+        self.acquired -= 1
+
+    def get_min_size(self):
+        return 1
+
+    def get_max_size(self):
+        return 4
+
+    def get_size(self):
+        return 3
+
+    def get_idle_size(self):
+        return 3 - self.acquired
+
+
+class PoolTests(unittest.TestCase):
+    def test_instrumented_pool_stats(self):
+        async def async_test():
+            database = MagicMock()
+            database._backend._pool = FakePool()
+            instrument_pool(database)
+            instrument_pool(database)
+            pool = database._backend._pool
+
+            self.assertIsInstance(pool, InstrumentedPool)
+            self.assertIsInstance(
+                pool.pool, FakePool, 'Pool should be wrapped only once')
+
+            connection = await pool.acquire()
+            async with pool.acquire() as other_connection:
+                self.assertEqual(other_connection, 'connection')
+                stats = pool_stats(database)
+                self.assertEqual(stats['in_use'], 2)
+                self.assertEqual(stats['idle'], 1)
+            await pool.release(connection)
+
+            stats = pool_stats(database)
+            self.assertEqual(stats['acquires'], 2)
+            self.assertEqual(stats['in_use'], 0)
+            self.assertEqual(stats['waiting'], 0)
+            self.assertEqual(stats['max_size'], 4)
+
+        asyncio.run(async_test())
+
+    def test_pool_stats_not_connected(self):
+        database = MagicMock()
+        database._backend._pool = None
+
+        self.assertEqual(pool_stats(database), {'connected': False})
+
+
+class ReplicaRoutingTests(unittest.TestCase):
+    def setUp(self):
+        self.database = Database('postgresql://primary/test',
+                                 replica_url='postgresql://replica/test')
+
+    def backend_in_use(self):
+        return self.database.connection()._backend
+
+    def test_queries_go_to_primary_by_default(self):
+        self.assertIs(self.backend_in_use(), self.database._backend)
+        self.assertIs(self.database.reader(), self.database.replica)
+
+    def test_read_replica_routes_to_replica(self):
+        def in_request():
+            with self.database.read_replica():
+                self.assertIs(self.backend_in_use(),
+                              self.database.replica._backend)
+            self.assertIs(self.backend_in_use(), self.database._backend)
+
+        copy_context().run(in_request)
+
+    def test_reads_stick_to_primary_after_write(self):
+        def in_request():
+            self.database.stick_to_primary()
+            with self.database.read_replica():
+                self.assertIs(self.backend_in_use(), self.database._backend)
+            self.assertIs(self.database.reader(), self.database)
+
+        copy_context().run(in_request)
+        self.assertFalse(Database.is_stuck_to_primary(),
+                         'Stickiness should not leak out of the request')
+
+    def test_no_replica_configured(self):
+        database = Database('postgresql://primary/test')
+
+        with database.read_replica():
+            self.assertIs(database.connection()._backend, database._backend)
+
+
+class PrimaryStickinessMiddlewareTests(unittest.TestCase):
+    def setUp(self):
+        app = FastAPI()
+        app.add_middleware(PrimaryStickinessMiddleware, database=Database,
+                           stick_seconds=5)
+
+        @app.post('/write')
+        async def write():
+            Database.stick_to_primary()
+            return {'stuck': Database.is_stuck_to_primary()}
+
+        @app.get('/read')
+        async def read():
+            return {'stuck': Database.is_stuck_to_primary()}
+
+        self.client = TestClient(app)
+
+    def test_write_sets_cookie_and_next_reads_use_primary(self):
+        self.assertFalse(self.client.get('/read').json()['stuck'])
+
+        response = self.client.post('/write')
+        self.assertIn(PrimaryStickinessMiddleware.cookie_name,
+                      response.cookies)
+
+        self.assertTrue(self.client.get('/read').json()['stuck'],
+                        'Reads right after write should use primary')
+
+    def test_header_forces_primary(self):
+        response = self.client.get('/read', headers={'X-Read-Primary': '1'})
+        self.assertTrue(response.json()['stuck'])
+
+
+@unittest.skipUnless(
+    os.environ.get('TEST_DATABASE_URL')
+    and os.environ.get('TEST_REPLICA_DATABASE_URL'),
+    'Set TEST_DATABASE_URL and TEST_REPLICA_DATABASE_URL to two Postgres '
+    'instances to run replica routing against real servers'
+)
+class ReplicaRoutingIntegrationTests(unittest.TestCase):
+    def test_reads_are_served_by_replica_until_write(self):
+        async def async_test():
+            database = Database(
+                os.environ['TEST_DATABASE_URL'],
+                replica_url=os.environ['TEST_REPLICA_DATABASE_URL']
+            )
+            await database.connect()
+            try:
+                primary = dict((await databases.Database.fetch_one(
+                    database, SERVER_IDENTITY_QUERY))._mapping)
+                replica = dict((await database.replica.fetch_one(
+                    SERVER_IDENTITY_QUERY))._mapping)
+                self.assertNotEqual(primary, replica,
+                                    'URLs should point to different servers')
+
+                with database.read_replica():
+                    served_by = await database.fetch_one(
+                        SERVER_IDENTITY_QUERY)
+                self.assertEqual(dict(served_by._mapping), replica)
+
+                database.stick_to_primary()
+                with database.read_replica():
+                    served_by = await database.fetch_one(
+                        SERVER_IDENTITY_QUERY)
+                self.assertEqual(dict(served_by._mapping), primary)
+            finally:
+                await database.disconnect()
+
+        asyncio.run(async_test())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,134 @@
+import unittest
+import asyncio
+import json
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from fastapi.testclient import TestClient
+
+from app.feed import RESYNC, FeedSaturated, Subscription, TaskFeed
+from app.main import app
+from app.routers.feed import TASK_FEED, sse_events
+
+
+def make_feed(**options):
+    options = {'queue_size': 10, 'max_subscribers': 10, **options}
+    return TaskFeed(MagicMock(), 'task_changes', **options)
+
+
+CREATED = {'op': 'created', 'id': 1, 'user_id': 1, 'status': 'New',
+           'version': 1}
+MOVED = {'op': 'updated', 'id': 2, 'user_id': 2, 'status': 'Completed',
+         'old_status': 'New', 'version': 2}
+
+
+@patch.object(TaskFeed, '_listen', AsyncMock())
+class TaskFeedTests(unittest.TestCase):
+    def test_events_fan_out_by_filters(self):
+        async def async_test():
+            feed = make_feed()
+            everything = feed.subscribe()
+            user_2 = feed.subscribe(user_id=2)
+            new_tasks = feed.subscribe(status='New')
+            completed = feed.subscribe(status='Completed')
+
+            feed._on_notification(None, 1, 'task_changes',
+                                  json.dumps(CREATED))
+            feed._on_notification(None, 1, 'task_changes',
+                                  json.dumps(MOVED))
+            feed._on_notification(None, 1, 'task_changes', 'not json')
+            feed.publish({'op': 'resync', 'user_id': 1})
+
+            def events(subscription):
+                return [subscription.queue.get_nowait()
+                        for _ in range(subscription.queue.qsize())]
+
+            self.assertEqual(events(everything),
+                             [CREATED, MOVED, {'op': 'resync', 'user_id': 1}])
+            self.assertEqual(events(user_2), [MOVED])
+            self.assertEqual(events(new_tasks),
+                             [CREATED, MOVED, {'op': 'resync', 'user_id': 1}],
+                             'Task moved out of status should be reported')
+            self.assertEqual(events(completed),
+                             [MOVED, {'op': 'resync', 'user_id': 1}])
+            self.assertEqual(feed.stats()['events'], 3)
+
+            feed.unsubscribe(user_2)
+            self.assertEqual(feed.stats()['subscribers'], 3)
+            await feed.stop()
+
+        asyncio.run(async_test())
+
+    def test_slow_subscriber_gets_resync(self):
+        async def async_test():
+            feed = make_feed(queue_size=2)
+            slow = feed.subscribe()
+            for _ in range(3):
+                feed.publish(CREATED)
+
+            self.assertEqual(slow.queue.qsize(), 1)
+            self.assertEqual(await slow.get(1), RESYNC)
+            self.assertIsNone(await slow.get(0.01))
+
+            feed.publish(MOVED)
+            self.assertEqual(await slow.get(1), MOVED)
+            self.assertEqual(feed.stats()['overflows'], 1)
+            await feed.stop()
+
+        asyncio.run(async_test())
+
+    def test_subscribers_are_limited(self):
+        async def async_test():
+            feed = make_feed(max_subscribers=1)
+            subscription = feed.subscribe()
+            with self.assertRaises(FeedSaturated):
+                feed.subscribe()
+
+            listener = feed._listener
+            feed.unsubscribe(subscription)
+            feed.subscribe()
+            self.assertIs(feed._listener, listener,
+                          'Listener should be shared by subscribers')
+            await feed.stop()
+
+        asyncio.run(async_test())
+
+
+class FeedEndpointTests(unittest.TestCase):
+    def test_sse_events(self):
+        async def async_test():
+            subscription = Subscription(None, None, 10)
+            subscription.push(CREATED)
+            with patch.object(TASK_FEED, 'unsubscribe') as unsubscribe:
+                stream = sse_events(subscription, 0.01)
+                self.assertEqual(await stream.__anext__(),
+                                 f'data: {json.dumps(CREATED)}\n\n')
+                self.assertEqual(await stream.__anext__(), ': ping\n\n')
+                await stream.aclose()
+
+            unsubscribe.assert_called_once_with(subscription)
+
+        asyncio.run(async_test())
+
+    @patch.object(TASK_FEED, 'subscribe', side_effect=FeedSaturated)
+    def test_sse_rejects_when_saturated(self, _):
+        response = TestClient(app).get('/api/v1/tasks/changes',
+                                       params={'status': 'New'})
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.headers['retry-after'], '5')
+
+    def test_websocket(self):
+        subscription = Subscription(1, None, 10)
+        subscription.push(CREATED)
+        with patch.object(TASK_FEED, 'subscribe',
+                          return_value=subscription) as subscribe, \
+                patch.object(TASK_FEED, 'unsubscribe') as unsubscribe:
+            with TestClient(app).websocket_connect(
+                    '/api/v1/tasks/changes/ws?user_id=1') as websocket:
+                self.assertEqual(websocket.receive_json(), CREATED)
+
+            subscribe.assert_called_once_with(1, None)
+            unsubscribe.assert_called_once_with(subscription)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,135 @@
+import unittest
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from app import importer
+from app.importer import load_tasks, parse_csv, parse_ndjson
+from app.repo.tasks import TASK_COPY_COLUMNS, TaskRepo
+from app.routers.tasks import import_tasks
+from app.schemas.task_schemas import ExportFormat
+from tests.common import test_user_1
+
+
+async def byte_chunks(text: str, size: int = 7):
+    data = text.encode()
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+async def collect(rows):
+    return [row async for row in rows]
+
+
+class ImportParserTests(unittest.TestCase):
+    def test_parse_csv_with_quoted_line_breaks(self):
+        text = ('id,title,description,status\r\n'
+                '1,Foo,"multi\nline, ""quoted""",New\r\n'
+                '\r\n'
+                '2,Bar\r\n'
+                '3,Buz,,Completed')
+
+        rows = asyncio.run(collect(parse_csv(byte_chunks(text))))
+
+        self.assertEqual(rows, [
+            (2, {'id': '1', 'title': 'Foo',
+                 'description': 'multi\nline, "quoted"', 'status': 'New'}),
+            (5, 'Expected 4 values, got 2'),
+            (6, {'id': '3', 'title': 'Buz', 'description': '',
+                 'status': 'Completed'}),
+        ])
+
+    def test_parse_ndjson_reports_invalid_lines(self):
+        text = '{"title": "Foo"}\n\nnot json\n[1]\n{"title": "Bar"}'
+
+        rows = asyncio.run(collect(parse_ndjson(byte_chunks(text))))
+
+        self.assertEqual([line for line, _ in rows], [1, 3, 4, 5])
+        self.assertEqual(rows[0][1], {'title': 'Foo'})
+        self.assertTrue(rows[1][1].startswith('Invalid JSON'))
+        self.assertEqual(rows[2][1], 'Expected a JSON object')
+
+    @patch.object(importer, 'IMPORT_MAX_LINE_BYTES', 16)
+    def test_overlong_lines_are_skipped(self):
+        text = '{"title": "Foo"}\n' + '{"title": "' + 'x' * 100 + '"}\n' \
+            + '{"title": "B"}'
+
+        rows = asyncio.run(collect(parse_ndjson(byte_chunks(text, size=8))))
+
+        self.assertEqual(rows[0], (1, {'title': 'Foo'}))
+        self.assertEqual(rows[1][0], 2)
+        self.assertTrue(rows[1][1].startswith('Line longer than'))
+        self.assertEqual(rows[2], (3, {'title': 'B'}))
+
+
+class LoadTasksTests(unittest.TestCase):
+    @patch('app.importer.TaskRepo')
+    def test_valid_rows_are_copied_in_batches(self, mock_repo):
+        async def async_test():
+            mock_repo.copy_tasks = AsyncMock(
+                side_effect=lambda records: len(records))
+            text = '\n'.join([
+                '{"title": "One", "status": "Completed"}',
+                '{"title": "Two", "description": "Second"}',
+                '{"status": "New"}',
+                '{"title": "Three", "status": "Unknown"}',
+                '{"title": "Four", "user": {"id": 9}}',
+            ])
+
+            result = await load_tasks(byte_chunks(text), ExportFormat.NDJSON,
+                                      user_id=7, batch_rows=2)
+
+            self.assertEqual(result['imported'], 3)
+            self.assertEqual(result['failed'], 2)
+            self.assertEqual([error['line'] for error in result['errors']],
+                             [3, 4])
+            self.assertIn('title: field required',
+                          result['errors'][0]['error'])
+            self.assertEqual(
+                [c.args[0] for c in mock_repo.copy_tasks.await_args_list],
+                [
+                    [('One', None, 'Completed', 7),
+                     ('Two', 'Second', 'New', 7)],
+                    [('Four', None, 'New', 7)],
+                ],
+                'Missing status should default to New and user be ignored'
+            )
+
+        asyncio.run(async_test())
+
+    @patch('app.routers.tasks.load_tasks')
+    def test_import_endpoint_streams_body(self, mock_load_tasks):
+        async def async_test():
+            request = MagicMock()
+            result = {'imported': 1, 'failed': 0, 'errors': []}
+            mock_load_tasks.return_value = result
+
+            response = await import_tasks(request, ExportFormat.CSV,
+                                          current_user=test_user_1)
+
+            self.assertEqual(response, result)
+            mock_load_tasks.assert_called_once_with(
+                request.stream.return_value, ExportFormat.CSV, test_user_1.id)
+
+        asyncio.run(async_test())
+
+    @patch('app.repo.tasks.database')
+    def test_copy_tasks_uses_copy(self, mock_database):
+        async def async_test():
+            raw = MagicMock()
+            raw.copy_records_to_table = AsyncMock(return_value='COPY 2')
+            connection = mock_database.connection.return_value
+            connection.__aenter__ = AsyncMock(
+                return_value=MagicMock(raw_connection=raw))
+            connection.__aexit__ = AsyncMock(return_value=None)
+            records = [('One', None, 'New', 7), ('Two', None, 'New', 7)]
+
+            self.assertEqual(await TaskRepo.copy_tasks(records), 2)
+            raw.copy_records_to_table.assert_awaited_once_with(
+                'tasks', records=records, columns=TASK_COPY_COLUMNS)
+            mock_database.stick_to_primary.assert_called_once()
+
+        asyncio.run(async_test())
+
+
+if __name__ == "__main__":
+    unittest.main()
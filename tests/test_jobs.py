@@ -0,0 +1,208 @@
+import unittest
+import asyncio
+from datetime import datetime, timezone
+from unittest.mock import AsyncMock, call, patch
+
+from fastapi import HTTPException
+
+from app.jobs import JobRunner, delete_account, run_job, set_task_status
+from app.repo.tasks import TaskRepo
+from app.routers.jobs import get_job, set_task_status as set_status_route
+from app.schemas.job_schemas import (
+    JobKind,
+    JobStatus,
+    TaskStatusJobInput
+)
+from app.schemas.task_schemas import TaskStatus
+from tests.common import (
+    value_to_await,
+    test_user_1,
+    test_user_3_different_username
+)
+
+
+def make_job(**values):
+    job = {
+        'id': 5, 'kind': JobKind.SetTaskStatus.value, 'user_id': 1,
+        'params': {}, 'status': JobStatus.Running.value, 'total': None,
+        'done': 0, 'attempts': 1, 'error': None,
+        'created_at': datetime(2026, 10, 18, tzinfo=timezone.utc),
+        'started_at': None, 'heartbeat_at': None, 'finished_at': None,
+    }
+    job.update(values)
+    return job
+
+
+class JobEndpointTests(unittest.TestCase):
+    @patch('app.routers.jobs.JOB_RUNNER')
+    @patch('app.routers.jobs.JobRepo')
+    def test_enqueue_task_status_job(self, mock_repo, mock_runner):
+        async def async_test():
+            job = make_job(status=JobStatus.Queued.value)
+            mock_repo.enqueue_job.return_value = value_to_await(job)
+
+            response = await set_status_route(
+                TaskStatusJobInput(status='Completed', from_status='New'),
+                current_user=test_user_1)
+
+            self.assertEqual(response, job)
+            mock_repo.enqueue_job.assert_called_once_with(
+                JobKind.SetTaskStatus, test_user_1.id,
+                {'status': TaskStatus.Completed,
+                 'from_status': TaskStatus.New})
+            mock_runner.notify.assert_called_once()
+
+        asyncio.run(async_test())
+
+    @patch('app.routers.jobs.JobRepo')
+    def test_get_job_of_other_user_not_found(self, mock_repo):
+        async def async_test():
+            mock_repo.get_job.return_value = value_to_await(make_job())
+
+            exception = None
+            try:
+                await get_job(5, current_user=test_user_3_different_username)
+            except HTTPException as e:
+                exception = e
+
+            self.assertIsNotNone(exception)
+            self.assertEqual(exception.status_code, 404)
+
+        asyncio.run(async_test())
+
+
+class JobHandlerTests(unittest.TestCase):
+    @patch('app.jobs.settings')
+    @patch('app.jobs.UserRepo')
+    @patch('app.jobs.TaskRepo')
+    @patch('app.jobs.JobRepo')
+    def test_delete_account_in_batches(self, mock_job_repo, mock_task_repo,
+                                       mock_user_repo, mock_settings):
+        async def async_test():
+            mock_settings.job_batch_size = 2
+            mock_job_repo.update_progress = AsyncMock()
+            mock_job_repo.finish_job = AsyncMock()
+            mock_task_repo.get_list_stats = AsyncMock(return_value=(4, 3))
+            mock_task_repo.delete_user_tasks_batch = AsyncMock(
+                side_effect=[2, 1])
+            mock_user_repo.delete_user = AsyncMock(return_value='Foo')
+
+            await run_job(make_job(kind=JobKind.DeleteAccount.value))
+
+            mock_task_repo.delete_user_tasks_batch.assert_has_awaits(
+                [call(1, 2), call(1, 2)])
+            mock_user_repo.delete_user.assert_awaited_once_with(1)
+            self.assertEqual(
+                mock_job_repo.update_progress.await_args_list,
+                [call(5, total=3), call(5, done=2), call(5, done=3)],
+                'Progress should be stored after every batch'
+            )
+            mock_job_repo.finish_job.assert_awaited_once_with(
+                5, JobStatus.Completed)
+
+        asyncio.run(async_test())
+
+    @patch('app.jobs.settings')
+    @patch('app.jobs.TaskRepo')
+    @patch('app.jobs.JobRepo')
+    def test_set_task_status_total_and_failure(self, mock_job_repo,
+                                               mock_task_repo, mock_settings):
+        async def async_test():
+            mock_settings.job_batch_size = 10
+            mock_job_repo.update_progress = AsyncMock()
+            mock_job_repo.finish_job = AsyncMock()
+            mock_task_repo.get_list_stats = AsyncMock(
+                side_effect=[(1, 7), (1, 2)])
+            mock_task_repo.set_user_tasks_status_batch = AsyncMock(
+                side_effect=RuntimeError('connection lost'))
+
+            with self.assertLogs('app.jobs', 'ERROR') as logs:
+                await run_job(make_job(params={'status': 'Completed'}))
+
+            self.assertEqual(len(logs.output), 1)
+            self.assertIn(f'Job 5 ({JobKind.SetTaskStatus.value}) failed',
+                          logs.output[0])
+            self.assertIsInstance(logs.records[0].exc_info[1], RuntimeError,
+                                  'Traceback of the failure should be logged')
+            mock_job_repo.update_progress.assert_awaited_once_with(
+                5, total=5)
+            batch = mock_task_repo.set_user_tasks_status_batch
+            batch.assert_awaited_once_with(1, TaskStatus.Completed, None, 10)
+            mock_job_repo.finish_job.assert_awaited_once_with(
+                5, JobStatus.Failed, 'connection lost')
+
+        asyncio.run(async_test())
+
+    @patch('app.jobs.JobRepo')
+    def test_unknown_job_kind_fails(self, mock_repo):
+        async def async_test():
+            mock_repo.finish_job = AsyncMock()
+
+            await run_job(make_job(kind='unknown'))
+
+            mock_repo.finish_job.assert_awaited_once_with(
+                5, JobStatus.Failed, "Unknown job kind 'unknown'")
+
+        asyncio.run(async_test())
+
+    def test_handlers_are_registered(self):
+        from app.jobs import JOB_HANDLERS
+
+        self.assertIs(JOB_HANDLERS['delete_account'], delete_account)
+        self.assertIs(JOB_HANDLERS['set_task_status'], set_task_status)
+
+
+class JobRunnerTests(unittest.TestCase):
+    @patch('app.jobs.run_job')
+    @patch('app.jobs.JobRepo')
+    def test_workers_run_claimed_jobs_until_queue_is_empty(self, mock_repo,
+                                                          mock_run_job):
+        async def async_test():
+            jobs = [make_job(id=1), make_job(id=2)]
+            claimed = asyncio.Event()
+
+            async def claim_job(stale_seconds):
+                if jobs:
+                    return jobs.pop(0)
+                claimed.set()
+                return None
+
+            mock_repo.claim_job = claim_job
+            mock_run_job.side_effect = AsyncMock()
+            runner = JobRunner(workers=1, poll_interval=10,
+                               stale_seconds=60)
+            runner.start()
+            await asyncio.wait_for(claimed.wait(), 1)
+            await runner.stop()
+
+            self.assertEqual(
+                [c.args[0]['id'] for c in mock_run_job.await_args_list],
+                [1, 2])
+
+        asyncio.run(async_test())
+
+
+class JobRepoTests(unittest.TestCase):
+    @patch('app.repo.tasks.database')
+    def test_task_batches_are_single_bounded_statements(self, mock_database):
+        async def async_test():
+            mock_database.fetch_val = AsyncMock(return_value=0)
+
+            await TaskRepo.delete_user_tasks_batch(1, 500)
+            await TaskRepo.set_user_tasks_status_batch(
+                1, TaskStatus.Completed, TaskStatus.New, 500)
+
+            delete_sql, update_sql = (
+                str(c.args[0])
+                for c in mock_database.fetch_val.await_args_list)
+            self.assertIn('DELETE FROM tasks WHERE tasks.id IN', delete_sql)
+            self.assertIn('UPDATE tasks SET status', update_sql)
+            self.assertIn('IS DISTINCT FROM', update_sql)
+            for sql in (delete_sql, update_sql):
+                self.assertIn('ORDER BY tasks.id\n LIMIT :param_', sql)
+
+        asyncio.run(async_test())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+import unittest
+import asyncio
+import json
+import re
+
+import httpx
+
+from tests.loadtest import (
+    format_comparison,
+    parse_mix,
+    percentile,
+    run_load
+)
+
+
+class FakeApi():
+    """In-memory stand-in of the API endpoints used by load test"""
+
+    def __init__(self):
+        self.tasks = {}
+        self.tokens = {}
+        self.next_id = 1
+
+    def add_task(self, owner: str, title: str) -> int:
+        task_id, self.next_id = self.next_id, self.next_id + 1
+        self.tasks[task_id] = {'id': task_id, 'title': title,
+                               'status': 'New', 'owner': owner}
+        return task_id
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        path = request.url.path.removeprefix('/api/v1')
+        if path == '/signup':
+            return httpx.Response(200, json={'message': 'ok'})
+        if path == '/login':
+            token = f'token-{len(self.tokens)}'
+            self.tokens[token] = token
+            return httpx.Response(200, json={'access_token': token})
+
+        owner = request.headers['Authorization']
+        if path == '/tasks/bulk':
+            return httpx.Response(200, json=[
+                {'id': self.add_task(owner, task['title']),
+                 'status': 'created'}
+                for task in json.loads(request.content)
+            ])
+        if path == '/tasks' and request.method == 'POST':
+            self.add_task(owner, json.loads(request.content)['title'])
+            return httpx.Response(200, json={'message': 'created'})
+        if path == '/tasks':
+            items = [task for task in self.tasks.values()
+                     if task['owner'] == owner][:20]
+            return httpx.Response(200, json={'items': [
+                dict(task, user={'id': 1}) for task in items]})
+
+        task = self.tasks.get(int(re.match(r'/tasks/(\d+)', path)[1]))
+        if task is None or task['owner'] != owner:
+            return httpx.Response(404, json={'detail': 'Task not found'})
+        if request.method == 'DELETE':
+            del self.tasks[task['id']]
+        return httpx.Response(200, json=dict(task, user={'id': 1}))
+
+
+class LoadTestTests(unittest.TestCase):
+    def test_percentile(self):
+        values = [float(value) for value in range(1, 101)]
+
+        self.assertEqual(percentile(values, 50), 50.5)
+        self.assertAlmostEqual(percentile(values, 99), 99.01)
+        self.assertEqual(percentile([], 95), 0.0)
+
+    def test_parse_mix_rejects_unknown_operation(self):
+        self.assertEqual(parse_mix('get=3,delete'), {'get': 3, 'delete': 1})
+
+        with self.assertRaises(ValueError):
+            parse_mix('get=3,explode=1')
+
+    def test_run_load_reports_every_operation(self):
+        api = FakeApi()
+        report = asyncio.run(run_load(
+            'http://test/api/v1', users=3, duration=0.2,
+            weights=parse_mix('create=1,list=1,get=1,update=1,delete=1'),
+            transport=httpx.MockTransport(api.handle)
+        ))
+
+        self.assertEqual(report['errors'], 0, 'Users touch only own tasks')
+        self.assertEqual(
+            set(report['operations']),
+            {'signup', 'login', 'create', 'list', 'get', 'update', 'delete'}
+        )
+        for stats in report['operations'].values():
+            self.assertLessEqual(stats['p50_ms'], stats['p95_ms'])
+            self.assertLessEqual(stats['p95_ms'], stats['p99_ms'])
+
+        self.assertIn('+0.0%', format_comparison(report, report))
+
+
+if __name__ == "__main__":
+    unittest.main()
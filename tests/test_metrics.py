@@ -0,0 +1,131 @@
+import unittest
+import asyncio
+from unittest.mock import patch
+
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.metrics import HTTP_REQUEST_DURATION, HTTP_REQUESTS, \
+    HTTP_REQUESTS_IN_PROGRESS, DB_QUERY_DURATION, DB_QUERY_ERRORS, \
+    Histogram, instrument_queries
+from app.middleware import MetricsMiddleware
+from app.querylog import track_queries
+from tests.common import fake_database
+
+
+class MetricsTests(unittest.TestCase):
+    def test_histogram_renders_cumulative_buckets(self):
+        histogram = Histogram('latency_seconds', 'Latency', ('path',),
+                              buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 3.0):
+            histogram.observe(value, ('/a',))
+
+        self.assertEqual(histogram.render(), [
+            '# HELP latency_seconds Latency',
+            '# TYPE latency_seconds histogram',
+            'latency_seconds_bucket{path="/a",le="0.1"} 2',
+            'latency_seconds_bucket{path="/a",le="1.0"} 3',
+            'latency_seconds_bucket{path="/a",le="+Inf"} 4',
+            'latency_seconds_sum{path="/a"} 3.65',
+            'latency_seconds_count{path="/a"} 4',
+        ])
+
+    def test_middleware_labels_requests_by_route_template(self):
+        test_app = FastAPI()
+        test_app.add_middleware(MetricsMiddleware)
+
+        @test_app.get('/items/{item_id}')
+        async def get_item(item_id: int):
+            if item_id == 0:
+                raise HTTPException(status_code=404)
+            return {'id': item_id}
+
+        client = TestClient(test_app)
+        template = ('GET', '/items/{item_id}')
+        requests_before = HTTP_REQUESTS.values.get(template + ('200',), 0)
+
+        client.get('/items/1')
+        client.get('/items/2')
+        client.get('/items/0')
+        client.get('/missing')
+
+        self.assertEqual(HTTP_REQUESTS.values[template + ('200',)],
+                         requests_before + 2)
+        self.assertIn(template + ('404',), HTTP_REQUESTS.values)
+        self.assertIn(('GET', MetricsMiddleware.unmatched, '404'),
+                      HTTP_REQUESTS.values)
+        self.assertNotIn(('GET', '/items/1', '200'), HTTP_REQUESTS.values,
+                         'Paths should not be used as labels')
+        self.assertGreaterEqual(
+            sum(HTTP_REQUEST_DURATION.series[template][:-1]), 3,
+            'Latency of every matched request should be observed')
+        self.assertEqual(HTTP_REQUESTS_IN_PROGRESS.values[()], 0)
+
+    def test_instrument_queries_times_backend_calls(self):
+        async def async_test():
+            database = fake_database('test')
+            instrument_queries(database, 'other')
+
+            connection = database._backend.connection()
+            self.assertEqual(await connection.fetch_val('SELECT 1'), 1)
+            with self.assertRaises(ValueError):
+                await connection.fetch_val('broken')
+
+            self.assertEqual(
+                DB_QUERY_DURATION.series[('test', 'fetch_val')][-2:-1], [0],
+                'Queries should fall into finite buckets')
+            self.assertEqual(
+                sum(DB_QUERY_DURATION.series[('test', 'fetch_val')][:-1]), 2)
+            self.assertEqual(DB_QUERY_ERRORS.values[('test', 'fetch_val')], 1)
+            self.assertNotIn(('other', 'fetch_val'), DB_QUERY_DURATION.series,
+                             'Backend should be instrumented only once')
+
+        asyncio.run(async_test())
+
+    def test_instrument_queries_times_raw_statements(self):
+        async def async_test():
+            database = fake_database('fast-test')
+
+            raw = database._backend.connection().raw_connection
+            with track_queries() as log:
+                self.assertEqual(await raw.fetchrow('SELECT $1', 5),
+                                 {'args': (5,)})
+            self.assertEqual(log.count, 1,
+                             'Fast path should count in query log')
+            self.assertEqual(
+                sum(DB_QUERY_DURATION.series[('fast-test',
+                                              'fetchrow')][:-1]), 1)
+            self.assertEqual(raw.copy_records_to_table('tasks'), 'tasks',
+                             'Other calls should reach the connection')
+
+        asyncio.run(async_test())
+
+    def test_metrics_endpoint(self):
+        response = TestClient(app).get('/metrics')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(
+            response.headers['content-type'].startswith(
+                'text/plain; version=0.0.4'))
+        self.assertIn('# TYPE http_request_duration_seconds histogram',
+                      response.text)
+
+
+class InternalStatsTests(unittest.TestCase):
+    @patch('app.routers.internal.settings')
+    def test_internal_stats_served_only_when_enabled(self, mock_settings):
+        client = TestClient(app)
+
+        mock_settings.internal_stats_enabled = False
+        self.assertEqual(client.get('/api/v1/internal/stats').status_code,
+                         404)
+
+        mock_settings.internal_stats_enabled = True
+        response = client.get('/api/v1/internal/stats')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('password_hashing', response.json())
+
+
+if __name__ == "__main__":
+    unittest.main()
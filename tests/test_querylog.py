@@ -0,0 +1,130 @@
+import unittest
+import asyncio
+from unittest.mock import patch
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.db import database
+from app.middleware import QueryLogMiddleware
+from app.querylog import current_query_log, record_query, track_queries
+from tests.common import assert_max_queries, fake_database
+
+
+async def run_queries(database, queries):
+    connection = database._backend.connection()
+    for query in queries:
+        await connection.fetch_val(query)
+
+
+class QueryLogTests(unittest.TestCase):
+    def setUp(self):
+        self.database = fake_database('querylog-test')
+
+    def test_queries_are_attributed_to_current_log(self):
+        async def async_test():
+            await run_queries(self.database, ['SELECT 0'])
+            with track_queries(record_statements=True) as log:
+                self.assertIs(current_query_log(), log)
+                await run_queries(self.database,
+                                  ['SELECT 1', 'SELECT 2', 'SELECT 2'])
+            self.assertIsNone(current_query_log())
+            return log
+
+        log = asyncio.run(async_test())
+
+        self.assertEqual(log.count, 3,
+                         'Queries outside the block should not be counted')
+        self.assertGreater(log.duration, 0)
+        self.assertEqual(log.repeated(2), {'SELECT 2': 2})
+
+    @patch('app.querylog.settings')
+    def test_slow_query_log(self, mock_settings):
+        mock_settings.slow_query_ms = 100
+
+        with self.assertLogs('app.querylog', 'WARNING') as logs:
+            record_query('SELECT pg_sleep(1)', 0.5, 'primary')
+            record_query('SELECT 1', 0.001, 'primary')
+
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn('SELECT pg_sleep(1)', logs.output[0])
+
+    @patch('app.querylog.settings')
+    def test_disabled_slow_query_log(self, mock_settings):
+        mock_settings.slow_query_ms = 0
+
+        with self.assertNoLogs('app.querylog'):
+            record_query('SELECT pg_sleep(1)', 0.5, 'primary')
+
+    def test_assert_max_queries(self):
+        with assert_max_queries(self, 2) as log:
+            asyncio.run(run_queries(self.database, ['SELECT 1', 'SELECT 2']))
+        self.assertEqual(log.count, 2)
+
+        with self.assertRaises(AssertionError) as failure:
+            with assert_max_queries(self, 1):
+                asyncio.run(run_queries(self.database, ['SELECT 1'] * 2))
+        self.assertIn("'SELECT 1': 2", str(failure.exception))
+
+    def test_assert_max_queries_restores_database(self):
+        backend = database._backend
+        instrumented = getattr(backend, '_metrics_name', None)
+        with assert_max_queries(self, 0):
+            self.assertEqual(backend._metrics_name,
+                             instrumented or 'primary')
+        self.assertEqual(getattr(backend, '_metrics_name', None),
+                         instrumented,
+                         'Global database should be left as it was')
+
+
+class QueryLogMiddlewareTests(unittest.TestCase):
+    def setUp(self):
+        database = fake_database('querylog-test')
+        app = FastAPI()
+        app.add_middleware(QueryLogMiddleware)
+
+        @app.get('/queries/{count}')
+        async def make_queries(count: int):
+            await run_queries(database, ['SELECT 1'] * count)
+            return {'count': count}
+
+        self.client = TestClient(app)
+
+    @patch('app.middleware.settings')
+    @patch('app.querylog.settings')
+    def test_debug_headers_and_budget(self, mock_settings,
+                                      mock_middleware_settings):
+        for settings in (mock_settings, mock_middleware_settings):
+            settings.query_debug = True
+            settings.query_budget = 3
+            settings.slow_query_ms = 0
+
+        response = self.client.get('/queries/2')
+        self.assertEqual(response.headers['x-query-count'], '2')
+        self.assertIn('x-query-time-ms', response.headers)
+        self.assertNotIn('x-query-budget-exceeded', response.headers)
+
+        with self.assertLogs('app.querylog', 'WARNING') as logs:
+            response = self.client.get('/queries/4')
+        self.assertEqual(response.headers['x-query-count'], '4')
+        self.assertEqual(response.headers['x-query-budget-exceeded'], '3')
+        self.assertIn('GET /queries/4 ran 4 queries', logs.output[0])
+        self.assertIn('same query 4 times', logs.output[1])
+
+    @patch('app.middleware.settings')
+    @patch('app.querylog.settings')
+    def test_no_headers_without_debug(self, mock_settings,
+                                      mock_middleware_settings):
+        for settings in (mock_settings, mock_middleware_settings):
+            settings.query_debug = False
+            settings.query_budget = 3
+            settings.slow_query_ms = 0
+
+        response = self.client.get('/queries/1')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('x-query-count', response.headers)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+import unittest
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from app.main import app, startup
+from app.startup import check_schema
+
+
+class StartupTests(unittest.TestCase):
+    @patch('app.main.check_schema')
+    @patch('app.main.database')
+    @patch('app.main.settings')
+    def test_fast_start_skips_schema_check(self, mock_settings, mock_database,
+                                           mock_check_schema):
+        async def async_test():
+            mock_settings.fast_start = True
+            mock_settings.job_workers = 0
+            mock_database.is_connected = False
+            mock_database.replica = None
+            mock_database.connect = AsyncMock()
+
+            await startup()
+
+            mock_database.connect.assert_awaited_once()
+            mock_check_schema.assert_not_called()
+            self.assertEqual(
+                list(app.state.startup_timings),
+                ['import', 'connect'],
+                'Every executed phase should be timed'
+            )
+
+        asyncio.run(async_test())
+
+    @patch('app.main.check_schema')
+    @patch('app.main.database')
+    @patch('app.main.settings')
+    def test_regular_start_checks_schema(self, mock_settings, mock_database,
+                                         mock_check_schema):
+        async def async_test():
+            mock_settings.fast_start = False
+            mock_settings.job_workers = 0
+            mock_database.is_connected = True
+            mock_database.replica = None
+
+            await startup()
+
+            mock_check_schema.assert_awaited_once_with(mock_database)
+            self.assertIn('check_schema', app.state.startup_timings)
+
+        asyncio.run(async_test())
+
+    @patch('app.main.JOB_RUNNER')
+    @patch('app.main.check_schema')
+    @patch('app.main.database')
+    @patch('app.main.settings')
+    def test_job_workers_started(self, mock_settings, mock_database,
+                                 mock_check_schema,
+                                 mock_job_runner):
+        async def async_test():
+            mock_settings.fast_start = True
+            mock_settings.job_workers = 2
+            mock_database.is_connected = True
+            mock_database.replica = None
+
+            await startup()
+
+            mock_job_runner.start.assert_called_once()
+
+        asyncio.run(async_test())
+
+    def test_check_schema_failure_outdated_revision(self):
+        async def async_test():
+            database = MagicMock()
+            database.fetch_val = AsyncMock(return_value='outdated')
+
+            exception = None
+            try:
+                await check_schema(database)
+            except RuntimeError as e:
+                exception = e
+
+            self.assertIsNotNone(
+                exception,
+                'Function should throw if schema is not at head revision'
+            )
+
+        asyncio.run(async_test())
+
+
+if __name__ == "__main__":
+    unittest.main()
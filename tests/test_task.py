@@ -1,19 +1,49 @@
 import unittest
 import asyncio
-from unittest.mock import patch
-from fastapi import HTTPException
+import os
+from unittest.mock import AsyncMock, patch
+from fastapi import HTTPException, Response
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi_pagination import Page, Params
+from fastapi_pagination.api import create_page
 from pydantic import ValidationError
 
-from app.schemas.task_schemas import TaskInput
+from app.config import Settings
+from app.db import TodoTask, TodoUser
+from app.etag import etag_matches, make_etag
+from app.pagination import decode_cursor, encode_cursor
+from app.repo.tasks import TaskRepo
+from app.repo.users import UserRepo
+from app.schemas.task_schemas import (
+    BulkStatus,
+    ExportFormat,
+    TaskBulkDelete,
+    TaskBulkUpdate,
+    TaskInput,
+    TaskOut,
+    TaskStatus,
+    TaskUpdate
+)
 from app.routers.tasks import (
     create_task,
+    create_tasks_bulk,
+    delete_tasks_bulk,
+    export_tasks,
     get_all_tasks,
     get_task,
+    router,
+    search_tasks,
     update_task,
     delete_task
 )
+from app.security import get_current_user
 from tests.common import (
+    TaskRow,
+    assert_max_queries,
+    database_results,
     value_to_await,
+    test_user_1,
     test_user_3_different_username,
     test_task_1,
     test_task_2_with_same_user,
@@ -64,6 +94,7 @@ class TaskTests(unittest.TestCase):
             mock_repo.get_paginated_tasks.return_value = value_to_await(
                 test_tasks_all
             )
+            mock_repo.get_list_stats.return_value = value_to_await((1, 2))
 
             request_result = await get_all_tasks(page=1, page_size=5)
 
@@ -72,6 +103,87 @@ class TaskTests(unittest.TestCase):
                 test_tasks_all,
                 'Message should match expected'
             )
+            self.assertEqual(
+                mock_repo.get_paginated_tasks.call_args.kwargs['total'], 2,
+                'Total should be taken from list stats'
+            )
+
+        asyncio.run(async_test())
+
+    @patch('app.routers.tasks.TaskRepo')
+    def test_task_request_by_cursor(self, mock_repo):
+        async def async_test():
+            owner = TodoUser(id=1, username='Foo', password='BarBar',
+                             first_name='Buz')
+            tasks = [
+                TodoTask(id=task_id, title=f"Task {task_id}", user=owner)
+                for task_id in (4, 5, 6)
+            ]
+            mock_repo.get_tasks_after.return_value = value_to_await(tasks)
+            mock_repo.get_list_stats.return_value = value_to_await((1, 2))
+
+            request_result = await get_all_tasks(
+                page=1, page_size=10, cursor=encode_cursor(3), limit=2
+            )
+
+            mock_repo.get_tasks_after.assert_called_once_with(
+                after_id=3, limit=2, filters={}
+            )
+            self.assertEqual(
+                [task.id for task in request_result.items],
+                [4, 5],
+                'Should return only requested amount of tasks'
+            )
+            self.assertEqual(
+                decode_cursor(request_result.next_cursor)[0],
+                5,
+                'Next cursor should point to the last returned task'
+            )
+
+        asyncio.run(async_test())
+
+    def test_cursor_id_out_of_column_range(self):
+        for last_id in (2 ** 31, -2 ** 31 - 1, True):
+            with self.assertRaises(ValueError):
+                decode_cursor(encode_cursor(last_id))
+        self.assertEqual(decode_cursor(encode_cursor(2 ** 31 - 1))[0],
+                         2 ** 31 - 1)
+
+    @patch('app.routers.tasks.TaskRepo')
+    def test_task_request_by_cursor_beyond_int4(self, mock_repo):
+        async def async_test():
+            mock_repo.get_list_stats.return_value = value_to_await((1, 2))
+
+            with self.assertRaises(HTTPException) as failure:
+                await get_all_tasks(page=1, page_size=10,
+                                    cursor=encode_cursor(2 ** 31))
+            self.assertEqual(failure.exception.status_code, 400)
+            mock_repo.get_tasks_after.assert_not_called()
+
+        asyncio.run(async_test())
+
+    @patch('app.routers.tasks.TaskRepo')
+    def test_task_request_by_cursor_failure_invalid_cursor(self, mock_repo):
+        async def async_test():
+            mock_repo.get_list_stats.return_value = value_to_await((1, 2))
+
+            exception = None
+            try:
+                await get_all_tasks(page=1, page_size=10,
+                                    cursor="not-a-cursor")
+            except HTTPException as e:
+                exception = e
+
+            self.assertIsNotNone(
+                exception,
+                'Function should throw if cursor is malformed'
+            )
+
+            self.assertEqual(
+                400,
+                exception.status_code,
+                'Status code should be 400 Bad Request'
+            )
 
         asyncio.run(async_test())
 
@@ -124,10 +236,10 @@ class TaskTests(unittest.TestCase):
     @patch('app.routers.tasks.TaskRepo')
     def test_update_by_id_success(self, mock_repo):
         async def async_test():
-            mock_repo.safe_get_task_by_id.return_value = \
-                value_to_await(test_task_1)
-
-            mock_repo.update_task.return_value = value_to_await(None)
+            mock_repo.update_task.return_value = value_to_await({
+                'owner_id': test_task_1.user.id,
+                'title': test_task_1.title
+            })
 
             self.assertEqual(
                 {
@@ -147,8 +259,10 @@ class TaskTests(unittest.TestCase):
     @patch('app.routers.tasks.TaskRepo')
     def test_update_by_id_failure_wrong_user(self, mock_repo):
         async def async_test():
-            mock_repo.safe_get_task_by_id.return_value = \
-                value_to_await(test_task_1)
+            mock_repo.update_task.return_value = value_to_await({
+                'owner_id': test_task_1.user.id,
+                'title': None
+            })
 
             exception = None
             try:
@@ -183,8 +297,7 @@ class TaskTests(unittest.TestCase):
     def test_update_by_id_failure_task_not_found(self, mock_repo):
         async def async_test():
 
-            mock_repo.safe_get_task_by_id.return_value = \
-                value_to_await(None)
+            mock_repo.update_task.return_value = value_to_await(None)
 
             exception = None
             try:
@@ -218,10 +331,10 @@ class TaskTests(unittest.TestCase):
     @patch('app.routers.tasks.TaskRepo')
     def test_delete_by_id_success(self, mock_repo):
         async def async_test():
-            mock_repo.safe_get_task_by_id.return_value = \
-                value_to_await(test_task_1)
-
-            mock_repo.delete_task.return_value = value_to_await(None)
+            mock_repo.delete_task.return_value = value_to_await({
+                'owner_id': test_task_1.user.id,
+                'title': test_task_1.title
+            })
 
             self.assertEqual(
                 {
@@ -240,8 +353,10 @@ class TaskTests(unittest.TestCase):
     @patch('app.routers.tasks.TaskRepo')
     def test_delete_by_id_failure_wrong_user(self, mock_repo):
         async def async_test():
-            mock_repo.safe_get_task_by_id.return_value = \
-                value_to_await(test_task_1)
+            mock_repo.delete_task.return_value = value_to_await({
+                'owner_id': test_task_1.user.id,
+                'title': None
+            })
 
             exception = None
             try:
@@ -275,8 +390,7 @@ class TaskTests(unittest.TestCase):
     def test_delete_by_id_failure_task_not_found(self, mock_repo):
         async def async_test():
 
-            mock_repo.safe_get_task_by_id.return_value = \
-                value_to_await(None)
+            mock_repo.delete_task.return_value = value_to_await(None)
 
             exception = None
             try:
@@ -306,6 +420,449 @@ class TaskTests(unittest.TestCase):
 
         asyncio.run(async_test())
 
+    @patch('app.routers.tasks.TaskRepo')
+    def test_bulk_creation_success(self, mock_repo):
+        async def async_test():
+            mock_repo.bulk_create_tasks.return_value = value_to_await([1, 2])
+
+            results = await create_tasks_bulk(
+                [TaskInput(title='Foo'), TaskInput(title='Bar')],
+                current_user=test_task_1.user
+            )
+
+            self.assertEqual(
+                [(result.id, result.status) for result in results],
+                [(1, BulkStatus.Created), (2, BulkStatus.Created)],
+                'Every created task should be reported'
+            )
+
+        asyncio.run(async_test())
+
+    @patch('app.routers.tasks.TaskRepo')
+    def test_bulk_delete_reports_per_item_status(self, mock_repo):
+        async def async_test():
+            mock_repo.bulk_delete_tasks.return_value = value_to_await({
+                1: BulkStatus.Deleted,
+                2: BulkStatus.Forbidden,
+                3: BulkStatus.NotFound,
+            })
+
+            results = await delete_tasks_bulk(
+                TaskBulkDelete(ids=[1, 2, 3]),
+                current_user=test_task_1.user
+            )
+
+            self.assertEqual(
+                [result.status for result in results],
+                [BulkStatus.Deleted, BulkStatus.Forbidden,
+                 BulkStatus.NotFound],
+                'Statuses should match repo results'
+            )
+
+        asyncio.run(async_test())
+
+    @patch('app.repo.tasks.database')
+    def test_bulk_update_groups_same_changes(self, mock_database):
+        async def async_test():
+            mock_database.fetch_all = AsyncMock(return_value=[
+                {'id': 1, 'user': 7},
+                {'id': 2, 'user': 7},
+                {'id': 3, 'user': 8},
+            ])
+            mock_database.execute = AsyncMock()
+
+            results = await TaskRepo.bulk_update_tasks([
+                TaskBulkUpdate(id=1, status='Completed'),
+                TaskBulkUpdate(id=2, status='Completed'),
+                TaskBulkUpdate(id=3, status='Completed'),
+                TaskBulkUpdate(id=4, status='Completed'),
+            ], user_id=7)
+
+            self.assertEqual(results, {
+                1: BulkStatus.Updated,
+                2: BulkStatus.Updated,
+                3: BulkStatus.Forbidden,
+                4: BulkStatus.NotFound,
+            })
+            self.assertEqual(
+                mock_database.fetch_all.await_count, 1,
+                'Ownership should be checked with a single query'
+            )
+            lock_query = str(mock_database.fetch_all.call_args.args[0])
+            self.assertIn('ORDER BY tasks.id', lock_query,
+                          'Rows should be locked in a deterministic order')
+            self.assertIn('FOR UPDATE', lock_query)
+            self.assertEqual(
+                mock_database.execute.await_count, 1,
+                'Tasks with same changes should be updated by one statement'
+            )
+
+        asyncio.run(async_test())
+
+    @patch('app.repo.tasks.database')
+    def test_owned_update_and_delete_are_single_statements(self,
+                                                           mock_database):
+        async def async_test():
+            mock_database.fetch_one = AsyncMock(
+                return_value={'owner_id': 7, 'title': 'Foo'})
+
+            await TaskRepo.update_task(1, 7, TaskUpdate(status='Completed'))
+            await TaskRepo.delete_task(1, 7)
+
+            self.assertEqual(
+                mock_database.fetch_one.await_count, 2,
+                'Each write should be done by a single statement'
+            )
+            for call in mock_database.fetch_one.await_args_list:
+                sql = str(call.args[0])
+                self.assertIn('target.owner_id = :owner_id_1', sql)
+                self.assertIn('LEFT OUTER JOIN', sql)
+
+        asyncio.run(async_test())
+
+    @patch('app.repo.common.database')
+    def test_iterate_task_rows_by_chunks(self, mock_database):
+        async def async_test():
+            rows = [{'id': task_id} for task_id in range(1, 6)]
+            reader = mock_database.reader.return_value
+            reader.fetch_all = AsyncMock(side_effect=[
+                rows[:2], rows[2:4], rows[4:]
+            ])
+
+            result = [row async for row in TaskRepo.iterate_task_rows(
+                filters={}, chunk_size=2)]
+
+            self.assertEqual(result, rows, 'Should yield every row once')
+            self.assertEqual(
+                reader.fetch_all.await_count, 3,
+                'Should stop after the first incomplete chunk'
+            )
+
+        asyncio.run(async_test())
+
+    @patch('app.routers.tasks.TaskRepo')
+    def test_search_tasks_by_cursor(self, mock_repo):
+        async def async_test():
+            mock_repo.search_tasks.return_value = value_to_await([
+                {'id': task_id, 'title': 'Foo', 'description': None,
+                 'status': 'New', 'user_id': 2, 'username': 'Bar',
+                 'rank': rank}
+                for task_id, rank in ((8, 0.5), (3, 0.25), (9, 0.25))
+            ])
+
+            response = await search_tasks(
+                'foo', user_id=2, status=TaskStatus.New,
+                cursor=encode_cursor(4, 0.75), limit=2)
+
+            mock_repo.search_tasks.assert_called_once_with(
+                'foo', after=(4, 0.75), limit=2,
+                filters={'user': 2, 'status': TaskStatus.New})
+            self.assertEqual([task.id for task in response.items], [8, 3])
+            self.assertEqual(
+                decode_cursor(response.next_cursor), (3, 0.25),
+                'Next cursor should keep id and rank of the last task'
+            )
+
+        asyncio.run(async_test())
+
+    @patch('app.repo.tasks.database')
+    def test_search_tasks_uses_index_and_rank_keyset(self, mock_database):
+        async def async_test():
+            reader = mock_database.reader.return_value
+            reader.fetch_all = AsyncMock(return_value=[])
+
+            await TaskRepo.search_tasks('foo', after=(4, 0.75), limit=2,
+                                        filters={'user': 2})
+
+            sql = str(reader.fetch_all.await_args.args[0])
+            self.assertIn('tasks.search @@ websearch_to_tsquery', sql)
+            self.assertIn('tasks.id > :id_1', sql)
+            self.assertIn('DESC, tasks.id', sql)
+
+        asyncio.run(async_test())
+
+    @patch('app.routers.tasks.TaskRepo')
+    def test_export_tasks_as_csv(self, mock_repo):
+        async def async_test():
+            async def rows(filters):
+                yield {'id': 1, 'title': 'Foo', 'description': None,
+                       'status': 'New', 'user_id': 2, 'username': 'Bar'}
+
+            mock_repo.iterate_task_rows.side_effect = rows
+
+            response = await export_tasks(
+                user_id=2, status=None, export_format=ExportFormat.CSV)
+            body = ''.join([chunk async for chunk in response.body_iterator])
+
+            mock_repo.iterate_task_rows.assert_called_once_with(
+                filters={'user': 2})
+            self.assertEqual(
+                body.splitlines(),
+                ['id,title,description,status,user_id,username',
+                 '1,Foo,,New,2,Bar'],
+                'CSV should contain header and task rows'
+            )
+
+        asyncio.run(async_test())
+
+    @patch('app.routers.tasks.TaskRepo')
+    def test_request_by_id_not_modified(self, mock_repo):
+        async def async_test():
+            mock_repo.get_task_version.return_value = value_to_await(3)
+
+            response = await get_task(1, if_none_match=make_etag("task", 1, 3))
+
+            self.assertEqual(
+                304,
+                response.status_code,
+                'Status code should be 304 Not Modified'
+            )
+            mock_repo.safe_get_task_by_id.assert_not_called()
+
+        asyncio.run(async_test())
+
+    @patch('app.routers.tasks.TaskRepo')
+    def test_request_by_id_changed_etag(self, mock_repo):
+        async def async_test():
+            mock_repo.get_task_version.return_value = value_to_await(4)
+            mock_repo.safe_get_task_by_id.return_value = \
+                value_to_await(test_task_1)
+            response = Response()
+
+            result = await get_task(1, if_none_match=make_etag("task", 1, 3),
+                                    response=response)
+
+            self.assertEqual(result, test_task_1, 'Should return found task')
+            self.assertIn('etag', response.headers)
+
+        asyncio.run(async_test())
+
+    @patch('app.routers.tasks.TaskRepo')
+    def test_task_request_not_modified(self, mock_repo):
+        async def async_test():
+            mock_repo.get_list_stats.return_value = value_to_await((7, 2))
+            mock_repo.get_paginated_tasks.return_value = value_to_await([])
+            response = Response()
+            await get_all_tasks(page=1, page_size=5, response=response)
+
+            mock_repo.get_list_stats.return_value = value_to_await((7, 2))
+            not_modified = await get_all_tasks(
+                page=1, page_size=5, if_none_match=response.headers['etag'])
+
+            self.assertEqual(
+                304,
+                not_modified.status_code,
+                'Status code should be 304 Not Modified'
+            )
+            self.assertEqual(
+                mock_repo.get_paginated_tasks.call_count, 1,
+                'Listing should not be queried for unchanged version'
+            )
+
+        asyncio.run(async_test())
+
+    @patch('app.repo.common.settings')
+    @patch('app.repo.tasks.database')
+    def test_fast_reads_return_task_out_rows(self, mock_database,
+                                             mock_settings):
+        async def async_test():
+            mock_settings.repo_backend = 'asyncpg'
+            record = {'id': 1, 'title': 'Foo', 'description': None,
+                      'status': 'New', 'version': 3, 'user_id': 2,
+                      'username': 'Bar'}
+            connection = mock_database.reader.return_value.connection \
+                .return_value.__aenter__.return_value
+            raw = connection.raw_connection
+            raw.fetchrow = AsyncMock(return_value=record)
+            raw.fetch = AsyncMock(return_value=[record])
+
+            task = await TaskRepo.safe_get_task_by_id(1)
+            page = await TaskRepo.get_paginated_tasks(
+                Params(page=2, size=5),
+                filters={'status': TaskStatus.New},
+                total=6
+            )
+
+            self.assertEqual(task.version, 3)
+            self.assertEqual(
+                TaskOut.parse_obj(task).dict(),
+                {'id': 1, 'title': 'Foo', 'description': None,
+                 'status': TaskStatus.New,
+                 'user': {'id': 2, 'username': 'Bar'}},
+                'Row should validate as TaskOut'
+            )
+            self.assertEqual(
+                Page[TaskOut].parse_obj(page.dict()).items[0].user.id, 2,
+                'Page items should validate as TaskOut'
+            )
+            sql, *args = raw.fetch.await_args.args
+            self.assertIn('WHERE t.status = $1', sql)
+            self.assertEqual(args, ['New', 5, 5])
+
+        asyncio.run(async_test())
+
+    @patch('app.repo.tasks.settings')
+    @patch('app.repo.tasks.database')
+    def test_list_stats_approximate_total(self, mock_database,
+                                          mock_settings):
+        async def async_test():
+            mock_settings.approximate_task_total = True
+            reader = mock_database.reader.return_value
+            reader.fetch_one = AsyncMock(
+                return_value={'version': 4, 'total': 10})
+
+            self.assertEqual(await TaskRepo.get_list_stats({}), (4, 10))
+            self.assertIn('reltuples',
+                          str(reader.fetch_one.await_args.args[0]))
+
+            await TaskRepo.get_list_stats({'user': 1})
+            self.assertNotIn(
+                'reltuples', str(reader.fetch_one.await_args.args[0]),
+                'Filtered listings should always get exact totals'
+            )
+
+            reader.fetch_one = AsyncMock(return_value=None)
+            self.assertEqual(await TaskRepo.get_list_stats({}), (0, 0))
+
+        asyncio.run(async_test())
+
+    @patch('app.repo.tasks.database')
+    def test_list_stats_sum_shards(self, mock_database):
+        async def async_test():
+            reader = mock_database.reader.return_value
+            reader.fetch_one = AsyncMock(
+                return_value={'version': 9, 'total': 3})
+
+            self.assertEqual(
+                await TaskRepo.get_list_stats({'status': 'New'}), (9, 3))
+            query = str(reader.fetch_one.await_args.args[0])
+            self.assertIn('sum(task_list_stats.version)', query)
+            self.assertIn('sum(task_list_stats.task_count)', query)
+
+            reader.fetch_one = AsyncMock(
+                return_value={'version': None, 'total': None})
+            self.assertEqual(await TaskRepo.get_list_stats({}), (0, 0),
+                             'Scope without counters should be empty')
+
+        asyncio.run(async_test())
+
+    def test_unknown_repo_backend(self):
+        with patch.dict(os.environ, {'REPO_BACKEND': 'unknown'}):
+            with self.assertRaises(ValidationError):
+                Settings()
+
+    @patch('app.routers.tasks.settings')
+    @patch('app.routers.tasks.TaskRepo')
+    def test_fast_json_matches_response_model_output(self, mock_repo,
+                                                     mock_settings):
+        async def async_test():
+            owner = TodoUser(id=7, username='Zoë "</script>"',
+                             password='BarBar', first_name='Buz')
+            tasks = [
+                TodoTask(id=1, title='Ünïcode 🚀 \\ \u2028 \x7f',
+                         description='tab\tnew\nline\x01', status='New',
+                         user=owner),
+                TodoTask(id=2, title='Bar', description=None,
+                         status='In Progress', user=owner),
+                TodoTask(id=3, title='Imported', description=None,
+                         status=None, user=owner),
+                TodoTask(id=4, title='Enum', description=None,
+                         status=TaskStatus.Completed, user=owner),
+            ]
+            route = next(route for route in router.routes
+                         if route.name == 'get_all_tasks')
+
+            async def render(fast_json):
+                mock_settings.fast_json = fast_json
+                mock_repo.get_list_stats.return_value = value_to_await((1, 2))
+                mock_repo.get_paginated_tasks.return_value = value_to_await(
+                    create_page(tasks, total=12, params=Params(size=4)))
+                result = await get_all_tasks(page=1, page_size=4)
+                if fast_json:
+                    return result.body
+                content = await serialize_response(
+                    field=route.secure_cloned_response_field,
+                    response_content=result)
+                return JSONResponse(content).body
+
+            self.assertEqual(
+                await render(fast_json=True),
+                await render(fast_json=False),
+                'Fast path should render exactly the same bytes'
+            )
+
+        asyncio.run(async_test())
+
+    def test_etag_matches(self):
+        etag = make_etag("task", 1, 1)
+
+        self.assertTrue(etag_matches(etag, etag))
+        self.assertTrue(etag_matches(f'"other", W/{etag}', etag))
+        self.assertTrue(etag_matches('*', etag))
+        self.assertFalse(etag_matches(make_etag("task", 1, 2), etag))
+        self.assertFalse(etag_matches(None, etag))
+
+
+@patch('app.security.settings')
+class TaskQueryBudgetTests(unittest.TestCase):
+    """Queries hot endpoints make, authentication included, against the
+    global database with its connections faked
+    """
+
+    payload = {'sub': test_user_1.username, 'uid': test_user_1.id}
+
+    def setUp(self):
+        UserRepo.clear_user_cache()
+
+    def tearDown(self):
+        UserRepo.clear_user_cache()
+
+    def test_update_task_is_one_statement_plus_auth(self, mock_settings):
+        async def async_test():
+            current_user = await get_current_user(self.payload)
+            return await update_task(1, TaskUpdate(status='Completed'),
+                                     current_user=current_user)
+
+        mock_settings.token_user_id = True
+        owned = {'owner_id': test_user_1.id, 'title': 'Foo'}
+        with database_results(test_user_1.id, owned), \
+                assert_max_queries(self, 2):
+            result = asyncio.run(async_test())
+
+        self.assertEqual(result,
+                         {'message': "Task 'Foo' updated successfully"})
+
+    def test_delete_task_is_one_statement_plus_auth(self, mock_settings):
+        async def async_test():
+            current_user = await get_current_user(self.payload)
+            return await delete_task(1, current_user=current_user)
+
+        mock_settings.token_user_id = True
+        owned = {'owner_id': test_user_1.id, 'title': 'Foo'}
+        with database_results(test_user_1.id, owned), \
+                assert_max_queries(self, 2):
+            result = asyncio.run(async_test())
+
+        self.assertEqual(result,
+                         {'message': "Task 'Foo' deleted successfully"})
+
+    def test_not_modified_task_is_one_query(self, _):
+        etag = make_etag("task", 1, 3)
+        with database_results(3), assert_max_queries(self, 1):
+            response = asyncio.run(get_task(1, if_none_match=etag))
+
+        self.assertEqual(response.status_code, 304)
+
+    def test_keyset_page_is_two_queries(self, _):
+        rows = [TaskRow(task) for task in test_tasks_all]
+        with database_results({'version': 7, 'total': 2}, rows), \
+                assert_max_queries(self, 2) as log:
+            asyncio.run(get_all_tasks(page=1, page_size=10, limit=1,
+                                      response=Response()))
+
+        self.assertEqual(log.count, 2,
+                         'Stats and page should be read by one query each')
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -1,11 +1,25 @@
 import unittest
 import asyncio
-from unittest.mock import patch
+import time
+from unittest.mock import AsyncMock, patch
+from asyncpg.exceptions import ForeignKeyViolationError
 from fastapi import HTTPException
 from fastapi.security import OAuth2PasswordRequestForm
 
+from app.cache import TTLCache
+from app.hashing import HashingPool, PoolSaturated
+from app.main import task_owner_deleted
+from app.repo.users import UserRepo
 from app.routers.auth import signup, login
-from app.routers.users import get_all_users
+from app.pagination import decode_cursor, encode_cursor
+from app.routers.users import (
+    export_users,
+    get_all_users,
+    get_user_task_stats,
+    get_users_task_stats
+)
+from app.security import get_current_user
+from app.settings import TASK_OWNER_FK
 from tests.common import test_user_1, test_user_2_same_username, value_to_await
 
 
@@ -106,14 +120,228 @@ class UserTests(unittest.TestCase):
     @patch('app.routers.users.UserRepo')
     def test_get_all_users_success(self, mock_user_repo):
         async def async_test():
-            mock_user_repo.get_all_users.return_value = value_to_await([
-                test_user_1,
-                test_user_2_same_username,
+            mock_user_repo.get_users_after.return_value = value_to_await([
+                {'id': test_user_1.id, 'username': test_user_1.username},
+                {'id': 2, 'username': test_user_2_same_username.username},
             ])
 
             response = await get_all_users()
 
-            self.assertEqual(len(response), 2)
+            mock_user_repo.get_users_after.assert_called_once_with(
+                after_id=None, limit=10)
+            self.assertEqual(len(response.items), 2)
+            self.assertIsNone(response.next_cursor)
+
+        asyncio.run(async_test())
+
+    def test_get_current_user_cached(self):
+        async def async_test():
+            UserRepo.clear_user_cache()
+            with patch.object(UserRepo, 'safe_get_user_by_username') as lookup:
+                lookup.return_value = test_user_1
+
+                first = await get_current_user({'sub': test_user_1.username})
+                second = await get_current_user({'sub': test_user_1.username})
+
+                self.assertIs(first, test_user_1)
+                self.assertIs(second, test_user_1)
+                self.assertEqual(
+                    lookup.call_count, 1,
+                    'Second call should be served from cache'
+                )
+
+                UserRepo.invalidate_cached_user(test_user_1.username)
+                await get_current_user({'sub': test_user_1.username})
+                self.assertEqual(
+                    lookup.call_count, 2,
+                    'Invalidated user should be looked up again'
+                )
+            UserRepo.clear_user_cache()
+
+        asyncio.run(async_test())
+
+    def test_get_current_user_from_token_id_checks_existence(self):
+        async def async_test():
+            UserRepo.clear_user_cache()
+            payload = {'sub': test_user_1.username, 'uid': test_user_1.id}
+            with patch('app.security.settings') as mock_settings, \
+                    patch.object(UserRepo, 'user_exists') as exists:
+                mock_settings.token_user_id = True
+                exists.return_value = False
+
+                with self.assertRaises(HTTPException) as deleted:
+                    await get_current_user(payload)
+                self.assertEqual(deleted.exception.status_code, 401)
+
+                exists.return_value = True
+                user = await get_current_user(payload)
+                self.assertEqual(user.id, test_user_1.id)
+                exists.assert_called_with(test_user_1.id,
+                                          test_user_1.username)
+            UserRepo.clear_user_cache()
+
+        asyncio.run(async_test())
+
+    def test_task_write_of_deleted_user_is_unauthorized(self):
+        async def async_test():
+            error = ForeignKeyViolationError('violates foreign key')
+            error.constraint_name = TASK_OWNER_FK
+            response = await task_owner_deleted(None, error)
+            self.assertEqual(response.status_code, 401)
+
+            error.constraint_name = 'other_fkey'
+            with self.assertRaises(ForeignKeyViolationError):
+                await task_owner_deleted(None, error)
+
+        asyncio.run(async_test())
+
+    def test_get_current_user_not_found(self):
+        async def async_test():
+            UserRepo.clear_user_cache()
+            with patch.object(UserRepo, 'safe_get_user_by_username') as lookup:
+                lookup.return_value = None
+
+                exception = None
+                try:
+                    await get_current_user({'sub': 'nonexistent_user'})
+                except HTTPException as e:
+                    exception = e
+
+                self.assertIsNotNone(exception)
+                self.assertEqual(
+                    401,
+                    exception.status_code,
+                    'Status code should be 401 Unauthorized'
+                )
+
+        asyncio.run(async_test())
+
+    def test_ttl_cache_eviction(self):
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+
+        self.assertEqual(cache.get('a'), 1, 'Recently used entry should stay')
+        self.assertIsNone(cache.get('b'), 'Least recently used is evicted')
+
+        expired = TTLCache(maxsize=2, ttl=-1)
+        expired.set('a', 1)
+        self.assertIsNone(expired.get('a'), 'Expired entry should be dropped')
+
+    def test_hashing_pool_rejects_when_saturated(self):
+        async def async_test():
+            pool = HashingPool(workers=1, max_queue=0)
+            results = await asyncio.gather(
+                pool.run(time.sleep, 0.05),
+                pool.run(time.sleep, 0.05),
+                return_exceptions=True
+            )
+            pool.shutdown()
+
+            self.assertIsNone(results[0])
+            self.assertIsInstance(
+                results[1], PoolSaturated,
+                'Job above workers + queue size should be rejected'
+            )
+
+            stats = pool.stats()
+            self.assertEqual(stats['completed'], 1)
+            self.assertEqual(stats['rejected'], 1)
+            self.assertEqual(stats['in_flight'], 0)
+
+        asyncio.run(async_test())
+
+    @patch('app.routers.users.UserRepo')
+    def test_get_users_by_cursor(self, mock_user_repo):
+        async def async_test():
+            mock_user_repo.get_users_after.return_value = value_to_await([
+                {'id': 3, 'username': 'Foo'},
+                {'id': 4, 'username': 'Bar'},
+            ])
+
+            response = await get_all_users(cursor=encode_cursor(2), limit=1)
+
+            mock_user_repo.get_users_after.assert_called_once_with(
+                after_id=2, limit=1)
+            self.assertEqual([user.id for user in response.items], [3])
+            self.assertEqual(decode_cursor(response.next_cursor)[0], 3)
+
+        asyncio.run(async_test())
+
+    @patch('app.routers.users.UserRepo')
+    def test_export_users(self, mock_user_repo):
+        async def async_test():
+            async def rows():
+                yield {'id': 1, 'username': 'Foo'}
+                yield {'id': 2, 'username': 'Bar'}
+
+            mock_user_repo.iterate_user_rows.side_effect = rows
+
+            response = await export_users()
+            body = ''.join([chunk async for chunk in response.body_iterator])
+
+            self.assertEqual(body.splitlines(), [
+                '{"id": 1, "username": "Foo"}',
+                '{"id": 2, "username": "Bar"}',
+            ])
+
+        asyncio.run(async_test())
+
+    @patch('app.repo.users.database')
+    def test_task_stats_grouped_by_user(self, mock_database):
+        async def async_test():
+            mock_database.reader.return_value.fetch_all = AsyncMock(
+                return_value=[
+                    {'id': 1, 'status': '*', 'task_count': 3},
+                    {'id': 1, 'status': 'New', 'task_count': 1},
+                    {'id': 1, 'status': 'Completed', 'task_count': 2},
+                    {'id': 2, 'status': None, 'task_count': None},
+                ])
+
+            stats = await UserRepo.get_task_stats(limit=2)
+
+            self.assertEqual(stats, [
+                {'user_id': 1, 'total': 3, 'statuses': {
+                    'New': 1, 'In Progress': 0, 'Completed': 2}},
+                {'user_id': 2, 'total': 0, 'statuses': {
+                    'New': 0, 'In Progress': 0, 'Completed': 0}},
+            ], 'Users without tasks should get zero counts')
+
+        asyncio.run(async_test())
+
+    @patch('app.routers.users.UserRepo')
+    def test_get_user_task_stats(self, mock_user_repo):
+        async def async_test():
+            mock_user_repo.get_task_stats.return_value = value_to_await([])
+
+            with self.assertRaises(HTTPException) as raised:
+                await get_user_task_stats(5)
+
+            mock_user_repo.get_task_stats.assert_called_once_with(
+                limit=1, user_ids=[5])
+            self.assertEqual(raised.exception.status_code, 404)
+
+        asyncio.run(async_test())
+
+    @patch('app.routers.users.UserRepo')
+    def test_get_users_task_stats_by_cursor(self, mock_user_repo):
+        async def async_test():
+            counts = {'New': 0, 'In Progress': 0, 'Completed': 0}
+            mock_user_repo.get_task_stats.return_value = value_to_await([
+                {'user_id': 3, 'total': 0, 'statuses': counts},
+                {'user_id': 4, 'total': 0, 'statuses': counts},
+            ])
+
+            response = await get_users_task_stats(cursor=encode_cursor(2),
+                                                  limit=1)
+
+            mock_user_repo.get_task_stats.assert_called_once_with(
+                after_id=2, limit=1, user_ids=None)
+            self.assertEqual(
+                [stats.user_id for stats in response.items], [3])
+            self.assertEqual(decode_cursor(response.next_cursor)[0], 3)
 
         asyncio.run(async_test())
 